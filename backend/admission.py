@@ -0,0 +1,158 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class DeadlineExceeded(Exception):
+    """The request ran past its deadline and its work was abandoned"""
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0)
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+_local = threading.local()
+
+
+def set_deadline(seconds):
+    """Give the work on this thread ``seconds`` to finish; returns the Deadline"""
+    _local.deadline = Deadline(seconds)
+    return _local.deadline
+
+
+def clear_deadline():
+    _local.deadline = None
+
+
+def current_deadline():
+    return getattr(_local, 'deadline', None)
+
+
+def check_deadline():
+    """Checkpoint for long computations: raises once this thread's deadline has passed.
+
+    A no-op on threads without a deadline, e.g. background jobs or the
+    ai_service worker processes.
+    """
+    deadline = getattr(_local, 'deadline', None)
+    if deadline is not None and deadline.expired():
+        raise DeadlineExceeded(f'Request exceeded its {deadline.seconds}s deadline')
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Take one token; returns 0, or the seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionControl:
+    """Per-client rate limits and global concurrency limits by endpoint class.
+
+    ``rate_limits`` maps a class to requests per minute; every (client,
+    class) pair gets its own token bucket holding up to ``burst`` tokens.
+    A bucket left idle until it is full again is dropped, since a new one
+    would be identical, and past ``max_clients`` the buckets of the least
+    recently seen clients are dropped too. ``concurrency_limits`` caps how many requests of a
+    class run at once across all clients; classes missing from it are
+    not capped.
+    """
+
+    def __init__(self, rate_limits, burst=20, concurrency_limits=None, max_clients=10000):
+        self.rate_limits = rate_limits
+        self.burst = burst
+        self.max_clients = max_clients
+        self.concurrency_limits = concurrency_limits or {}
+        self._slots = {name: threading.BoundedSemaphore(limit) for name, limit in self.concurrency_limits.items()}
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._running = {name: 0 for name in self.concurrency_limits}
+        self._stats = {'rate_limited': 0, 'concurrency_rejected': 0, 'deadline_exceeded': 0}
+
+    def check_rate(self, client, endpoint_class):
+        """0 if the request may proceed, else the seconds to wait before retrying"""
+        rate = self.rate_limits.get(endpoint_class)
+        if not rate:
+            return 0
+
+        key = (client, endpoint_class)
+        with self._lock:
+            self._evict_idle()
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(rate / 60, self.burst)
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+
+            retry_after = bucket.take()
+            if retry_after:
+                self._stats['rate_limited'] += 1
+            return retry_after
+
+    def _evict_idle(self):
+        """Drop refilled buckets from the least recently used end; call with ``_lock`` held"""
+        now = time.monotonic()
+        while self._buckets:
+            bucket = next(iter(self._buckets.values()))
+            if bucket.tokens + (now - bucket.updated) * bucket.rate < bucket.burst:
+                break
+            self._buckets.popitem(last=False)
+
+    def try_enter(self, endpoint_class):
+        """Take a concurrency slot; False if the class is already at its limit"""
+        slots = self._slots.get(endpoint_class)
+        if slots is None:
+            return True
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['concurrency_rejected'] += 1
+            return False
+        with self._lock:
+            self._running[endpoint_class] += 1
+        return True
+
+    def leave(self, endpoint_class):
+        slots = self._slots.get(endpoint_class)
+        if slots is None:
+            return
+        with self._lock:
+            self._running[endpoint_class] -= 1
+        slots.release()
+
+    def record_deadline_exceeded(self):
+        with self._lock:
+            self._stats['deadline_exceeded'] += 1
+
+    def get_status(self):
+        with self._lock:
+            return {
+                'rate_limits_per_minute': dict(self.rate_limits),
+                'burst': self.burst,
+                'tracked_clients': len(self._buckets),
+                'concurrency': {
+                    name: {'running': self._running[name], 'limit': limit}
+                    for name, limit in self.concurrency_limits.items()
+                },
+                **self._stats
+            }
@@ -4,25 +4,35 @@ import json
 from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 import math
+from importlib.util import find_spec
 
-try:
-    import numpy as np
-    NUMPY_AVAILABLE = True
-except ImportError:
-    NUMPY_AVAILABLE = False
+from admission import check_deadline
+from keyword_matcher import KeywordMatcher
+from metrics import engine_stage
+from session_frame import SessionFrame
+from session_stats import aggregate_sessions
+from term_stats import TermStats
+
+# NumPy and scikit-learn take over a second to import, so they are only
+# detected here (find_spec doesn't import them) and imported inside the ML
+# code paths on first use. Status and the rule-based paths never pay for
+# scikit-learn; NumPy is loaded by the first SessionFrame built.
+NUMPY_AVAILABLE = find_spec('numpy') is not None
+if not NUMPY_AVAILABLE:
     print("NumPy not available, using basic implementations")
 
-try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.cluster import KMeans
-    from sklearn.decomposition import LatentDirichletAllocation
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
+SKLEARN_AVAILABLE = find_spec('sklearn') is not None
+if not SKLEARN_AVAILABLE:
     print("Scikit-learn not available, using basic implementations")
 
 
+# content_matcher group holding the educational indicators
+EDUCATIONAL = 'educational'
+
+
 class AIAnalysisEngine:
+    # Part of every result-cache key; bump it whenever an analysis changes its output
+    VERSION = '2.0.0'
     
     def __init__(self):
         self.topic_keywords = {
@@ -47,12 +57,23 @@ class AIAnalysisEngine:
             'interactive': ['quiz', 'game', 'interactive', 'sandbox', 'playground']
         }
         
-        if SKLEARN_AVAILABLE:
-            self.vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+        self.edu_indicators = ['learn', 'tutorial', 'course', 'guide', 'documentation',
+                               'example', 'how to', 'introduction', 'beginner', 'advanced']
+        
+        # Keyword automatons, built once: one pass over a page finds its
+        # topic keywords and educational indicators together
+        self.content_matcher = KeywordMatcher({**self.topic_keywords, EDUCATIONAL: self.edu_indicators})
+        self.style_matcher = KeywordMatcher(self.learning_styles)
+    
+    @property
+    def cache_version(self):
+        """VERSION plus the mode, since ML and basic paths give different results"""
+        return f"{self.VERSION}-{'ml' if SKLEARN_AVAILABLE and NUMPY_AVAILABLE else 'basic'}"
     
     def get_status(self):
         return {
             'available': True,
+            'version': self.VERSION,
             'ml_enabled': SKLEARN_AVAILABLE and NUMPY_AVAILABLE,
             'capabilities': {
                 'topic_extraction': True,
@@ -68,7 +89,8 @@ class AIAnalysisEngine:
             'mode': 'ML-Enhanced' if (SKLEARN_AVAILABLE and NUMPY_AVAILABLE) else 'Basic'
         }
         
-    def analyze(self, sessions, topics):
+    def analyze(self, sessions, topics, frame=None, stats=None):
+        """Insights over the sessions and topics; ``frame`` and ``stats`` may be shared with other analyses of the same sessions"""
         insights = []
         
         if not isinstance(sessions, list):
@@ -76,32 +98,53 @@ class AIAnalysisEngine:
         if not isinstance(topics, list):
             topics = []
         
+        # One pass over the sessions feeds every session-based insight below
+        try:
+            if stats is None:
+                with engine_stage('analyze', 'aggregate_sessions'):
+                    stats = self.aggregate(sessions, frame)
+        except Exception as e:
+            print(f"Session aggregation error: {e}")
+        
         try:
-            pattern_insights = self.detect_learning_patterns(sessions)
+            with engine_stage('analyze', 'detect_learning_patterns'):
+                pattern_insights = self.detect_learning_patterns(sessions, stats)
             insights.extend(pattern_insights)
         except Exception as e:
             print(f"Pattern analysis error: {e}")
         
+        check_deadline()
+        
         try:
-            topic_insights = self.analyze_topics(topics)
+            with engine_stage('analyze', 'analyze_topics'):
+                topic_insights = self.analyze_topics(topics)
             insights.extend(topic_insights)
         except Exception as e:
             print(f"Topic analysis error: {e}")
         
+        check_deadline()
+        
         try:
-            engagement_insights = self.analyze_engagement(sessions)
+            with engine_stage('analyze', 'analyze_engagement'):
+                engagement_insights = self.analyze_engagement(sessions, stats)
             insights.extend(engagement_insights)
         except Exception as e:
             print(f"Engagement analysis error: {e}")
         
+        check_deadline()
+        
         try:
-            profile_insights = self.generate_user_profile(sessions, topics)
+            with engine_stage('analyze', 'generate_user_profile'):
+                profile_insights = self.generate_user_profile(sessions, topics, stats)
             insights.extend(profile_insights)
         except Exception as e:
             print(f"Profile analysis error: {e}")
         
+        check_deadline()
+        
         try:
-            skill_insights = self.analyze_skill_progression(sessions)
+            with engine_stage('analyze', 'analyze_skill_progression'):
+                skill_insights = self.analyze_skill_progression(sessions, stats)
             insights.extend(skill_insights)
         except Exception as e:
             print(f"Skill analysis error: {e}")
@@ -119,18 +162,19 @@ class AIAnalysisEngine:
         
         return validated_insights
     
-    def detect_learning_patterns(self, sessions):
+    def aggregate(self, sessions, frame=None):
+        """SessionStats shared by the session-based insights"""
+        return aggregate_sessions(sessions, self.style_matcher, frame)
+    
+    def detect_learning_patterns(self, sessions, stats=None):
         insights = []
         
         if not sessions:
             return insights
+        if stats is None:
+            stats = self.aggregate(sessions)
         
-        hour_distribution = defaultdict(int)
-        for session in sessions:
-            if session.get('timestamp'):
-                hour = datetime.fromtimestamp(session['timestamp'] / 1000).hour
-                hour_distribution[hour] += session.get('duration', 0)
-        
+        hour_distribution = stats.hour_time
         if hour_distribution:
             peak_hour = max(hour_distribution, key=hour_distribution.get)
             time_period = 'morning' if 6 <= peak_hour < 12 else \
@@ -146,9 +190,8 @@ class AIAnalysisEngine:
                 'data': dict(hour_distribution)
             })
         
-        durations = [s.get('duration', 0) for s in sessions if s.get('duration')]
-        if durations:
-            avg_duration = sum(durations) / len(durations)
+        if stats.duration_count:
+            avg_duration = stats.duration_sum / stats.duration_count
             avg_minutes = avg_duration / 60000
             
             session_style = 'quick_learner' if avg_minutes < 10 else \
@@ -164,28 +207,22 @@ class AIAnalysisEngine:
                 'avg_duration': avg_minutes
             })
         
-        categories = [s.get('category') for s in sessions if s.get('category')]
-        if len(categories) >= 2:
-            transitions = defaultdict(int)
-            for i in range(len(categories) - 1):
-                transition = f"{categories[i]} → {categories[i+1]}"
-                transitions[transition] += 1
-            
-            if transitions:
-                common_transition = max(transitions, key=transitions.get)
-                insights.append({
-                    'type': 'learning_flow',
-                    'title': 'Common Learning Path',
-                    'description': f'You often transition: {common_transition}',
-                    'value': common_transition,
-                    'confidence': 0.7,
-                    'transitions': dict(transitions)
-                })
+        if stats.transitions:
+            transitions = {f"{a} → {b}": count for (a, b), count in stats.transitions.items()}
+            common_transition = max(transitions, key=transitions.get)
+            insights.append({
+                'type': 'learning_flow',
+                'title': 'Common Learning Path',
+                'description': f'You often transition: {common_transition}',
+                'value': common_transition,
+                'confidence': 0.7,
+                'transitions': transitions
+            })
         
-        dates = set(s.get('date') for s in sessions if s.get('date'))
-        if dates:
+        active_days = len(stats.daily_time)
+        if active_days:
             total_days = (datetime.now() - datetime.now() + timedelta(days=7)).days or 7
-            consistency = len(dates) / min(total_days, 7) * 100
+            consistency = active_days / min(total_days, 7) * 100
             
             insights.append({
                 'type': 'consistency',
@@ -193,7 +230,7 @@ class AIAnalysisEngine:
                 'description': f'You maintained {consistency:.0f}% consistency this week',
                 'value': consistency,
                 'confidence': 0.9,
-                'active_days': len(dates)
+                'active_days': active_days
             })
         
         return insights
@@ -239,79 +276,69 @@ class AIAnalysisEngine:
         
         return insights
     
-    def analyze_engagement(self, sessions):
+    def analyze_engagement(self, sessions, stats=None):
         insights = []
         
         if not sessions:
             return insights
+        if stats is None:
+            stats = self.aggregate(sessions)
         
-        engagement_scores = [s.get('engagementScore', 0) for s in sessions]
-        scroll_depths = [s.get('scrollDepth', 0) for s in sessions]
+        count = stats.count
+        avg_engagement = stats.engagement_sum / count
         
-        if engagement_scores:
-            avg_engagement = sum(engagement_scores) / len(engagement_scores)
+        mid = count // 2
+        if mid > 0:
+            recent_avg = stats.recent_engagement_sum / mid
+            older_avg = (stats.engagement_sum - stats.recent_engagement_sum) / (count - mid)
+            trend = recent_avg - older_avg
             
-            mid = len(engagement_scores) // 2
-            if mid > 0:
-                recent_avg = sum(engagement_scores[:mid]) / mid
-                older_avg = sum(engagement_scores[mid:]) / (len(engagement_scores) - mid)
-                trend = recent_avg - older_avg
-                
-                trend_direction = 'improving' if trend > 5 else \
-                                 'declining' if trend < -5 else 'stable'
-                
-                insights.append({
-                    'type': 'engagement_trend',
-                    'title': 'Engagement Trend',
-                    'description': f'Your engagement is {trend_direction} ({"+" if trend > 0 else ""}{trend:.1f}%)',
-                    'value': trend_direction,
-                    'confidence': 0.75,
-                    'trend_value': trend
-                })
-            
-            level = 'high' if avg_engagement >= 70 else \
-                   'medium' if avg_engagement >= 40 else 'low'
+            trend_direction = 'improving' if trend > 5 else \
+                             'declining' if trend < -5 else 'stable'
             
             insights.append({
-                'type': 'engagement_level',
-                'title': 'Overall Engagement',
-                'description': f'Average engagement: {avg_engagement:.0f}% ({level} engagement)',
-                'value': level,
-                'confidence': 0.85,
-                'average': avg_engagement
+                'type': 'engagement_trend',
+                'title': 'Engagement Trend',
+                'description': f'Your engagement is {trend_direction} ({"+" if trend > 0 else ""}{trend:.1f}%)',
+                'value': trend_direction,
+                'confidence': 0.75,
+                'trend_value': trend
             })
         
-        if scroll_depths:
-            avg_scroll = sum(scroll_depths) / len(scroll_depths)
-            
-            reading_style = 'thorough' if avg_scroll >= 80 else \
-                           'selective' if avg_scroll >= 50 else 'scanner'
-            
-            insights.append({
-                'type': 'reading_depth',
-                'title': 'Content Consumption Style',
-                'description': f'You are a {reading_style} reader (avg scroll: {avg_scroll:.0f}%)',
-                'value': reading_style,
-                'confidence': 0.8,
-                'avg_scroll': avg_scroll
-            })
+        level = 'high' if avg_engagement >= 70 else \
+               'medium' if avg_engagement >= 40 else 'low'
+        
+        insights.append({
+            'type': 'engagement_level',
+            'title': 'Overall Engagement',
+            'description': f'Average engagement: {avg_engagement:.0f}% ({level} engagement)',
+            'value': level,
+            'confidence': 0.85,
+            'average': avg_engagement
+        })
+        
+        avg_scroll = stats.scroll_sum / count
+        
+        reading_style = 'thorough' if avg_scroll >= 80 else \
+                       'selective' if avg_scroll >= 50 else 'scanner'
+        
+        insights.append({
+            'type': 'reading_depth',
+            'title': 'Content Consumption Style',
+            'description': f'You are a {reading_style} reader (avg scroll: {avg_scroll:.0f}%)',
+            'value': reading_style,
+            'confidence': 0.8,
+            'avg_scroll': avg_scroll
+        })
         
         return insights
     
-    def generate_user_profile(self, sessions, topics):
+    def generate_user_profile(self, sessions, topics, stats=None):
         insights = []
         
-        style_scores = defaultdict(int)
-        
-        for session in sessions:
-            url = session.get('url', '').lower()
-            title = (session.get('title') or '').lower()
-            combined = f"{url} {title}"
-            
-            for style, keywords in self.learning_styles.items():
-                for keyword in keywords:
-                    if keyword in combined:
-                        style_scores[style] += 1
+        if stats is None:
+            stats = self.aggregate(sessions)
+        style_scores = stats.style_hits
         
         if style_scores:
             dominant_style = max(style_scores, key=style_scores.get)
@@ -345,31 +372,23 @@ class AIAnalysisEngine:
         
         return insights
     
-    def analyze_skill_progression(self, sessions):
+    def analyze_skill_progression(self, sessions, stats=None):
         insights = []
         
         if not sessions or len(sessions) < 5:
             return insights
+        if stats is None:
+            stats = self.aggregate(sessions)
         
-        daily_learning = defaultdict(lambda: {'time': 0, 'sessions': 0, 'topics': set()})
-        
-        for session in sessions:
-            date = session.get('date')
-            if date:
-                daily_learning[date]['time'] += session.get('duration', 0)
-                daily_learning[date]['sessions'] += 1
-                for topic in session.get('topics', []):
-                    if isinstance(topic, str):
-                        daily_learning[date]['topics'].add(topic)
-        
-        if len(daily_learning) >= 3:
-            dates = sorted(daily_learning.keys())
+        daily_time = stats.daily_time
+        if len(daily_time) >= 3:
+            dates = sorted(daily_time)
             
             first_half = dates[:len(dates)//2]
             second_half = dates[len(dates)//2:]
             
-            first_avg = sum(daily_learning[d]['time'] for d in first_half) / len(first_half) if first_half else 0
-            second_avg = sum(daily_learning[d]['time'] for d in second_half) / len(second_half) if second_half else 0
+            first_avg = sum(daily_time[d] for d in first_half) / len(first_half) if first_half else 0
+            second_avg = sum(daily_time[d] for d in second_half) / len(second_half) if second_half else 0
             
             if first_avg > 0:
                 growth = ((second_avg - first_avg) / first_avg) * 100
@@ -388,32 +407,37 @@ class AIAnalysisEngine:
         
         return insights
     
-    def extract_topics(self, texts):
+    def extract_topics(self, texts, term_stats=None):
+        """Top keywords of each text; ``term_stats`` is the user's stored corpus, if any"""
         if not texts:
             return []
         
-        if SKLEARN_AVAILABLE and len(texts) >= 3:
-            return self._extract_topics_ml(texts)
+        has_corpus = term_stats is not None and term_stats.documents > 0
+        if SKLEARN_AVAILABLE and (len(texts) >= 3 or has_corpus):
+            return self._extract_topics_ml(texts, term_stats if has_corpus else None)
         else:
             return self._extract_topics_basic(texts)
     
-    def _extract_topics_ml(self, texts):
+    def _extract_topics_ml(self, texts, term_stats=None):
         try:
-            tfidf_matrix = self.vectorizer.fit_transform(texts)
+            from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
             
-            feature_names = self.vectorizer.get_feature_names_out()
+            # Transform only: the idf comes from the user's stored document
+            # frequencies, or from these texts as their own corpus when
+            # there are none, so no vectorizer is fitted per call
+            if term_stats is None:
+                term_stats = TermStats.from_texts(texts)
             
             topics = []
             for i, text in enumerate(texts):
-                scores = tfidf_matrix[i].toarray().flatten()
-                top_indices = scores.argsort()[-5:][::-1]
-                top_terms = [feature_names[idx] for idx in top_indices if scores[idx] > 0]
+                weights = term_stats.weights(text, ENGLISH_STOP_WORDS)
+                top_terms = sorted(weights, key=lambda term: (-weights[term], term))[:5]
                 
                 if top_terms:
                     topics.append({
                         'text_index': i,
                         'keywords': top_terms,
-                        'score': float(max(scores))
+                        'score': weights[top_terms[0]]
                     })
             
             return topics
@@ -426,13 +450,8 @@ class AIAnalysisEngine:
         topics = []
         
         for i, text in enumerate(texts):
-            text_lower = text.lower()
-            matched_topics = {}
-            
-            for topic, keywords in self.topic_keywords.items():
-                matches = sum(1 for kw in keywords if kw in text_lower)
-                if matches > 0:
-                    matched_topics[topic] = matches
+            matched_topics = self.content_matcher.scores(text.lower())
+            matched_topics.pop(EDUCATIONAL, None)
             
             if matched_topics:
                 best_topic = max(matched_topics, key=matched_topics.get)
@@ -440,7 +459,7 @@ class AIAnalysisEngine:
                     'text_index': i,
                     'topic': best_topic,
                     'keywords': list(matched_topics.keys()),
-                    'score': matched_topics[best_topic] / len(self.topic_keywords[best_topic])
+                    'score': matched_topics[best_topic] / self.content_matcher.totals[best_topic]
                 })
         
         return topics
@@ -448,11 +467,8 @@ class AIAnalysisEngine:
     def analyze_content(self, url, title, content=''):
         combined_text = f"{title} {content}".lower()
         
-        category_scores = {}
-        for category, keywords in self.topic_keywords.items():
-            score = sum(1 for kw in keywords if kw in combined_text)
-            if score > 0:
-                category_scores[category] = score
+        category_scores = self.content_matcher.scores(combined_text)
+        edu_hits = category_scores.pop(EDUCATIONAL, 0)
         
         best_category = max(category_scores, key=category_scores.get) if category_scores else 'general'
         
@@ -460,9 +476,7 @@ class AIAnalysisEngine:
         word_freq = Counter(words)
         top_keywords = [word for word, _ in word_freq.most_common(10)]
         
-        edu_indicators = ['learn', 'tutorial', 'course', 'guide', 'documentation',
-                         'example', 'how to', 'introduction', 'beginner', 'advanced']
-        edu_score = sum(1 for ind in edu_indicators if ind in combined_text) / len(edu_indicators)
+        edu_score = edu_hits / self.content_matcher.totals[EDUCATIONAL]
         
         return {
             'url': url,
@@ -478,7 +492,7 @@ class AIAnalysisEngine:
     # Enhanced AI Functionalities for History Analysis
     # =====================================================
     
-    def analyze_history_advanced(self, sessions):
+    def analyze_history_advanced(self, sessions, frame=None):
         """
         Advanced history analysis with ML-powered insights.
         Returns comprehensive learning insights from browsing history.
@@ -493,13 +507,11 @@ class AIAnalysisEngine:
             }
         
         insights = {}
+        if frame is None:
+            frame = SessionFrame.from_sessions(sessions)
         
         # 1. Determine Focus Area
-        category_time = defaultdict(int)
-        for session in sessions:
-            category = session.get('category', 'General')
-            duration = session.get('duration', 0)
-            category_time[category] += duration
+        category_time = self._category_time(frame)
         
         if category_time:
             focus_area = max(category_time, key=category_time.get)
@@ -513,12 +525,7 @@ class AIAnalysisEngine:
             }
         
         # 2. Determine Peak Learning Hours
-        hour_activity = defaultdict(int)
-        for session in sessions:
-            ts = session.get('timestamp')
-            if ts:
-                hour = datetime.fromtimestamp(ts / 1000).hour
-                hour_activity[hour] += 1
+        hour_activity = self._calendar_counts(frame, 'hour')
         
         if hour_activity:
             peak_hour = max(hour_activity, key=hour_activity.get)
@@ -533,7 +540,7 @@ class AIAnalysisEngine:
             insights['peakHours'] = peak_time
         
         # 3. Analyze Learning Pattern
-        pattern = self._analyze_learning_consistency(sessions)
+        pattern = self._analyze_learning_consistency(frame)
         insights['learningPattern'] = pattern['pattern_type']
         insights['patternTrend'] = {
             'type': pattern['trend'],
@@ -545,19 +552,32 @@ class AIAnalysisEngine:
         insights['recommendedTopic'] = recommended
         
         # 5. Generate Additional Insights
-        insights['additionalInsights'] = self._generate_additional_insights(sessions)
+        insights['additionalInsights'] = self._generate_additional_insights(frame)
         
         return insights
     
-    def _analyze_learning_consistency(self, sessions):
+    def _category_time(self, frame):
+        """Duration per category, with sessions lacking one counted as 'General'"""
+        category_time = {}
+        for category, duration in frame.sum_by('category', 'duration').items():
+            category = 'General' if category is None else category
+            category_time[category] = category_time.get(category, 0) + duration
+        return category_time
+    
+    def _category_counts(self, frame, start=0, stop=None):
+        """Sessions per category over a slice of the frame, lacking one counted as 'General'"""
+        counts = Counter()
+        for category, count in frame.count_by('category', start, stop).items():
+            counts['General' if category is None else category] += count
+        return counts
+    
+    def _calendar_counts(self, frame, field):
+        """Sessions per local hour, day or weekday, leaving out those without a timestamp"""
+        return {value: count for value, count in frame.count_by(field).items() if value is not None}
+    
+    def _analyze_learning_consistency(self, frame):
         """Analyze the consistency of learning patterns."""
-        daily_counts = defaultdict(int)
-        
-        for session in sessions:
-            ts = session.get('timestamp')
-            if ts:
-                date = datetime.fromtimestamp(ts / 1000).strftime('%Y-%m-%d')
-                daily_counts[date] += 1
+        daily_counts = self._calendar_counts(frame, 'day')
         
         if not daily_counts:
             return {
@@ -625,12 +645,12 @@ class AIAnalysisEngine:
         
         return 'Advanced ' + max(category_time, key=category_time.get)
     
-    def _generate_additional_insights(self, sessions):
+    def _generate_additional_insights(self, frame):
         """Generate additional learning insights."""
         insights = []
         
         # Total learning time
-        total_duration = sum(s.get('duration', 0) for s in sessions)
+        total_duration = frame.total('duration')
         total_hours = total_duration / 3600
         insights.append({
             'label': 'Total Learning Time',
@@ -638,19 +658,14 @@ class AIAnalysisEngine:
         })
         
         # Unique domains visited
-        domains = set(s.get('domain') for s in sessions if s.get('domain'))
         insights.append({
             'label': 'Learning Sources',
-            'value': f'{len(domains)} unique sites'
+            'value': f"{frame.distinct('domain')} unique sites"
         })
         
         # Most productive day
-        day_activity = defaultdict(int)
-        for session in sessions:
-            ts = session.get('timestamp')
-            if ts:
-                day = datetime.fromtimestamp(ts / 1000).strftime('%A')
-                day_activity[day] += session.get('duration', 0)
+        day_activity = {day: duration for day, duration in frame.sum_by('weekday', 'duration').items()
+                        if day is not None}
         
         if day_activity:
             best_day = max(day_activity, key=day_activity.get)
@@ -669,6 +684,7 @@ class AIAnalysisEngine:
         if not sessions:
             return {'clusters': [], 'summary': 'No data to cluster'}
         
+        check_deadline()
         if SKLEARN_AVAILABLE and len(sessions) >= n_clusters:
             return self._cluster_sessions_ml(sessions, n_clusters)
         else:
@@ -677,6 +693,9 @@ class AIAnalysisEngine:
     def _cluster_sessions_ml(self, sessions, n_clusters):
         """ML-powered session clustering using TF-IDF and KMeans."""
         try:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            from sklearn.cluster import KMeans
+            
             # Prepare text for vectorization
             texts = []
             for s in sessions:
@@ -757,7 +776,7 @@ class AIAnalysisEngine:
             'summary': f'Grouped into {len(clusters)} categories'
         }
     
-    def predict_learning_interests(self, sessions, profile=None):
+    def predict_learning_interests(self, sessions, profile=None, frame=None):
         """
         Predict future learning interests based on patterns.
         Uses time series analysis and topic co-occurrence.
@@ -770,13 +789,13 @@ class AIAnalysisEngine:
             }
         
         # Analyze recent vs older interests
-        mid = len(sessions) // 2
-        recent_sessions = sessions[:mid]
-        older_sessions = sessions[mid:]
+        if frame is None:
+            frame = SessionFrame.from_sessions(sessions)
+        mid = len(frame) // 2
         
         # Count categories
-        recent_cats = Counter(s.get('category', 'General') for s in recent_sessions)
-        older_cats = Counter(s.get('category', 'General') for s in older_sessions)
+        recent_cats = self._category_counts(frame, 0, mid)
+        older_cats = self._category_counts(frame, mid)
         
         # Find trending up categories
         predictions = []
@@ -818,7 +837,7 @@ class AIAnalysisEngine:
             'total_sessions_analyzed': len(sessions)
         }
     
-    def generate_learning_summary(self, sessions, period='week'):
+    def generate_learning_summary(self, sessions, period='week', frame=None):
         """
         Generate a comprehensive learning summary for a time period.
         """
@@ -829,22 +848,18 @@ class AIAnalysisEngine:
                 'recommendations': []
             }
         
-        total_time = sum(s.get('duration', 0) for s in sessions)
+        if frame is None:
+            frame = SessionFrame.from_sessions(sessions)
+        total_time = frame.total('duration')
         total_hours = total_time / 3600
         
         # Category breakdown
-        category_time = defaultdict(int)
-        for s in sessions:
-            category_time[s.get('category', 'General')] += s.get('duration', 0)
+        category_time = self._category_time(frame)
         
         top_categories = sorted(category_time.items(), key=lambda x: x[1], reverse=True)[:5]
         
-        # Unique domains
-        domains = list(set(s.get('domain') for s in sessions if s.get('domain')))
-        
-        # Calculate engagement
-        engagements = [s.get('engagement', 0) for s in sessions if s.get('engagement')]
-        avg_engagement = sum(engagements) / len(engagements) if engagements else 0
+        # Calculate engagement over the sessions that recorded one
+        avg_engagement = frame.mean('engagement', skip_zero=True) or 0
         
         # Generate summary text
         summary_text = f"This {period}, you spent {total_hours:.1f} hours learning across {len(sessions)} sessions. "
@@ -881,7 +896,7 @@ class AIAnalysisEngine:
                 'totalHours': round(total_hours, 1),
                 'sessionsCount': len(sessions),
                 'topCategories': [{'name': c, 'hours': round(t/3600, 1)} for c, t in top_categories],
-                'uniqueSources': len(domains),
+                'uniqueSources': frame.distinct('domain'),
                 'avgEngagement': round(avg_engagement, 0)
             },
             'recommendations': recommendations,
@@ -1,54 +1,95 @@
 import sys
 import json
-from ai_engine import AIAnalysisEngine
+import os
+import threading
+import time
+from ai_engine import AIAnalysisEngine, NUMPY_AVAILABLE, SKLEARN_AVAILABLE
 from recommendation_engine import MLRecommendationEngine
+from session_frame import SessionFrame
+from term_stats import TermStats
 
 ai_engine = AIAnalysisEngine()
 rec_engine = MLRecommendationEngine()
 
+_result_cache = (None, None)
+
+def get_result_cache():
+    """This process's ResultCache (None if disabled), built on first use.
+    
+    Rebuilt after a fork so pool workers never share the parent's SQLite
+    connection to the disk tier.
+    """
+    global _result_cache
+    pid, cache = _result_cache
+    if pid != os.getpid():
+        from config import get_config
+        from result_cache import build_result_cache
+        
+        cache = build_result_cache(get_config('result_cache'))
+        _result_cache = (os.getpid(), cache)
+    return cache
+
+def memoize(name, engine, fn, *args):
+    cache = get_result_cache()
+    if cache is None:
+        return fn(*args)
+    return cache.memoize(name, engine.cache_version, fn, *args)
+
 def get_status():
     ai_status = ai_engine.get_status()
     rec_status = rec_engine.get_status()
+    cache = get_result_cache()
     
     return {
         'available': True,
         'ai_engine': ai_status,
         'recommendation_engine': rec_status,
+        'result_cache': cache.get_status() if cache else {'enabled': False},
         'mode': ai_status.get('mode', 'Basic')
     }
 
-def analyze(data):
+def analyze(data, context=None):
     sessions = data.get('sessions', [])
     topics = data.get('topics', [])
-    insights = ai_engine.analyze(sessions, topics)
+    fn = ai_engine.analyze
+    if context is not None:
+        # Aggregated only on a cache miss, and then once per batch payload
+        fn = lambda sessions, topics: ai_engine.analyze(sessions, topics, context.frame(), context.stats())
+    insights = memoize('analyze', ai_engine, fn, sessions, topics)
     
     return {
         'success': True,
         'insights': insights
     }
 
-def analyze_history(data):
+def analyze_history(data, context=None):
     """Advanced history analysis with ML-powered insights."""
     sessions = data.get('sessions', [])
-    insights = ai_engine.analyze_history_advanced(sessions)
+    fn = ai_engine.analyze_history_advanced
+    if context is not None:
+        fn = lambda sessions: ai_engine.analyze_history_advanced(sessions, context.frame())
+    insights = memoize('analyze_history', ai_engine, fn, sessions)
     
     return {
         'success': True,
         **insights
     }
 
-def predict(data):
+def predict(data, context=None):
     """Predict future learning interests."""
     sessions = data.get('sessions', [])
     profile = data.get('profile', {})
-    predictions = ai_engine.predict_learning_interests(sessions, profile)
+    fn = ai_engine.predict_learning_interests
+    if context is not None:
+        fn = lambda sessions, profile: ai_engine.predict_learning_interests(sessions, profile, context.frame())
+    predictions = memoize('predict', ai_engine, fn, sessions, profile)
     
     return {
         'success': True,
         **predictions
     }
 
-def cluster(data):
+def cluster(data, context=None):
     """Cluster sessions by content similarity."""
     sessions = data.get('sessions', [])
     n_clusters = data.get('n_clusters', 5)
@@ -59,62 +100,375 @@ def cluster(data):
         **clusters
     }
 
-def summary(data):
+def topics(data, context=None):
+    """Extract topics from raw texts."""
+    texts = data.get('texts', [])
+    term_stats = TermStats.from_dict(data['term_stats']) if data.get('term_stats') else None
+    
+    return {
+        'success': True,
+        'topics': ai_engine.extract_topics(texts, term_stats)
+    }
+
+def summary(data, context=None):
     """Generate comprehensive learning summary."""
     sessions = data.get('sessions', [])
     period = data.get('period', 'week')
-    summary_data = ai_engine.generate_learning_summary(sessions, period)
+    frame = context.frame() if context is not None else None
+    summary_data = ai_engine.generate_learning_summary(sessions, period, frame)
     
     return {
         'success': True,
         **summary_data
     }
 
-def recommend(data):
+def recommend(data, context=None):
     sessions = data.get('sessions', [])
     topics = data.get('topics', [])
     profile = data.get('profile', {})
     skills = data.get('skills', [])
     
-    recommendations = rec_engine.generate(sessions, topics, profile, skills)
+    fn = rec_engine.generate
+    if context is not None:
+        fn = lambda *args: rec_engine.generate(*args, frame=context.frame())
+    recommendations = memoize('recommend', rec_engine, fn, sessions, topics, profile, skills)
     
     return {
         'success': True,
         'recommendations': recommendations
     }
 
+ACTIONS = {
+    'status': lambda data, context=None: get_status(),
+    'analyze': analyze,
+    'analyze_history': analyze_history,
+    'predict': predict,
+    'cluster': cluster,
+    'topics': topics,
+    'summary': summary,
+    'recommend': recommend,
+}
+
+def handle(action, data):
+    handler = ACTIONS.get(action)
+    if handler is None:
+        return {'error': f'Unknown action: {action}'}
+    return handler(data)
+
+def serve_request(request):
+    """Run one daemon request; errors are reported in the response, never raised"""
+    request_id = request.get('id')
+    action = request.get('action')
+    
+    if action not in ACTIONS:
+        return {'id': request_id, 'error': f'Unknown action: {action}'}
+    
+    try:
+        return {'id': request_id, 'result': ACTIONS[action](request.get('data') or {})}
+    except Exception as e:
+        return {'id': request_id, 'error': str(e)}
+
+def _watch_parent(parent_pid):
+    """Worker initializer: exit once the daemon that started us is gone"""
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+    
+    threading.Thread(target=watch, daemon=True).start()
+
+def warm_up():
+    """Import the ML libraries the engines otherwise load on first use"""
+    if NUMPY_AVAILABLE:
+        import numpy
+    if SKLEARN_AVAILABLE:
+        import sklearn.feature_extraction.text
+        import sklearn.cluster
+    return os.getpid()
+
+def serve(workers, max_pending, infile, outfile):
+    """
+    Long-running mode: one JSON request per line on ``infile``, one JSON
+    response per line on ``outfile``.
+    
+    Request:  {"id": 1, "action": "analyze", "data": {...}}
+    Response: {"id": 1, "result": {...}} or {"id": 1, "error": "..."}
+    
+    With workers > 0 requests run on a pool of worker processes, each of
+    which builds the engines once, so responses can arrive out of order;
+    match them up by ``id``. A {"ready": true} line is written once the
+    workers are up.
+    """
+    write_lock = threading.Lock()
+    # Bounds the requests in flight; once it is exhausted we stop reading
+    # stdin and the caller's writes back up in the pipe
+    slots = threading.BoundedSemaphore(max_pending)
+    
+    def respond(response):
+        line = json.dumps(response)
+        with write_lock:
+            outfile.write(line + '\n')
+            outfile.flush()
+    
+    def on_done(future, request_id):
+        slots.release()
+        try:
+            respond(future.result())
+        except Exception as e:
+            # The worker process itself died (e.g. BrokenProcessPool)
+            respond({'id': request_id, 'error': f'Worker failed: {e}'})
+    
+    # A daemon is long-lived, so it pays for the ML imports up front
+    # rather than on its first request
+    warm_up()
+    
+    executor = None
+    if workers > 0:
+        from concurrent.futures import ProcessPoolExecutor
+        
+        # Workers would otherwise outlive a killed daemon, still holding its pipes
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_watch_parent, initargs=(os.getpid(),))
+        # Start every worker now so the first real requests don't pay for it
+        for future in [executor.submit(warm_up) for _ in range(workers)]:
+            future.result()
+    
+    respond({'ready': True, 'workers': workers, 'pid': os.getpid()})
+    
+    for line in infile:
+        line = line.strip()
+        if not line:
+            continue
+        
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('request must be a JSON object')
+        except ValueError as e:
+            respond({'id': None, 'error': f'Invalid request: {e}'})
+            continue
+        
+        if executor is None:
+            respond(serve_request(request))
+            continue
+        
+        slots.acquire()
+        request_id = request.get('id')
+        try:
+            future = executor.submit(serve_request, request)
+        except Exception as e:
+            slots.release()
+            respond({'id': request_id, 'error': f'Worker pool unavailable: {e}'})
+            continue
+        future.add_done_callback(lambda done, request_id=request_id: on_done(done, request_id))
+    
+    if executor:
+        executor.shutdown(wait=True)
+
+PAYLOAD_KEYS = ('sessions', 'topics', 'profile', 'skills')
+
+class SessionContext:
+    """
+    A payload parsed once and shared by every batch request that uses it.
+    
+    Derived values are computed on first use and cached on the context:
+    the normalized session list, its SessionFrame (columns and decoded
+    timestamps) and its SessionStats are each built once however many
+    actions read them, and repeating an action with the same parameters
+    is free.
+    """
+    
+    def __init__(self, data):
+        self.data = data if isinstance(data, dict) else {}
+        self._derived = {}
+    
+    def derive(self, key, compute):
+        if key not in self._derived:
+            self._derived[key] = compute()
+        return self._derived[key]
+    
+    def _sessions(self):
+        sessions = self.data.get('sessions')
+        if not isinstance(sessions, list):
+            return []
+        return [session for session in sessions if isinstance(session, dict)]
+    
+    def sessions(self):
+        return self.derive('sessions', self._sessions)
+    
+    def frame(self):
+        return self.derive('frame', lambda: SessionFrame.from_sessions(self.sessions()))
+    
+    def stats(self):
+        """Shared SessionStats, or None if aggregation fails (analyze then reports the error itself)"""
+        def compute():
+            try:
+                return ai_engine.aggregate(self.sessions(), self.frame())
+            except Exception:
+                return None
+        return self.derive('stats', compute)
+    
+    def run(self, action, params):
+        """Run ``action`` over the shared payload plus per-request ``params``"""
+        def compute():
+            payload = dict(self.data, **params)
+            payload['sessions'] = self.sessions()
+            return ACTIONS[action](payload, self)
+        
+        return self.derive(('result', action, json.dumps(params, sort_keys=True)), compute)
+
+def read_batch(infile):
+    """
+    Yield (context, request) pairs from a batch input, in order.
+    
+    Two formats are accepted:
+    
+    - A JSON document: {"data": {...}, "requests": [{"id", "action", "data"}, ...]}
+      (or just the list of requests). ``data`` is the shared payload.
+    - NDJSON, one object per line. A line without an ``action`` (e.g.
+      {"data": {"sessions": [...]}}) sets the shared payload for the lines
+      after it; every other line is a request. NDJSON is processed as it
+      arrives, so a producer can keep streaming requests.
+    
+    A request whose own ``data`` includes sessions, topics, profile or
+    skills runs over that payload instead of the shared one.
+    """
+    first = infile.readline()
+    while first and not first.strip():
+        first = infile.readline()
+    if not first:
+        return
+    
+    try:
+        document = json.loads(first)
+        streaming = isinstance(document, dict) and 'requests' not in document
+    except ValueError:
+        # A pretty-printed JSON document spans several lines
+        document = json.loads(first + infile.read())
+        streaming = False
+    
+    context = SessionContext({})
+    
+    if not streaming:
+        if isinstance(document, list):
+            document = {'requests': document}
+        context = SessionContext(document.get('data'))
+        for request in document.get('requests') or []:
+            yield context, request
+        return
+    
+    lines = iter(infile)
+    line = first
+    while line is not None:
+        line = line.strip()
+        if line:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                request = {'error': f'Invalid request: {e}'}
+            
+            if isinstance(request, dict) and 'action' not in request and 'error' not in request:
+                context = SessionContext(request.get('data'))
+            else:
+                yield context, request
+        line = next(lines, None)
+
+def run_batch(infile, outfile):
+    """Run every request from ``infile``, writing one response line per request"""
+    for context, request in read_batch(infile):
+        if not isinstance(request, dict):
+            response = {'id': None, 'error': 'Invalid request: expected an object'}
+        elif 'error' in request:
+            response = {'id': None, 'error': request['error']}
+        else:
+            request_id = request.get('id')
+            action = request.get('action')
+            params = request.get('data') or {}
+            
+            if action not in ACTIONS:
+                response = {'id': request_id, 'error': f'Unknown action: {action}'}
+            else:
+                if any(key in params for key in PAYLOAD_KEYS):
+                    context = SessionContext(dict(context.data, **params))
+                    params = {key: value for key, value in params.items() if key not in PAYLOAD_KEYS}
+                try:
+                    response = {'id': request_id, 'result': context.run(action, params)}
+                except Exception as e:
+                    response = {'id': request_id, 'error': str(e)}
+        
+        outfile.write(json.dumps(response) + '\n')
+        outfile.flush()
+
+def protocol_stdout():
+    """
+    Return a stream on the real stdout and point fd 1 at stderr, so stray
+    prints from the engines (here or in forked workers) can't corrupt the
+    JSON lines written to the returned stream.
+    """
+    protocol_out = os.fdopen(os.dup(sys.stdout.fileno()), 'w')
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    return protocol_out
+
+def run_batch_cli(argv):
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog='ai_service.py batch')
+    parser.add_argument('input', nargs='?', default='-', help='JSON or NDJSON file; - reads stdin')
+    args = parser.parse_args(argv)
+    
+    outfile = protocol_stdout()
+    if args.input == '-':
+        run_batch(sys.stdin, outfile)
+    else:
+        with open(args.input, encoding='utf-8') as infile:
+            run_batch(infile, outfile)
+    outfile.flush()
+
+def run_server(argv):
+    import argparse
+    from config import get_config
+    
+    service_config = get_config('ai_service')
+    parser = argparse.ArgumentParser(prog='ai_service.py serve')
+    parser.add_argument('--workers', type=int, default=service_config['workers'])
+    parser.add_argument('--max-pending', type=int, default=service_config['max_pending'])
+    args = parser.parse_args(argv)
+    
+    outfile = protocol_stdout()
+    try:
+        serve(args.workers, max(args.max_pending, 1), sys.stdin, outfile)
+    except BrokenPipeError:
+        # The parent went away (e.g. a script that imported app.py exited
+        # while we were warming up); drop what is still buffered and leave
+        os.dup2(os.open(os.devnull, os.O_WRONLY), outfile.fileno())
+
 if __name__ == '__main__':
     if len(sys.argv) < 2:
         print(json.dumps({'error': 'No action specified'}))
         sys.exit(1)
     
     action = sys.argv[1]
+    
+    if action == 'serve':
+        run_server(sys.argv[2:])
+        sys.exit(0)
+    
+    if action == 'batch':
+        run_batch_cli(sys.argv[2:])
+        sys.exit(0)
+    
     data = {}
     
     if len(sys.argv) > 2:
+        # '-' reads the payload from stdin, which has no argument-size limit
+        raw = sys.stdin.read() if sys.argv[2] == '-' else sys.argv[2]
         try:
-            data = json.loads(sys.argv[2])
+            data = json.loads(raw)
         except:
             data = {}
     
     try:
-        if action == 'status':
-            result = get_status()
-        elif action == 'analyze':
-            result = analyze(data)
-        elif action == 'analyze_history':
-            result = analyze_history(data)
-        elif action == 'predict':
-            result = predict(data)
-        elif action == 'cluster':
-            result = cluster(data)
-        elif action == 'summary':
-            result = summary(data)
-        elif action == 'recommend':
-            result = recommend(data)
-        else:
-            result = {'error': f'Unknown action: {action}'}
-        
+        result = handle(action, data)
         print(json.dumps(result))
     except Exception as e:
         print(json.dumps({'error': str(e), 'success': False}))
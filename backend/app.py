@@ -1,15 +1,37 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, has_request_context, stream_with_context
 from flask_cors import CORS
 import sqlite3
 import json
+import re
+import base64
+import hmac
 from datetime import datetime, timedelta
 import os
 import logging
+import math
+import threading
+import time
+from functools import partial
 from logging.handlers import RotatingFileHandler
 
 from ai_engine import AIAnalysisEngine
 from recommendation_engine import MLRecommendationEngine
+from admission import AdmissionControl, clear_deadline, current_deadline, check_deadline, set_deadline
+from coalesce import SingleFlight
+from result_cache import build_result_cache
+from compute_pool import ComputePool, PoolBusy, TaskTimeout
 from config import get_config, ensure_directories
+from db_pool import ConnectionPool
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from profiling import RequestProfiler
+from ingest import IngestBatch, PROFILE_UPSERT, store_analysis
+from schema import DEFAULT_USER_ID, init_schema, reconcile_table_stats
+from jobs import JobManager, JobQueueFull
+from maintenance import MaintenanceScheduler
+from retention import enforce_retention
+from session_frame import SessionFrame
+from term_stats import TermStats
+import queries
 
 ensure_directories()
 
@@ -38,109 +60,403 @@ console_handler = logging.StreamHandler()
 console_handler.setFormatter(logging.Formatter(log_config['format']))
 app.logger.addHandler(console_handler)
 
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'supriai_http_request_duration_seconds',
+    'Time to produce a response, by route',
+    ('method', 'route')
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    'supriai_http_requests_total',
+    'Responses by route and status code',
+    ('method', 'route', 'status')
+)
+HTTP_ERRORS = REGISTRY.counter(
+    'supriai_http_request_errors_total',
+    'Responses with a 5xx status code',
+    ('method', 'route')
+)
+SQL_QUERY_SECONDS = REGISTRY.histogram(
+    'supriai_sql_query_duration_seconds',
+    'Time spent executing each SQLite statement',
+    ('statement',)
+)
+
+SQL_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+(\w+)', re.IGNORECASE)
+_statement_names = {}
+
+
+def statement_name(sql):
+    """Metric label for a statement: its name in queries.py, else the verb and table"""
+    name = _statement_names.get(sql)
+    if name is None:
+        name = queries.STATEMENT_NAMES.get(sql)
+        if name is None:
+            verb = sql.split(None, 1)[0].lower() if sql.strip() else 'empty'
+            table = SQL_TABLE.search(sql)
+            name = f'{verb} {table.group(1)}' if table else verb
+        # Statements are constants in the code, so this stays small
+        if len(_statement_names) < 1024:
+            _statement_names[sql] = name
+    return name
+
+
+def observe_query(sql, seconds):
+    SQL_QUERY_SECONDS.observe(seconds, statement_name(sql))
+
+
+def observe_request(method, route, status, seconds):
+    HTTP_REQUEST_SECONDS.observe(seconds, method, route)
+    HTTP_REQUESTS.inc(method, route, str(status))
+    if status >= 500:
+        HTTP_ERRORS.inc(method, route)
+
+
 db_config = get_config('database')
 DB_PATH = str(db_config['path'])
 
+db_pool = ConnectionPool(
+    DB_PATH,
+    size=db_config.get('pool_size', 8),
+    timeout=db_config.get('timeout', 30),
+    journal_mode=db_config.get('journal_mode', 'WAL'),
+    synchronous=db_config.get('synchronous', 'NORMAL'),
+    cache_size_kb=db_config.get('cache_size_kb', 16000),
+    mmap_size=db_config.get('mmap_size', 0),
+    on_query=observe_query
+)
+
+ingest_config = get_config('ingest')
+analytics_config = get_config('analytics')
+
 ai_engine = AIAnalysisEngine()
 recommendation_engine = MLRecommendationEngine()
 
+jobs_config = get_config('jobs')
+job_manager = JobManager(
+    workers=jobs_config['workers'],
+    max_finished=jobs_config['max_finished_jobs'],
+    max_active=jobs_config['max_active_jobs'],
+    logger=app.logger
+)
+
+# Topic modeling and clustering hold the GIL for their whole run, so they go
+# to separate worker processes instead of stalling this one
+compute_config = get_config('compute')
+compute_pool = None
+if compute_config['enabled']:
+    compute_pool = ComputePool(
+        workers=compute_config['workers'],
+        max_queue=compute_config['max_queue'],
+        timeout=compute_config['task_timeout_seconds'],
+        logger=app.logger
+    )
+
+
+# The extension keeps resending the same sessions and topics
+result_cache = build_result_cache(get_config('result_cache'), logger=app.logger)
+
+
+def memoize(name, engine, fn, *args):
+    """``fn(*args)`` through the result cache, keyed by the engine's version"""
+    if result_cache is None:
+        return fn(*args)
+    return result_cache.memoize(name, engine.cache_version, fn, *args)
+
+
+profiling_config = get_config('profiling')
+profiler = RequestProfiler(
+    profiling_config['output_dir'],
+    default_mode=profiling_config['default_mode'],
+    sample_interval=profiling_config['sample_interval_seconds'],
+    allow_header=profiling_config['allow_header'],
+    max_files=profiling_config['max_files'],
+    logger=app.logger
+)
+
+
+# Several open tabs send the same analysis request within milliseconds;
+# identical ones in flight at the same time share a single computation
+single_flight = SingleFlight()
+
+
+def start_compute_pool():
+    try:
+        compute_pool.start()
+    except Exception as e:
+        app.logger.error(f"Compute pool failed to start: {e}")
+
+
+def run_compute(action, data, inline):
+    """Run an ai_service action on the compute pool, or ``inline()`` when it is disabled"""
+    if compute_pool is None:
+        return inline()
+    check_deadline()
+    deadline = current_deadline()
+    # Never wait on the pool past the request's own deadline
+    timeout = min(compute_pool.timeout, deadline.remaining()) if deadline else None
+    return compute_pool.run(action, data, timeout=timeout)
+
+
+def shed_response(status, code, error, retry_after=None):
+    """Error response for a request turned away or cut short under load"""
+    response = jsonify({
+        'success': False,
+        'error': error,
+        'code': code
+    })
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, status
+
+
+def compute_error_response(e):
+    """503 when the compute pool is full, 504 when a task ran out of time"""
+    if isinstance(e, PoolBusy):
+        return shed_response(503, 'BUSY', 'Server busy, retry shortly', retry_after=1)
+    return shed_response(504, 'TIMEOUT', str(e))
+
+
+# Admission control: token-bucket rate limits per client address and endpoint
+# class, concurrency caps on the expensive classes, and a deadline on
+# every request that SQLite and the engines give up at
+api_config = get_config('api')
+admission = AdmissionControl(
+    rate_limits={
+        **{name: api_config['rate_limit'] for name in ('read', 'write', 'compute')},
+        **api_config['rate_limits']
+    },
+    burst=api_config['rate_burst'],
+    concurrency_limits=api_config['concurrency_limits'],
+    max_clients=api_config['max_tracked_clients']
+)
+
+COMPUTE_ENDPOINTS = {
+    'get_patterns', 'analyze_content', 'topic_modeling', 'cluster_sessions',
+    'get_learning_path', 'get_knowledge_gaps', 'predict_engagement'
+}
+
+# SQLite VM instructions between deadline checks during a statement
+DEADLINE_CHECK_STEPS = 10000
+
+
+def endpoint_class(endpoint, method):
+    if endpoint in COMPUTE_ENDPOINTS:
+        return 'compute'
+    return 'read' if method in ('GET', 'HEAD') else 'write'
+
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Check a connection out of the pool; ``conn.close()`` returns it"""
+    conn = db_pool.acquire()
+    if has_request_context():
+        g.setdefault('db_connections', []).append(conn)
+    deadline = current_deadline()
+    if deadline is not None:
+        # A true return from the handler aborts the running statement with
+        # OperationalError('interrupted'); the pool clears it on release
+        conn.set_progress_handler(deadline.expired, DEADLINE_CHECK_STEPS)
     return conn
 
 
-def init_db():
-    conn = get_db()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sessions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            url TEXT,
-            domain TEXT,
-            title TEXT,
-            category TEXT,
-            topics TEXT,
-            duration INTEGER,
-            engagement_score REAL,
-            scroll_depth REAL,
-            date TEXT,
-            timestamp INTEGER,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS topics (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE,
-            category TEXT,
-            total_time INTEGER DEFAULT 0,
-            session_count INTEGER DEFAULT 0,
-            avg_engagement REAL DEFAULT 0,
-            embeddings TEXT,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+USER_ID_PATTERN = re.compile(r'^[A-Za-z0-9_.@-]{1,64}$')
+
+
+def resolve_user_id(header, param):
+    """User id from the ``X-User-Id`` header, then ``?user=``; None if invalid"""
+    user_id = header or param or DEFAULT_USER_ID
+    return user_id if USER_ID_PATTERN.match(user_id) else None
+
+
+INVALID_USER = {
+    'success': False,
+    'error': 'Invalid user id',
+    'code': 'INVALID_USER'
+}
+
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+
+@app.before_request
+def load_user():
+    """Scope the request to one user"""
+    user_id = resolve_user_id(request.headers.get('X-User-Id'), request.args.get('user'))
+    if user_id is None:
+        return jsonify(INVALID_USER), 400
+    g.user_id = user_id
+
+
+MAINTENANCE_ENDPOINTS = {'trigger_retention', 'profiling_control'}
+
+
+@app.before_request
+def require_admin():
+    """Maintenance endpoints need the configured admin token"""
+    if request.method == 'OPTIONS' or request.endpoint not in MAINTENANCE_ENDPOINTS:
+        return
     
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_profile (
-            id INTEGER PRIMARY KEY,
-            interest_clusters TEXT,
-            learning_style TEXT,
-            skill_level TEXT,
-            preferred_categories TEXT,
-            weekly_goal INTEGER,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    token = api_config['admin_token']
+    if not token:
+        return jsonify({
+            'success': False,
+            'error': 'Not found'
+        }), 404
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), token.encode()):
+        return jsonify({
+            'success': False,
+            'error': 'Admin token required',
+            'code': 'FORBIDDEN'
+        }), 403
+
+
+@app.before_request
+def admit_request():
+    """Rate limit the client, take a concurrency slot and start the deadline"""
+    if request.method == 'OPTIONS' or request.endpoint in (None, 'health_check', 'get_metrics'):
+        return
     
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS ai_insights (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            insight_type TEXT,
-            content TEXT,
-            confidence REAL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    name = endpoint_class(request.endpoint, request.method)
+    # Keyed on the address alone: the user id is whatever the client sends,
+    # so a fresh id per request would otherwise get a fresh bucket
+    retry_after = admission.check_rate(request.remote_addr, name)
+    if retry_after:
+        return shed_response(429, 'RATE_LIMITED', 'Rate limit exceeded', retry_after=retry_after)
+    if not admission.try_enter(name):
+        return shed_response(503, 'BUSY', 'Server busy, retry shortly', retry_after=1)
     
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS recommendations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT,
-            description TEXT,
-            url TEXT,
-            rec_type TEXT,
-            priority TEXT,
-            topic TEXT,
-            category TEXT,
-            score REAL,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    g.endpoint_class = name
+    g.deadline = set_deadline(api_config['timeout'])
+
+
+@app.before_request
+def start_profile():
+    if request.method == 'OPTIONS' or request.endpoint in (None, 'profiling_control', 'get_metrics'):
+        return
+    session = profiler.begin(request.url_rule.rule, g.user_id, request.content_length or 0,
+                             header=request.headers.get('X-Profile'))
+    if session is not None:
+        g.profile = session
+
+
+@app.after_request
+def record_request(response):
+    # Registered before report_deadline so that it runs after it (Flask
+    # runs after_request hooks in reverse) and sees the final status.
+    # Streamed responses are timed up to their first byte.
+    if 'started' in g:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe_request(request.method, route, response.status_code, time.perf_counter() - g.started)
+    return response
+
+
+@app.after_request
+def report_deadline(response):
+    # Routes turn any exception into a 500; once the deadline has passed
+    # that exception is the abandoned work, so report it as such
+    deadline = g.get('deadline')
+    if response.status_code == 500 and deadline is not None and deadline.expired():
+        admission.record_deadline_exceeded()
+        response, _ = shed_response(
+            504, 'DEADLINE_EXCEEDED', f'Request exceeded its {deadline.seconds}s deadline'
         )
-    ''')
+        response.status_code = 504
+    return response
+
+
+@app.after_request
+def finish_profile(response):
+    session = g.pop('profile', None)
+    if session is not None:
+        try:
+            response.headers['X-Profile-File'] = profiler.finish(session)
+        except OSError as e:
+            app.logger.error(f"Writing profile failed: {e}")
+    return response
+
+
+@app.teardown_request
+def release_db(exc=None):
+    # Error paths in the routes skip conn.close(); make sure nothing leaks
+    for conn in g.pop('db_connections', []):
+        conn.close()
+
+
+@app.teardown_request
+def stop_profile(exc=None):
+    # Only reached with a session still running if after_request was skipped
+    session = g.pop('profile', None)
+    if session is not None:
+        session.stop()
+
+
+@app.teardown_request
+def release_admission(exc=None):
+    if 'endpoint_class' in g:
+        admission.leave(g.pop('endpoint_class'))
+    clear_deadline()
+
+
+def init_db():
+    conn = get_db()
+    init_schema(conn)
+    conn.close()
+
+
+def run_retention():
+    conn = get_db()
+    try:
+        report = enforce_retention(conn, retention_config)
+    finally:
+        conn.close()
     
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS skills (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE,
-            category TEXT,
-            experience INTEGER DEFAULT 0,
-            level INTEGER DEFAULT 0,
-            last_practiced DATETIME,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+    app.logger.info(
+        f"Retention: deleted {report['deleted']}, reclaimed {report['vacuum']['reclaimed_bytes']} bytes"
+    )
+    return report
+
+
+def run_stats_reconcile():
+    conn = get_db()
+    try:
+        drift = reconcile_table_stats(conn)
+    finally:
+        conn.close()
     
-    conn.commit()
-    conn.close()
+    if drift:
+        app.logger.warning(f"table_stats drift corrected: {drift}")
+    return {'drift': drift}
 
 
 init_db()
 
+retention_config = get_config('retention')
+maintenance = MaintenanceScheduler(logger=app.logger)
+if retention_config['enabled']:
+    maintenance.add_task(
+        'retention',
+        retention_config['interval_minutes'] * 60,
+        run_retention,
+        initial_delay=retention_config['initial_delay_seconds']
+    )
+stats_config = get_config('stats')
+maintenance.add_task(
+    'stats_reconcile',
+    stats_config['reconcile_interval_minutes'] * 60,
+    run_stats_reconcile,
+    initial_delay=stats_config['reconcile_initial_delay_seconds']
+)
+
+
+def start_background():
+    """Start what runs beside the request handlers; called by the serving
+    entry points only, so importing this module starts nothing"""
+    maintenance.start()
+    if compute_pool:
+        # Warming the workers takes a couple of seconds; don't hold up startup
+        threading.Thread(target=start_compute_pool, name='supriai-compute-start', daemon=True).start()
+
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -158,6 +474,30 @@ def health_check():
     })
 
 
+def run_analysis(user_id, sessions, topics, profile, skills):
+    """Background job: run both engines over a synced payload and store the output"""
+    # Both engines read the same columns; the frame extracts them once
+    frame = SessionFrame.from_sessions(sessions)
+    insights = memoize('analyze', ai_engine, partial(ai_engine.analyze, frame=frame), sessions, topics)
+    recommendations = memoize(
+        'recommend', recommendation_engine, partial(recommendation_engine.generate, frame=frame),
+        sessions, topics, profile, skills
+    )
+    
+    conn = get_db()
+    try:
+        store_analysis(conn, user_id, insights, recommendations)
+    finally:
+        conn.close()
+    
+    return {
+        'insights_generated': len(insights),
+        'recommendations_generated': len(recommendations),
+        'insights': insights,
+        'recommendations': recommendations
+    }
+
+
 @app.route('/api/sync', methods=['POST'])
 def sync_data():
     """Store learning sessions in database"""
@@ -168,148 +508,59 @@ def sync_data():
         profile = data.get('profile', {})
         skills = data.get('skills', [])
         
-        conn = get_db()
-        cursor = conn.cursor()
+        batch = IngestBatch(sessions, topics, profile, skills, user_id=g.user_id,
+                            max_rejected_report=ingest_config['max_rejected_report'])
         
-        # Store sessions
-        sessions_stored = 0
-        for session in sessions:
-            try:
-                cursor.execute('''
-                    INSERT INTO sessions (url, domain, title, category, topics, duration,
-                        engagement_score, scroll_depth, date, timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    session.get('url', ''),
-                    session.get('domain', ''),
-                    session.get('title', 'Unknown'),
-                    session.get('category', 'General'),
-                    json.dumps(session.get('topics', [])),
-                    session.get('duration', 0),
-                    session.get('engagementScore', 0),
-                    session.get('scrollDepth', 0),
-                    session.get('date', datetime.now().strftime('%Y-%m-%d')),
-                    session.get('timestamp', int(datetime.now().timestamp() * 1000))
-                ))
-                sessions_stored += 1
-            except Exception as e:
-                app.logger.warning(f"Failed to store session: {e}")
-        
-        # Store topics
-        for topic in topics:
-            try:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO topics (name, category, total_time, session_count, avg_engagement, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    topic.get('name', 'Unknown'),
-                    topic.get('category', 'General'),
-                    topic.get('totalTime', 0),
-                    topic.get('sessionCount', 0),
-                    topic.get('averageEngagement', 0),
-                    datetime.now().isoformat()
-                ))
-            except Exception as e:
-                app.logger.warning(f"Failed to store topic: {e}")
-        
-        # Update profile
-        if profile:
-            try:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO user_profile 
-                    (id, interest_clusters, learning_style, skill_level, preferred_categories, weekly_goal, updated_at)
-                    VALUES (1, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    json.dumps(profile.get('interestClusters', [])),
-                    profile.get('learningStyle', 'balanced'),
-                    profile.get('skillLevel', 'beginner'),
-                    json.dumps(profile.get('preferredCategories', [])),
-                    profile.get('weeklyGoal', 0),
-                    datetime.now().isoformat()
-                ))
-            except Exception as e:
-                app.logger.warning(f"Failed to update profile: {e}")
-        
-        # Store skills
-        for skill in skills:
-            try:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO skills (name, category, experience, level, last_practiced, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    skill.get('name', 'Unknown'),
-                    skill.get('category', 'General'),
-                    skill.get('experience', 0),
-                    skill.get('level', 0),
-                    skill.get('lastPracticed'),
-                    datetime.now().isoformat()
-                ))
-            except Exception as e:
-                app.logger.warning(f"Failed to store skill: {e}")
-        
-        conn.commit()
+        conn = get_db()
+        report = batch.write(conn, chunk_size=ingest_config['chunk_size'])
         conn.close()
         
-        # Generate AI insights
-        insights = ai_engine.analyze(sessions, topics)
+        if batch.rejected:
+            app.logger.warning(f"Sync rejected {len(batch.rejected)} rows: {batch.rejected[:5]}")
+        app.logger.info(f"Ingested {report['rows_written']} rows at {report['rows_per_sec']} rows/sec")
         
-        # Generate recommendations
-        recommendations = recommendation_engine.generate(sessions, topics, profile, skills)
+        analysis = run_analysis
+        if 'profile' in g:
+            # The engines run in the background job, so profile it too
+            analysis = profiler.wrap(g.profile, run_analysis, tag='analysis')
         
-        # Store insights
-        conn = get_db()
-        cursor = conn.cursor()
-        for insight in insights:
-            try:
-                cursor.execute('''
-                    INSERT INTO ai_insights (insight_type, content, confidence)
-                    VALUES (?, ?, ?)
-                ''', (
-                    insight.get('type', 'general'),
-                    json.dumps(insight),
-                    insight.get('confidence', 0.5)
-                ))
-            except Exception as e:
-                app.logger.warning(f"Failed to store insight: {e}")
-        
-        # Store recommendations
-        cursor.execute('DELETE FROM recommendations')
-        for rec in recommendations:
-            try:
-                cursor.execute('''
-                    INSERT INTO recommendations (title, description, url, rec_type, priority, topic, category, score)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    rec.get('title', ''),
-                    rec.get('description', ''),
-                    rec.get('url'),
-                    rec.get('type', 'suggestion'),
-                    rec.get('priority', 'medium'),
-                    rec.get('topic'),
-                    rec.get('category'),
-                    rec.get('score', 0.5)
-                ))
-            except Exception as e:
-                app.logger.warning(f"Failed to store recommendation: {e}")
-        
-        conn.commit()
-        conn.close()
+        job_id = job_manager.submit(
+            'analysis', analysis,
+            g.user_id, batch.sessions, batch.topics, batch.profile, batch.skills,
+            user_id=g.user_id
+        )
         
         return jsonify({
             'success': True,
             'code': 'SYNC_COMPLETE',
             'data': {
-                'sessions_stored': sessions_stored,
-                'topics_processed': len(topics),
-                'skills_updated': len(skills),
-                'insights_generated': len(insights),
-                'recommendations_generated': len(recommendations)
+                # Every valid session, as before ingest became idempotent; resent ones are duplicates
+                'sessions_stored': report['sessions']['accepted'],
+                'sessions_new': report['sessions']['stored'],
+                'sessions_duplicate': report['sessions']['duplicates'],
+                'topics_processed': report['topics']['stored'],
+                'skills_updated': report['skills']['stored']
+            },
+            'job': {
+                'id': job_id,
+                'status': 'queued',
+                'status_url': f'/api/jobs/{job_id}'
             },
-            'insights': insights,
-            'recommendations': recommendations,
+            'ingest': {
+                'rows_processed': report['rows_processed'],
+                'rows_written': report['rows_written'],
+                'rows_rejected': report['rows_rejected'],
+                'elapsed_ms': report['elapsed_ms'],
+                'rows_per_sec': report['rows_per_sec']
+            },
+            'rejected': report['rejected_rows'],
             'timestamp': datetime.now().isoformat()
-        })
+        }), 202
         
+    except JobQueueFull as e:
+        # The sessions are stored; a retry dedupes them and queues the analysis
+        app.logger.warning(f"Sync analysis rejected: {e}")
+        return shed_response(503, 'BUSY', 'Analysis queue is full, retry shortly', retry_after=1)
     except Exception as e:
         app.logger.error(f"Sync error: {e}")
         return jsonify({
@@ -319,31 +570,168 @@ def sync_data():
         }), 500
 
 
-@app.route('/api/analytics', methods=['GET'])
-def get_analytics():
-    """Get analytics data with computed statistics"""
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status and result of a background job"""
+    job = job_manager.get(job_id)
+    
+    # Other users' jobs are indistinguishable from missing ones
+    if not job or job['user_id'] != g.user_id:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found',
+            'code': 'JOB_NOT_FOUND'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job,
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+@app.route('/api/maintenance/retention', methods=['POST'])
+def trigger_retention():
+    """Run the retention policy now instead of waiting for the scheduler"""
     try:
-        time_range = request.args.get('range', 'week')
-        days_ago = {'day': 1, 'week': 7, 'month': 30, 'year': 365}.get(time_range, 7)
+        if 'retention' in maintenance.get_status():
+            report = maintenance.run_task('retention')
+        else:
+            report = run_retention()
         
-        start_date = datetime.now() - timedelta(days=days_ago)
-        start_str = start_date.strftime('%Y-%m-%d')
+        return jsonify({
+            'success': True,
+            'report': report,
+            'timestamp': datetime.now().isoformat()
+        })
         
-        conn = get_db()
+    except Exception as e:
+        app.logger.error(f"Retention error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/maintenance/profiling', methods=['GET', 'POST'])
+def profiling_control():
+    """Arm profiling for the next requests, optionally for one route or user"""
+    try:
+        if request.method == 'POST':
+            data = request.json or {}
+            profiler.arm(
+                int(data.get('requests', 1)),
+                mode=data.get('mode'),
+                route=data.get('route'),
+                user_id=data.get('user_id')
+            )
+        
+        return jsonify({
+            'success': True,
+            'profiling': profiler.get_status(),
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        app.logger.error(f"Profiling control error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+def encode_cursor(timestamp, session_id):
+    raw = f'{timestamp}:{session_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises ValueError on malformed input"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    timestamp, session_id = base64.urlsafe_b64decode(padded.encode()).decode().split(':')
+    return int(timestamp), int(session_id)
+
+
+def stream_sessions(params, after):
+    """Yield NDJSON lines straight from the SQLite cursor, one batch at a time"""
+    conn = db_pool.acquire()
+    try:
+        cursor = conn.cursor()
+        if after:
+            cursor.execute(queries.ANALYTICS_SESSIONS_STREAM_AFTER, params + after)
+        else:
+            cursor.execute(queries.ANALYTICS_SESSIONS_STREAM, params)
+        
+        while True:
+            rows = cursor.fetchmany(analytics_config['stream_batch_size'])
+            if not rows:
+                break
+            yield ''.join(json.dumps(dict(row)) + '\n' for row in rows)
+    finally:
+        conn.close()
+
+
+def parse_analytics_args(args):
+    """(time_range, limit, after) from the query string; ValueError on a bad limit or cursor.
+
+    ``limit`` is None when the client asks for neither a limit nor a
+    cursor: clients written before paging (the dashboard) get every
+    session in the range, as they always did.
+    """
+    time_range = args.get('range', 'week')
+    after = decode_cursor(args['cursor']) if args.get('cursor') else None
+    if 'limit' not in args and after is None:
+        return time_range, None, None
+    limit = int(args.get('limit', analytics_config['page_size']))
+    limit = max(1, min(limit, analytics_config['max_page_size']))
+    return time_range, limit, after
+
+
+def analytics_range(user_id, time_range):
+    """First date of the range and the parameters of the session queries"""
+    days_ago = {'day': 1, 'week': 7, 'month': 30, 'year': 365}.get(time_range, 7)
+    
+    start_date = datetime.now() - timedelta(days=days_ago)
+    start_str = start_date.strftime('%Y-%m-%d')
+    
+    # Session dates are the client's local dates; a day of slack on the
+    # timestamp bound covers any timezone difference with the server
+    start_midnight = datetime.strptime(start_str, '%Y-%m-%d') - timedelta(days=1)
+    return start_str, (user_id, int(start_midnight.timestamp() * 1000), start_str)
+
+
+def analytics_data(user_id, time_range, limit, after):
+    """One page of sessions (every session in the range when ``limit`` is None) plus topics, insights and the range summary"""
+    start_str, session_params = analytics_range(user_id, time_range)
+    
+    conn = get_db()
+    try:
         cursor = conn.cursor()
         
-        # Get sessions
-        cursor.execute('''
-            SELECT * FROM sessions WHERE date >= ? ORDER BY timestamp DESC
-        ''', (start_str,))
+        # Get one page of sessions (one extra row tells us if there is more)
+        if limit is None:
+            cursor.execute(queries.ANALYTICS_SESSIONS_STREAM, session_params)
+        elif after:
+            cursor.execute(queries.ANALYTICS_SESSIONS_PAGE_AFTER, session_params + after + (limit + 1,))
+        else:
+            cursor.execute(queries.ANALYTICS_SESSIONS_PAGE, session_params + (limit + 1,))
         sessions = [dict(row) for row in cursor.fetchall()]
         
+        has_more = limit is not None and len(sessions) > limit
+        sessions = sessions[:limit]
+        next_cursor = encode_cursor(sessions[-1]['timestamp'], sessions[-1]['id']) if has_more else None
+        
         # Get topics
-        cursor.execute('SELECT * FROM topics ORDER BY total_time DESC')
+        cursor.execute(queries.TOPICS_BY_TIME, (user_id,))
         topics = [dict(row) for row in cursor.fetchall()]
         
         # Get insights
-        cursor.execute('SELECT * FROM ai_insights ORDER BY created_at DESC LIMIT 20')
+        cursor.execute(queries.LATEST_INSIGHTS, (user_id, 20))
         insights_raw = cursor.fetchall()
         insights = []
         for row in insights_raw:
@@ -354,39 +742,75 @@ def get_analytics():
                 pass
             insights.append(row_dict)
         
+        # Summary statistics come from the daily rollups, so their cost
+        # scales with the days in the range rather than the session count
+        cursor.execute(queries.ANALYTICS_SUMMARY, (user_id, start_str))
+        totals = cursor.fetchone()
+        
+        cursor.execute(queries.ANALYTICS_CATEGORY_BREAKDOWN, (user_id, start_str))
+        category_stats = {
+            row['category']: {'count': row['count'], 'time': row['time']}
+            for row in cursor.fetchall()
+        }
+    finally:
         conn.close()
+    
+    total_sessions = totals['total_sessions']
+    avg_engagement = round(totals['engagement_sum'] / max(total_sessions, 1))
+    unique_topics = len(set(t.get('name') for t in topics))
+    
+    return {
+        'data': {
+            'sessions': sessions,
+            'topics': topics,
+            'insights': insights
+        },
+        'pagination': {
+            'limit': limit,
+            'has_more': has_more,
+            'next_cursor': next_cursor
+        },
+        'summary': {
+            'totalTime': totals['total_time'],
+            'totalSessions': total_sessions,
+            'avgEngagement': avg_engagement,
+            'uniqueTopics': unique_topics,
+            'uniqueDays': totals['unique_days'],
+            'categoryBreakdown': category_stats
+        },
+        'timeRange': time_range
+    }
+
+
+@app.route('/api/analytics', methods=['GET'])
+def get_analytics():
+    """Get analytics data with computed statistics.
+    
+    Without ``limit`` or ``cursor`` every session in the range is
+    returned. With them, sessions are keyset-paginated newest first: pass
+    ``limit`` and the ``next_cursor`` of the previous page as ``cursor``
+    (``page_size`` when only a cursor is given). ``format=ndjson``
+    instead streams every session in the range as one JSON object per line.
+    """
+    try:
+        try:
+            time_range, limit, after = parse_analytics_args(request.args)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid limit or cursor'
+            }), 400
         
-        # Calculate statistics
-        total_time = sum(s.get('duration', 0) for s in sessions)
-        avg_engagement = round(sum(s.get('engagement_score', 0) for s in sessions) / max(len(sessions), 1))
-        unique_topics = len(set(t.get('name') for t in topics))
-        unique_days = len(set(s.get('date') for s in sessions))
-        
-        # Category breakdown
-        category_stats = {}
-        for s in sessions:
-            cat = s.get('category', 'Other')
-            if cat not in category_stats:
-                category_stats[cat] = {'count': 0, 'time': 0}
-            category_stats[cat]['count'] += 1
-            category_stats[cat]['time'] += s.get('duration', 0)
+        if request.args.get('format') == 'ndjson':
+            _, session_params = analytics_range(g.user_id, time_range)
+            return Response(
+                stream_with_context(stream_sessions(session_params, after)),
+                mimetype='application/x-ndjson'
+            )
         
         return jsonify({
             'success': True,
-            'data': {
-                'sessions': sessions,
-                'topics': topics,
-                'insights': insights
-            },
-            'summary': {
-                'totalTime': total_time,
-                'totalSessions': len(sessions),
-                'avgEngagement': avg_engagement,
-                'uniqueTopics': unique_topics,
-                'uniqueDays': unique_days,
-                'categoryBreakdown': category_stats
-            },
-            'timeRange': time_range,
+            **analytics_data(g.user_id, time_range, limit, after),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -398,41 +822,45 @@ def get_analytics():
         }), 500
 
 
-@app.route('/api/recommendations', methods=['GET'])
-def get_recommendations():
-    """Get current recommendations with metadata"""
+def recommendations_data(user_id, limit, category):
+    conn = get_db()
     try:
-        limit = int(request.args.get('limit', 10))
-        category = request.args.get('category')
-        
-        conn = get_db()
         cursor = conn.cursor()
         
         if category:
-            cursor.execute('''
-                SELECT * FROM recommendations WHERE category = ? ORDER BY score DESC LIMIT ?
-            ''', (category, limit))
+            cursor.execute(queries.RECOMMENDATIONS_BY_CATEGORY, (user_id, category, limit))
         else:
-            cursor.execute('''
-                SELECT * FROM recommendations ORDER BY score DESC LIMIT ?
-            ''', (limit,))
+            cursor.execute(queries.RECOMMENDATIONS_TOP, (user_id, limit))
         
         recommendations = [dict(row) for row in cursor.fetchall()]
         
-        cursor.execute('SELECT COUNT(*) as total FROM recommendations')
-        total = cursor.fetchone()['total']
-        
+        cursor.execute(queries.TABLE_ROW_COUNT, (user_id, 'recommendations'))
+        row = cursor.fetchone()
+        total = row['row_count'] if row else 0
+    finally:
         conn.close()
+    
+    return {
+        'recommendations': recommendations,
+        'metadata': {
+            'total': total,
+            'returned': len(recommendations),
+            'limit': limit,
+            'category': category
+        }
+    }
+
+
+@app.route('/api/recommendations', methods=['GET'])
+def get_recommendations():
+    """Get current recommendations with metadata"""
+    try:
+        limit = int(request.args.get('limit', 10))
+        category = request.args.get('category')
         
         return jsonify({
             'success': True,
-            'recommendations': recommendations,
-            'metadata': {
-                'total': total,
-                'returned': len(recommendations),
-                'limit': limit,
-                'category': category
-            },
+            **recommendations_data(g.user_id, limit, category),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -451,15 +879,18 @@ def get_patterns():
         conn = get_db()
         cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM sessions ORDER BY timestamp DESC LIMIT 100')
-        sessions = [dict(row) for row in cursor.fetchall()]
+        cursor.execute(queries.RECENT_SESSIONS, (g.user_id, 100))
+        rows = cursor.fetchall()
+        sessions = [dict(row) for row in rows]
         
-        cursor.execute('SELECT * FROM topics ORDER BY total_time DESC')
+        cursor.execute(queries.TOPICS_BY_TIME, (g.user_id,))
         topics = [dict(row) for row in cursor.fetchall()]
         
         conn.close()
         
-        patterns = ai_engine.detect_learning_patterns(sessions)
+        # The hours are decoded straight from the rows
+        stats = ai_engine.aggregate(sessions, SessionFrame.from_rows(rows))
+        patterns = ai_engine.detect_learning_patterns(sessions, stats)
         
         return jsonify({
             'success': True,
@@ -475,36 +906,38 @@ def get_patterns():
         }), 500
 
 
+def profile_data(user_id):
+    conn = get_db()
+    try:
+        row = conn.execute(queries.PROFILE, (user_id,)).fetchone()
+    finally:
+        conn.close()
+    
+    if not row:
+        return {}
+    
+    profile = dict(row)
+    try:
+        profile['interest_clusters'] = json.loads(profile.get('interest_clusters', '[]'))
+        profile['preferred_categories'] = json.loads(profile.get('preferred_categories', '[]'))
+    except:
+        pass
+    return profile
+
+
 @app.route('/api/profile', methods=['GET', 'POST'])
 def handle_profile():
     """Get or update user profile"""
     try:
-        conn = get_db()
-        cursor = conn.cursor()
-        
         if request.method == 'GET':
-            cursor.execute('SELECT * FROM user_profile WHERE id = 1')
-            row = cursor.fetchone()
-            conn.close()
-            
-            if row:
-                profile = dict(row)
-                try:
-                    profile['interest_clusters'] = json.loads(profile.get('interest_clusters', '[]'))
-                    profile['preferred_categories'] = json.loads(profile.get('preferred_categories', '[]'))
-                except:
-                    pass
-                return jsonify({'success': True, 'profile': profile})
-            else:
-                return jsonify({'success': True, 'profile': {}})
+            return jsonify({'success': True, 'profile': profile_data(g.user_id)})
         
         elif request.method == 'POST':
             data = request.json or {}
-            cursor.execute('''
-                INSERT OR REPLACE INTO user_profile 
-                (id, interest_clusters, learning_style, skill_level, preferred_categories, weekly_goal, updated_at)
-                VALUES (1, ?, ?, ?, ?, ?, ?)
-            ''', (
+            conn = get_db()
+            cursor = conn.cursor()
+            cursor.execute(PROFILE_UPSERT, (
+                g.user_id,
                 json.dumps(data.get('interestClusters', [])),
                 data.get('learningStyle', 'balanced'),
                 data.get('skillLevel', 'beginner'),
@@ -534,7 +967,10 @@ def analyze_content():
         title = data.get('title', '')
         content = data.get('content', '')
         
-        analysis = ai_engine.analyze_content(url, title, content)
+        analysis = single_flight.do(
+            'analyze', [url, title, content],
+            lambda: ai_engine.analyze_content(url, title, content)
+        )
         
         return jsonify({
             'success': True,
@@ -563,14 +999,25 @@ def topic_modeling():
                 'error': 'No texts provided'
             }), 400
         
-        topics = ai_engine.extract_topics(texts)
+        # Document frequencies of the request's terms in the user's synced titles
+        conn = get_db()
+        try:
+            term_stats = TermStats.load(conn, g.user_id, texts)
+        finally:
+            conn.close()
+        
+        result = run_compute('topics', {'texts': texts, 'term_stats': term_stats.to_dict()},
+                             lambda: {'topics': ai_engine.extract_topics(texts, term_stats)})
         
         return jsonify({
             'success': True,
-            'topics': topics,
+            'topics': result['topics'],
             'timestamp': datetime.now().isoformat()
         })
         
+    except (PoolBusy, TaskTimeout) as e:
+        app.logger.warning(f"Topic modeling rejected: {e}")
+        return compute_error_response(e)
     except Exception as e:
         app.logger.error(f"Topic modeling error: {e}")
         return jsonify({
@@ -579,6 +1026,43 @@ def topic_modeling():
         }), 500
 
 
+@app.route('/api/ai/cluster', methods=['POST'])
+def cluster_sessions():
+    """Cluster sessions by content similarity"""
+    try:
+        data = request.json or {}
+        sessions = data.get('sessions')
+        n_clusters = data.get('n_clusters', 5)
+        
+        if not isinstance(sessions, list):
+            conn = get_db()
+            cursor = conn.cursor()
+            cursor.execute(queries.RECENT_SESSIONS, (g.user_id, 200))
+            sessions = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+        
+        clusters = run_compute('cluster', {'sessions': sessions, 'n_clusters': n_clusters},
+                               lambda: ai_engine.cluster_sessions(sessions, n_clusters))
+        clusters.pop('success', None)
+        
+        return jsonify({
+            'success': True,
+            **clusters,
+            'timestamp': datetime.now().isoformat()
+        })
+        
+    except (PoolBusy, TaskTimeout) as e:
+        app.logger.warning(f"Clustering rejected: {e}")
+        return compute_error_response(e)
+    except Exception as e:
+        app.logger.error(f"Clustering error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'clusters': []
+        }), 500
+
+
 @app.route('/api/learning-path', methods=['POST'])
 def get_learning_path():
     """Generate personalized learning path using ML"""
@@ -588,11 +1072,15 @@ def get_learning_path():
         topics = data.get('topics', [])
         skills = data.get('skills', [])
         
-        # Generate learning path
-        learning_path = recommendation_engine.generate_personalized_path(sessions, topics, skills)
+        def compute():
+            # Generate learning path
+            learning_path = recommendation_engine.generate_personalized_path(sessions, topics, skills)
+            
+            # Predict next topic
+            next_topic = recommendation_engine.predict_next_topic(sessions, topics)
+            return learning_path, next_topic
         
-        # Predict next topic
-        next_topic = recommendation_engine.predict_next_topic(sessions, topics)
+        learning_path, next_topic = single_flight.do('learning_path', [sessions, topics, skills], compute)
         
         return jsonify({
             'success': True,
@@ -618,7 +1106,10 @@ def get_knowledge_gaps():
         skills = data.get('skills', [])
         
         # Calculate knowledge gaps
-        gaps = recommendation_engine.calculate_knowledge_gaps(topics, skills)
+        gaps = single_flight.do(
+            'knowledge_gaps', [topics, skills],
+            lambda: recommendation_engine.calculate_knowledge_gaps(topics, skills)
+        )
         
         return jsonify({
             'success': True,
@@ -657,11 +1148,7 @@ def predict_engagement():
         conn = get_db()
         cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT AVG(engagement_score) as avg_engagement, COUNT(*) as count
-            FROM sessions 
-            WHERE category = ?
-        ''', (analysis.get('category', 'general'),))
+        cursor.execute(queries.CATEGORY_ENGAGEMENT, (g.user_id, analysis.get('category', 'general')))
         
         result = cursor.fetchone()
         conn.close()
@@ -686,55 +1173,58 @@ def predict_engagement():
         }), 500
 
 
+def status_data(user_id):
+    ai_status = ai_engine.get_status()
+    rec_status = recommendation_engine.get_status()
+    
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(queries.TABLE_STATS, (user_id,))
+        stats = {row['table_name']: dict(row) for row in cursor.fetchall()}
+    finally:
+        conn.close()
+    
+    # A user with no rows in a table has no counter for it yet
+    for table in ('sessions', 'topics', 'recommendations', 'ai_insights', 'skills'):
+        stats.setdefault(table, {'row_count': 0, 'last_activity': None})
+    
+    return {
+        'service': 'SupriAI Backend',
+        'version': '2.0.0',
+        'status': 'operational',
+        'user_id': user_id,
+        'database': {
+            'status': 'connected',
+            'pool': db_pool.get_status(),
+            'data': {
+                'sessions': stats['sessions']['row_count'],
+                'topics': stats['topics']['row_count'],
+                'recommendations': stats['recommendations']['row_count'],
+                'insights': stats['ai_insights']['row_count'],
+                'skills': stats['skills']['row_count']
+            },
+            'last_activity': stats['sessions']['last_activity']
+        },
+        'ai_models': {
+            'ai_engine': ai_status,
+            'recommendation_engine': rec_status
+        },
+        'jobs': job_manager.get_status(),
+        'compute': compute_pool.get_status() if compute_pool else {'enabled': False},
+        'coalescing': single_flight.get_status(),
+        'result_cache': result_cache.get_status() if result_cache else {'enabled': False},
+        'admission': admission.get_status(),
+        'maintenance': maintenance.get_status()
+    }
+
+
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Comprehensive status endpoint with AI model information"""
     try:
-        ai_status = ai_engine.get_status()
-        rec_status = recommendation_engine.get_status()
-        
-        conn = get_db()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT COUNT(*) as count FROM sessions')
-        sessions_count = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM topics')
-        topics_count = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM recommendations')
-        recs_count = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM ai_insights')
-        insights_count = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT COUNT(*) as count FROM skills')
-        skills_count = cursor.fetchone()['count']
-        
-        cursor.execute('SELECT MAX(created_at) as last FROM sessions')
-        last_activity = cursor.fetchone()['last']
-        
-        conn.close()
-        
         return jsonify({
-            'service': 'SupriAI Backend',
-            'version': '2.0.0',
-            'status': 'operational',
-            'database': {
-                'status': 'connected',
-                'data': {
-                    'sessions': sessions_count,
-                    'topics': topics_count,
-                    'recommendations': recs_count,
-                    'insights': insights_count,
-                    'skills': skills_count
-                },
-                'last_activity': last_activity
-            },
-            'ai_models': {
-                'ai_engine': ai_status,
-                'recommendation_engine': rec_status
-            },
+            **status_data(g.user_id),
             'timestamp': datetime.now().isoformat()
         })
         
@@ -747,6 +1237,12 @@ def get_status():
         }), 500
 
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Request, SQL and engine stage metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+
 if __name__ == '__main__':
     server_config = get_config('server')
     print('=' * 60)
@@ -755,6 +1251,11 @@ if __name__ == '__main__':
     print(f"Health Check: http://localhost:{server_config['port']}/api/health")
     print('=' * 60)
     
+    # With debug on, the reloader's watcher process runs this block too;
+    # only the child it serves from (WERKZEUG_RUN_MAIN) starts the workers
+    if not server_config['debug'] or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background()
+    
     app.run(
         host=server_config['host'],
         port=server_config['port'],
@@ -0,0 +1,326 @@
+"""
+Async serving mode for the backend.
+
+The read endpoints polled by the extension (/api/analytics,
+/api/recommendations, /api/profile and /api/status) are served on an
+asyncio event loop, so an idle keep-alive connection costs a coroutine
+rather than a thread. Their SQLite work runs on a small bounded thread
+pool. Every other route is handed to the Flask app on a second bounded
+pool, which keeps a single server and port.
+
+Run with ``python asgi.py`` (needs uvicorn) or with any ASGI server, e.g.
+``uvicorn asgi:application``.
+"""
+import asyncio
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from importlib.util import find_spec
+from io import BytesIO
+from urllib.parse import parse_qsl
+
+import app as backend
+from admission import clear_deadline, set_deadline
+from config import get_config
+
+UVICORN_AVAILABLE = find_spec('uvicorn') is not None
+
+
+def analytics(args, user_id):
+    try:
+        try:
+            time_range, limit, after = backend.parse_analytics_args(args)
+        except ValueError:
+            return 400, {
+                'success': False,
+                'error': 'Invalid limit or cursor'
+            }
+
+        return 200, {
+            'success': True,
+            **backend.analytics_data(user_id, time_range, limit, after),
+            'timestamp': datetime.now().isoformat()
+        }
+    except Exception as e:
+        backend.app.logger.error(f"Analytics error: {e}")
+        return 500, {
+            'success': False,
+            'error': str(e)
+        }
+
+
+def recommendations(args, user_id):
+    try:
+        limit = int(args.get('limit', 10))
+        return 200, {
+            'success': True,
+            **backend.recommendations_data(user_id, limit, args.get('category')),
+            'timestamp': datetime.now().isoformat()
+        }
+    except Exception as e:
+        backend.app.logger.error(f"Recommendations error: {e}")
+        return 500, {
+            'success': False,
+            'error': str(e)
+        }
+
+
+def profile(args, user_id):
+    try:
+        return 200, {'success': True, 'profile': backend.profile_data(user_id)}
+    except Exception as e:
+        backend.app.logger.error(f"Profile error: {e}")
+        return 500, {
+            'success': False,
+            'error': str(e)
+        }
+
+
+def status(args, user_id):
+    try:
+        return 200, {
+            **backend.status_data(user_id),
+            'timestamp': datetime.now().isoformat()
+        }
+    except Exception as e:
+        backend.app.logger.error(f"Status error: {e}")
+        return 500, {
+            'status': 'error',
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }
+
+
+READ_ROUTES = {
+    '/api/analytics': analytics,
+    '/api/recommendations': recommendations,
+    '/api/profile': profile,
+    '/api/status': status,
+}
+
+
+def render(handler, args, user_id):
+    """Run a read handler under the request deadline and encode its body; called on the database pool"""
+    deadline = set_deadline(backend.api_config['timeout'])
+    try:
+        code, body = handler(args, user_id)
+    finally:
+        clear_deadline()
+
+    if code == 500 and deadline.expired():
+        backend.admission.record_deadline_exceeded()
+        code, body = 504, {
+            'success': False,
+            'error': f'Request exceeded its {deadline.seconds}s deadline',
+            'code': 'DEADLINE_EXCEEDED'
+        }
+    return code, backend.app.json.dumps(body).encode()
+
+
+def run_wsgi(wsgi_app, environ):
+    """Call a WSGI app to completion; returns (status, headers, body)"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response['headers']]
+    return response['status'], headers, body
+
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        # WSGI carries the raw UTF-8 path bytes as a latin-1 string
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        key = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f'HTTP_{key}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class AsyncApp:
+    """ASGI application: native async read endpoints, Flask for the rest"""
+
+    def __init__(self, flask_app, db_threads=8, wsgi_threads=8):
+        self.flask_app = flask_app
+        self.db_executor = ThreadPoolExecutor(db_threads, thread_name_prefix='supriai-asgi-db')
+        self.wsgi_executor = ThreadPoolExecutor(wsgi_threads, thread_name_prefix='supriai-asgi-wsgi')
+        self.cors_origins = get_config('cors')['origins']
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        handler = READ_ROUTES.get(scope['path']) if scope['method'] == 'GET' else None
+        if handler is None:
+            await self.call_flask(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        args = {}
+        for name, value in parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True):
+            args.setdefault(name, value)
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        extra_headers = self.cors_headers(headers.get('origin'))
+
+        loop = asyncio.get_running_loop()
+        user_id = backend.resolve_user_id(headers.get('x-user-id'), args.get('user'))
+        retry_after = 0
+        if user_id is not None:
+            retry_after = backend.admission.check_rate((scope.get('client') or ('',))[0], 'read')
+
+        if user_id is None:
+            code, body = 400, backend.app.json.dumps(backend.INVALID_USER).encode()
+        elif retry_after:
+            code, body = 429, backend.app.json.dumps({
+                'success': False,
+                'error': 'Rate limit exceeded',
+                'code': 'RATE_LIMITED'
+            }).encode()
+            extra_headers = extra_headers + [(b'retry-after', str(max(1, math.ceil(retry_after))).encode())]
+        elif handler is analytics and args.get('format') == 'ndjson':
+            await self.stream_analytics(args, user_id, send, extra_headers)
+            backend.observe_request('GET', scope['path'], 200, time.perf_counter() - started)
+            return
+        else:
+            code, body = await loop.run_in_executor(self.db_executor, render, handler, args, user_id)
+
+        await send({
+            'type': 'http.response.start',
+            'status': code,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(body)).encode())] + extra_headers
+        })
+        await send({'type': 'http.response.body', 'body': body})
+        backend.observe_request('GET', scope['path'], code, time.perf_counter() - started)
+
+    def cors_headers(self, origin):
+        """The Access-Control-Allow-Origin header flask-cors would add"""
+        if origin and (self.cors_origins == '*' or origin in self.cors_origins):
+            return [(b'access-control-allow-origin', origin.encode('latin-1')), (b'vary', b'Origin')]
+        return []
+
+    async def stream_analytics(self, args, user_id, send, extra_headers):
+        """``format=ndjson``: fetch each batch on the database pool and send it as it comes"""
+        loop = asyncio.get_running_loop()
+        try:
+            time_range, _, after = backend.parse_analytics_args(args)
+        except ValueError:
+            body = backend.app.json.dumps({'success': False, 'error': 'Invalid limit or cursor'}).encode()
+            await send({'type': 'http.response.start', 'status': 400,
+                        'headers': [(b'content-type', b'application/json')] + extra_headers})
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+        _, session_params = backend.analytics_range(user_id, time_range)
+        lines = backend.stream_sessions(session_params, after)
+        try:
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'application/x-ndjson')] + extra_headers})
+            while True:
+                chunk = await loop.run_in_executor(self.db_executor, next, lines, None)
+                if chunk is None:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Hands the connection back even if the client went away mid-stream
+            await loop.run_in_executor(self.db_executor, lines.close)
+
+    async def call_flask(self, scope, receive, send):
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                break
+
+        loop = asyncio.get_running_loop()
+        code, headers, content = await loop.run_in_executor(
+            self.wsgi_executor, run_wsgi, self.flask_app, wsgi_environ(scope, bytes(body))
+        )
+        await send({'type': 'http.response.start', 'status': code, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                backend.start_background()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def close(self):
+        self.db_executor.shutdown(wait=False)
+        self.wsgi_executor.shutdown(wait=False)
+        backend.maintenance.stop()
+        if backend.compute_pool:
+            backend.compute_pool.shutdown()
+
+
+asgi_config = get_config('asgi')
+application = AsyncApp(
+    backend.app,
+    db_threads=asgi_config['db_threads'],
+    wsgi_threads=asgi_config['wsgi_threads']
+)
+
+
+if __name__ == '__main__':
+    if not UVICORN_AVAILABLE:
+        print('The async serving mode needs uvicorn: pip install uvicorn')
+        sys.exit(1)
+    import uvicorn
+
+    server_config = get_config('server')
+    print('=' * 60)
+    print('SupriAI Backend Server (ASGI + AI Engine)')
+    print(f"Server URL: http://localhost:{server_config['port']}")
+    print(f"Health Check: http://localhost:{server_config['port']}/api/health")
+    print('=' * 60)
+
+    uvicorn.run(
+        application,
+        host=server_config['host'],
+        port=server_config['port'],
+        # Extension clients poll on an interval; keep their connections open between polls
+        timeout_keep_alive=asgi_config['keep_alive_seconds']
+    )
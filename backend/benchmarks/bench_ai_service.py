@@ -0,0 +1,104 @@
+"""
+Per-call latency of ai_service.py: a cold process per call (how server.js
+used to call it) versus requests to a warm `ai_service.py serve` daemon.
+
+Usage: python benchmarks/bench_ai_service.py [--calls 10] [--sessions 200] [--workers 2]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AI_SERVICE = os.path.join(BACKEND_DIR, 'ai_service.py')
+
+ACTIONS = ['status', 'summary', 'analyze', 'recommend']
+
+
+def make_payload(n):
+    now = int(time.time() * 1000)
+    sessions = [{
+        'url': f'https://example.com/{i}',
+        'domain': random.choice(['example.com', 'docs.python.org', 'stackoverflow.com']),
+        'title': random.choice(['Python tutorial', 'Docker guide', 'SQL index video', 'React hooks article']),
+        'category': random.choice(['programming', 'devops', 'data_science']),
+        'topics': ['python'],
+        'duration': random.randint(1000, 3600000),
+        'engagementScore': random.randint(0, 100),
+        'scrollDepth': random.randint(0, 100),
+        'timestamp': now - i * 60000
+    } for i in range(n)]
+    topics = [{'name': 'python', 'category': 'programming', 'totalTime': 3600000, 'sessionCount': 10}]
+    return {'sessions': sessions, 'topics': topics, 'profile': {}, 'skills': []}
+
+
+def cold_call(action, payload):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, AI_SERVICE, action, json.dumps(payload)],
+                   check=True, capture_output=True, cwd=BACKEND_DIR)
+    return (time.perf_counter() - start) * 1000
+
+
+class Daemon:
+    def __init__(self, workers):
+        start = time.perf_counter()
+        self.process = subprocess.Popen(
+            [sys.executable, AI_SERVICE, 'serve', '--workers', str(workers)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            cwd=BACKEND_DIR, text=True
+        )
+        json.loads(self.process.stdout.readline())
+        self.startup_ms = (time.perf_counter() - start) * 1000
+        self.next_id = 0
+
+    def call(self, action, payload):
+        self.next_id += 1
+        start = time.perf_counter()
+        self.process.stdin.write(json.dumps({'id': self.next_id, 'action': action, 'data': payload}) + '\n')
+        self.process.stdin.flush()
+        response = json.loads(self.process.stdout.readline())
+        elapsed = (time.perf_counter() - start) * 1000
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return elapsed
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=10)
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    random.seed(7)
+    payload = make_payload(args.sessions)
+
+    daemons = {'warm daemon (inline)': Daemon(0), f'warm daemon ({args.workers} workers)': Daemon(args.workers)}
+
+    print(f'{args.sessions} sessions per payload, median ms over {args.calls} calls')
+    for name, daemon in daemons.items():
+        print(f'  {name} startup: {daemon.startup_ms:.0f} ms')
+    print()
+    print(f'  {"action":<12} {"cold spawn":>12}' + ''.join(f' {name:>28}' for name in daemons))
+
+    for action in ACTIONS:
+        cold = statistics.median(cold_call(action, payload) for _ in range(args.calls))
+        warm = [statistics.median(daemon.call(action, payload) for _ in range(args.calls))
+                for daemon in daemons.values()]
+        print(f'  {action:<12} {cold:>12.1f}' + ''.join(
+            f' {value:>18.1f} (x{cold / value:>5.1f})' for value in warm))
+
+    for daemon in daemons.values():
+        daemon.close()
+
+
+if __name__ == '__main__':
+    main()
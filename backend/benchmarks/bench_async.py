@@ -0,0 +1,174 @@
+"""
+Load test for many idle-polling extension clients: each client polls
+/api/status on an interval, over one keep-alive connection where the
+server allows it. Compares the threaded Flask server (a thread per
+connection, closed after every response) with the async mode in asgi.py,
+reporting poll latency and the server's peak thread count and RSS.
+
+Needs uvicorn for the async mode. Thread and memory figures come from
+/proc and are Linux-only.
+
+Usage: python benchmarks/bench_async.py [--clients 2000] [--interval 5] [--duration 30] [--jitter 1.0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER = '''
+import sys
+sys.path.insert(0, {backend!r})
+import config
+config.DATABASE_CONFIG['path'] = {db!r}
+config.RETENTION_CONFIG['enabled'] = False
+config.COMPUTE_CONFIG['enabled'] = False
+if {mode!r} == 'flask':
+    import app
+    app.app.run(host='127.0.0.1', port={port}, threaded=True)
+else:
+    import uvicorn
+    import asgi
+    uvicorn.run(asgi.application, host='127.0.0.1', port={port}, log_level='warning',
+                timeout_keep_alive=300, backlog=4096)
+'''
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, db, port):
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVER.format(backend=BACKEND_DIR, db=db, mode=mode, port=port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    for _ in range(200):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health').read()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+def seed(port):
+    now = int(time.time() * 1000)
+    sessions = [{
+        'url': f'https://example.com/{i}', 'domain': 'example.com', 'title': f'Python tutorial {i}',
+        'category': 'programming', 'duration': 600000, 'engagementScore': 70,
+        'timestamp': now - i * 60000
+    } for i in range(500)]
+    request = urllib.request.Request(f'http://127.0.0.1:{port}/api/sync', data=json.dumps({'sessions': sessions}).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    urllib.request.urlopen(request).read()
+
+
+def proc_status(pid):
+    """(threads, rss in MiB) of a process, or (None, None) off Linux"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            fields = dict(line.split(':', 1) for line in f)
+    except OSError:
+        return None, None
+    return int(fields['Threads']), int(fields['VmRSS'].split()[0]) / 1024
+
+
+async def poll(client_id, port, interval, jitter, deadline, latencies, errors):
+    # One user per client, so each gets its own rate-limit bucket
+    request = (f'GET /api/status HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n'
+               f'X-User-Id: client-{client_id}\r\n\r\n').encode()
+    reader = writer = None
+    await asyncio.sleep(random.uniform(0, interval * jitter))
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            # The Flask dev server closes every connection, so its clients
+            # pay for a reconnect on each poll
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            head = (await reader.readuntil(b'\r\n\r\n')).lower()
+            length = next(int(line.split(b':')[1]) for line in head.split(b'\r\n')
+                          if line.startswith(b'content-length'))
+            await reader.readexactly(length)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if b'connection: close' in head:
+                writer.close()
+                reader = writer = None
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, StopIteration):
+            errors.append(1)
+            if writer:
+                writer.close()
+            reader = writer = None
+        await asyncio.sleep(max(interval - (time.perf_counter() - start), 0))
+    if writer:
+        writer.close()
+
+
+async def sample(pid, deadline, peaks):
+    while time.monotonic() < deadline:
+        threads, rss = proc_status(pid)
+        if threads is not None:
+            peaks['threads'] = max(peaks.get('threads', 0), threads)
+            peaks['rss'] = max(peaks.get('rss', 0), rss)
+        await asyncio.sleep(0.5)
+
+
+async def load(pid, port, clients, interval, jitter, duration):
+    latencies, errors, peaks = [], [], {}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(sample(pid, deadline, peaks),
+                         *(poll(i, port, interval, jitter, deadline, latencies, errors) for i in range(clients)))
+    return latencies, errors, peaks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=2000)
+    parser.add_argument('--interval', type=float, default=5)
+    parser.add_argument('--duration', type=float, default=30)
+    # Fraction of the interval over which clients spread their polls; 0 has
+    # every client poll at once, like extension alarms firing together
+    parser.add_argument('--jitter', type=float, default=1.0)
+    parser.add_argument('--modes', default='flask,asgi')
+    args = parser.parse_args()
+
+    random.seed(7)
+    print(f'{args.clients} clients polling /api/status every {args.interval}s for {args.duration}s '
+          f'(jitter {args.jitter:.0%} of the interval)\n')
+    print(f'  {"server":<8} {"polls":>7} {"errors":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+          f'{"threads":>8} {"rss MiB":>8}')
+
+    for mode in args.modes.split(','):
+        db = os.path.join(tempfile.mkdtemp(prefix='supriai-async-'), 'async.db')
+        port = free_port()
+        process = start_server(mode, db, port)
+        try:
+            seed(port)
+            latencies, errors, peaks = asyncio.run(
+                load(process.pid, port, args.clients, args.interval, args.jitter, args.duration))
+        finally:
+            process.terminate()
+            process.wait()
+
+        latencies.sort()
+        pct = lambda p: latencies[max(int(len(latencies) * p) - 1, 0)] if latencies else float('nan')
+        print(f'  {mode:<8} {len(latencies):>7} {len(errors):>7} {statistics.median(latencies) if latencies else float("nan"):>8.2f} '
+              f'{pct(0.95):>8.2f} {pct(0.99):>8.2f} {peaks.get("threads", "-"):>8} {peaks.get("rss", 0):>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
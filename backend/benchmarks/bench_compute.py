@@ -0,0 +1,98 @@
+"""
+Latency of cheap requests (/api/health) while clustering requests run
+concurrently, with clustering inline in the Flask process versus offloaded
+to the compute pool.
+
+Usage: python benchmarks/bench_compute.py [--sessions 3000] [--clusterers 4] [--probes 50]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+config.DATABASE_CONFIG['path'] = os.path.join(tempfile.mkdtemp(prefix='supriai-compute-'), 'compute.db')
+config.RETENTION_CONFIG['enabled'] = False
+# Measure the pool, not admission control
+config.API_CONFIG['rate_limits']['compute'] = 0
+
+import app as backend
+
+
+def make_sessions(n):
+    words = ['python', 'docker', 'sql', 'react', 'pandas', 'kubernetes', 'index', 'hooks', 'tutorial', 'guide']
+    return [{
+        'title': ' '.join(random.sample(words, 4)) + f' {i}',
+        'domain': random.choice(['example.com', 'docs.python.org', 'stackoverflow.com']),
+        'category': random.choice(['programming', 'devops', 'data_science']),
+        'duration': random.randint(1000, 3600000),
+        'engagementScore': random.randint(0, 100),
+        'timestamp': 1700000000000 + i * 60000
+    } for i in range(n)]
+
+
+def probe_while_clustering(pool, sessions, clusterers, probes):
+    backend.compute_pool = pool
+    client = backend.app.test_client()
+    stop = threading.Event()
+    statuses = []
+
+    def cluster():
+        while not stop.is_set():
+            statuses.append(client.post('/api/ai/cluster', json={'sessions': sessions}).status_code)
+
+    threads = [threading.Thread(target=cluster) for _ in range(clusterers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+
+    latencies = []
+    for _ in range(probes):
+        start = time.perf_counter()
+        client.get('/api/health')
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.02)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1], statuses, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=3000)
+    parser.add_argument('--clusterers', type=int, default=4)
+    parser.add_argument('--probes', type=int, default=50)
+    args = parser.parse_args()
+
+    random.seed(7)
+    sessions = make_sessions(args.sessions)
+    pool = backend.compute_pool
+    if pool is None:
+        sys.exit('compute pool is disabled in config.py')
+    pool.start()
+
+    print(f'{args.clusterers} concurrent /api/ai/cluster loops over {args.sessions} sessions, '
+          f'/api/health p50 / p95 ms over {args.probes} probes\n')
+    for name, mode in (('inline', None), (f'pool ({pool.workers} workers)', pool)):
+        p50, p95, statuses, elapsed = probe_while_clustering(mode, sessions, args.clusterers, args.probes)
+        counts = {code: statuses.count(code) for code in sorted(set(statuses))}
+        print(f'  {name:<20} {p50:>8.2f} {p95:>8.2f}   '
+              f'cluster {len(statuses) / elapsed:>6.2f}/s {counts}')
+
+    pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Requests/sec on /api/analytics and /api/sync with per-request connections
+versus the pooled WAL connections.
+
+Usage: python benchmarks/bench_db_pool.py [--requests 400] [--threads 8]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+_tmpdir = tempfile.mkdtemp(prefix='supriai-bench-')
+config.DATABASE_CONFIG['path'] = os.path.join(_tmpdir, 'bootstrap.db')
+
+import app as backend
+from db_pool import ConnectionPool
+
+CATEGORIES = ['programming', 'web_development', 'data_science', 'devops', 'database']
+
+
+def make_sessions(n):
+    now = int(time.time() * 1000)
+    sessions = []
+    for i in range(n):
+        ts = now - random.randint(0, 6 * 24 * 3600 * 1000)
+        sessions.append({
+            'url': f'https://example.com/page/{i}',
+            'domain': 'example.com',
+            'title': f'Tutorial {i} on code and data',
+            'category': random.choice(CATEGORIES),
+            'topics': ['python'],
+            'duration': random.randint(60000, 3600000),
+            'engagementScore': random.randint(10, 100),
+            'scrollDepth': random.randint(0, 100),
+            'date': time.strftime('%Y-%m-%d', time.localtime(ts / 1000)),
+            'timestamp': ts
+        })
+    return sessions
+
+
+def use_pool(pool):
+    if backend.db_pool is not pool:
+        backend.db_pool.close_all()
+    backend.db_pool = pool
+    backend.init_db()
+
+
+def run(label, method, path, payload, n_requests, n_threads):
+    def worker(count):
+        client = backend.app.test_client()
+        for _ in range(count):
+            if method == 'GET':
+                resp = client.get(path)
+            else:
+                resp = client.post(path, json=payload)
+            assert resp.status_code < 300, resp.get_data(as_text=True)
+
+    per_thread = max(n_requests // n_threads, 1)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        list(executor.map(worker, [per_thread] * n_threads))
+    elapsed = time.perf_counter() - start
+    rps = (per_thread * n_threads) / elapsed
+    print(f'  {label:<28} {path:<16} {rps:>9.1f} req/s')
+    return rps
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seed-sessions', type=int, default=2000)
+    parser.add_argument('--sync-sessions', type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(42)
+    seed = make_sessions(args.seed_sessions)
+    payload = {'sessions': make_sessions(args.sync_sessions), 'topics': [], 'skills': []}
+
+    db_config = config.DATABASE_CONFIG
+    setups = [
+        ('per-request (rollback jrnl)', ConnectionPool(
+            os.path.join(_tmpdir, 'before.db'), size=0, timeout=db_config['timeout'],
+            journal_mode=None, synchronous=None, cache_size_kb=0)),
+        ('pooled (WAL)', ConnectionPool(
+            os.path.join(_tmpdir, 'after.db'), size=db_config['pool_size'],
+            timeout=db_config['timeout'], journal_mode=db_config['journal_mode'],
+            synchronous=db_config['synchronous'], cache_size_kb=db_config['cache_size_kb'],
+            mmap_size=db_config['mmap_size'])),
+    ]
+
+    print(f'{args.requests} requests, {args.threads} threads, {args.seed_sessions} seeded sessions')
+    results = {}
+    for label, pool in setups:
+        use_pool(pool)
+        backend.app.test_client().post('/api/sync', json={'sessions': seed})
+        results[label] = (
+            run(label, 'GET', '/api/analytics', None, args.requests, args.threads),
+            run(label, 'POST', '/api/sync', payload, args.requests, args.threads),
+        )
+
+    before, after = results[setups[0][0]], results[setups[1][0]]
+    print(f'speedup: analytics x{after[0] / before[0]:.2f}, sync x{after[1] / before[1]:.2f}')
+    backend.db_pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
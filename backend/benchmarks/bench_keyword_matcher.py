@@ -0,0 +1,93 @@
+"""
+Keyword classification of long page contents: one ``kw in text`` scan per
+keyword against a KeywordMatcher, for the engine's keyword lists and for
+lists ten times as long. "dense" pages mention a keyword in one word of a
+hundred, so most keywords occur early; "sparse" pages mention none, like
+a page off every topic, and each scan reads the whole page. "build"
+compiles the automaton (once per engine), "matcher" scores a page with
+it. "analyze_content" is the whole call on the engine with its own
+keyword lists.
+
+Usage: python benchmarks/bench_keyword_matcher.py [--sizes 2000,50000,500000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_engine import EDUCATIONAL, AIAnalysisEngine
+from bench_session_aggregation import timed
+from keyword_matcher import KeywordMatcher
+
+
+def make_vocabulary(rng, n=20000):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(2, 10))) for _ in range(n)]
+
+
+def make_page(rng, vocabulary, keywords, size):
+    # Zipf-like word frequencies, with a keyword now and then
+    words = []
+    length = 0
+    while length < size:
+        if keywords and rng.random() < 0.01:
+            word = rng.choice(keywords)
+        else:
+            word = vocabulary[min(int(rng.paretovariate(1.1)) - 1, len(vocabulary) - 1)]
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)
+
+
+def scan_each(groups, text):
+    scores = {}
+    for group, keywords in groups.items():
+        score = sum(1 for kw in keywords if kw in text)
+        if score > 0:
+            scores[group] = score
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='2000,50000,500000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    engine = AIAnalysisEngine()
+    vocabulary = make_vocabulary(rng)
+    base = {**engine.topic_keywords, EDUCATIONAL: engine.edu_indicators}
+    large = {f'{group}_{i}': keywords + [rng.choice(vocabulary) + rng.choice(vocabulary) for _ in range(len(keywords))]
+             for group, keywords in base.items() for i in range(5)}
+
+    print(f'median milliseconds per page over {args.repeat} runs\n')
+    print(f'  {"keywords":>9} {"page bytes":>11} {"page":>7} {"per keyword":>12} {"build":>9} {"matcher":>9}'
+          f' {"analyze_content":>16}')
+    # Sparse pages are drawn from vocabulary words absent from every keyword
+    plain = [word for word in vocabulary if not any(kw in word for words in large.values() for kw in words)]
+    for groups in (base, large):
+        count = sum(len(keywords) for keywords in groups.values())
+        keywords = [kw for words in groups.values() for kw in words]
+        matcher = KeywordMatcher(groups)
+        for size, kind in [(int(value), kind) for value in args.sizes.split(',') for kind in ('dense', 'sparse')]:
+            if kind == 'dense':
+                page = make_page(rng, vocabulary, keywords, size)
+            else:
+                page = make_page(rng, plain, [], size)
+            assert scan_each(groups, page) == matcher.scores(page)
+
+            each = timed(lambda: scan_each(groups, page), args.repeat)
+            build = timed(lambda: KeywordMatcher(groups), args.repeat)
+            scored = timed(lambda: matcher.scores(page), args.repeat)
+            content = '-'
+            if groups is base:
+                content = f"{timed(lambda: engine.analyze_content('', '', page), args.repeat) * 1000:.2f}"
+            print(f'  {count:>9} {len(page):>11,} {kind:>7} {each * 1000:>12.2f} {build * 1000:>9.2f}'
+                  f' {scored * 1000:>9.2f} {content:>16}')
+
+
+if __name__ == '__main__':
+    main()
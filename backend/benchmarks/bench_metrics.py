@@ -0,0 +1,65 @@
+"""
+Overhead of the /api/metrics instrumentation on the hot paths: a histogram
+observation, an engine stage timer, and a primary-key SQLite lookup through
+a pooled connection with and without statement timing.
+
+Usage: python benchmarks/bench_metrics.py [--iterations 200000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import ConnectionPool
+from metrics import Histogram, engine_stage
+
+
+def per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    histogram = Histogram('bench_seconds', 'bench', ('route',))
+
+    def stage():
+        with engine_stage('bench', 'noop'):
+            pass
+
+    path = os.path.join(tempfile.mkdtemp(prefix='supriai-metrics-'), 'bench.db')
+    setup = ConnectionPool(path, size=1)
+    with setup.acquire() as conn:
+        conn.execute('CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)')
+        conn.executemany('INSERT INTO t VALUES (?, ?)', [(i, str(i)) for i in range(1000)])
+    setup.close_all()
+
+    plain = ConnectionPool(path, size=1)
+    timed = ConnectionPool(path, size=1, on_query=lambda sql, seconds: histogram.observe(seconds, 'sql'))
+
+    def lookup_us(pool):
+        conn = pool.acquire()
+        try:
+            return per_call_us(lambda: conn.execute('SELECT v FROM t WHERE id = ?', (500,)).fetchone(), n)
+        finally:
+            conn.close()
+
+    print(f'microseconds per call over {n} calls\n')
+    print(f'  {"histogram observe":<28} {per_call_us(lambda: histogram.observe(0.003, "/api/status"), n):>8.3f}')
+    print(f'  {"engine stage timer":<28} {per_call_us(stage, n):>8.3f}')
+    untimed = lookup_us(plain)
+    with_timing = lookup_us(timed)
+    print(f'  {"sqlite lookup":<28} {untimed:>8.3f}')
+    print(f'  {"sqlite lookup, timed":<28} {with_timing:>8.3f}  (+{with_timing - untimed:.3f})')
+
+if __name__ == '__main__':
+    main()
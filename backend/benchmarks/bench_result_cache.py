@@ -0,0 +1,86 @@
+"""
+Cost of the engine calls the extension repeats most: computed without the
+result cache, on a cache miss, and served from the memory tier or from the
+disk tier as a fresh process would see it after a restart. Hits still pay
+for hashing the inputs and decoding the stored result.
+
+Usage: python benchmarks/bench_result_cache.py [--sessions 200,2000,10000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_engine import AIAnalysisEngine
+from recommendation_engine import MLRecommendationEngine
+from result_cache import DiskTier, ResultCache
+
+
+def make_payload(n):
+    now = int(time.time() * 1000)
+    sessions = [{
+        'url': f'https://example.com/{i}',
+        'domain': random.choice(['example.com', 'docs.python.org', 'stackoverflow.com']),
+        'title': random.choice(['Python tutorial', 'Docker guide', 'SQL index video', 'React hooks article']),
+        'category': random.choice(['programming', 'devops', 'data_science']),
+        'topics': ['python'],
+        'duration': random.randint(1000, 3600000),
+        'engagementScore': random.randint(0, 100),
+        'scrollDepth': random.randint(0, 100),
+        'timestamp': now - i * 60000
+    } for i in range(n)]
+    topics = [{'name': name, 'category': 'programming', 'totalTime': random.randint(0, 36000000), 'sessionCount': 10}
+              for name in ('python', 'docker', 'sql', 'react')]
+    return sessions, topics
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', default='200,2000,10000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(7)
+    ai_engine = AIAnalysisEngine()
+    rec_engine = MLRecommendationEngine()
+    disk_path = os.path.join(tempfile.mkdtemp(prefix='supriai-cache-'), 'result_cache.db')
+
+    print(f'median ms over {args.repeat} calls of analyze + generate\n')
+    print(f'  {"sessions":>8} {"no cache":>10} {"miss":>10} {"memory hit":>11} {"disk hit":>10} {"cached bytes":>13}')
+    for n in [int(value) for value in args.sessions.split(',')]:
+        sessions, topics = make_payload(n)
+
+        def compute(cache):
+            cache.memoize('analyze', ai_engine.cache_version, ai_engine.analyze, sessions, topics)
+            cache.memoize('recommend', rec_engine.cache_version, rec_engine.generate, sessions, topics, {}, [])
+
+        uncached = timed(lambda: (ai_engine.analyze(sessions, topics),
+                                  rec_engine.generate(sessions, topics, {}, [])), args.repeat)
+        # A miss also pays for hashing the inputs and serializing the result
+        miss = timed(lambda: compute(ResultCache(ttl=600)), args.repeat)
+
+        warm = ResultCache(ttl=600, disk=DiskTier(disk_path, 256 * 1024 * 1024))
+        compute(warm)
+        memory = timed(lambda: compute(warm), args.repeat)
+        # A new ResultCache has an empty memory tier, like a restarted process
+        disk = timed(lambda: compute(ResultCache(ttl=600, disk=DiskTier(disk_path, 256 * 1024 * 1024))), args.repeat)
+
+        print(f'  {n:>8} {uncached:>10.2f} {miss:>10.2f} {memory:>11.3f} {disk:>10.3f} {warm.get_status()["bytes"]:>13}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Time AIAnalysisEngine.analyze on large session histories, end to end and
+for the single aggregation pass its session insights are built from.
+
+Usage: python benchmarks/bench_session_aggregation.py [--sessions 10000,100000,1000000] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_engine import AIAnalysisEngine
+
+try:
+    from session_stats import aggregate_sessions
+except ImportError:
+    aggregate_sessions = None
+
+TITLES = ['Python tutorial video', 'Docker guide', 'SQL index documentation', 'React hooks article',
+          'Kubernetes hands-on project', 'Statistics quiz', 'Neural network diagram', 'Linux book chapter']
+PATHS = ['docs', 'watch', 'blog', 'learn']
+CATEGORIES = ['programming', 'devops', 'data_science', 'web_development', 'database']
+
+
+def make_sessions(n):
+    # Each page is visited about four times and keeps its title, as in real
+    # browsing history; shared strings keep a million sessions in memory
+    now = int(time.time() * 1000)
+    rng = random.Random(n)
+    pages = [(f'https://example.com/{rng.choice(PATHS)}/{i}', rng.choice(TITLES)) for i in range(max(1, n // 4))]
+    dates = {}
+    sessions = []
+    for i in range(n):
+        url, title = rng.choice(pages)
+        timestamp = now - rng.randint(0, 90 * 86400000)
+        day = timestamp // 86400000
+        date = dates.get(day)
+        if date is None:
+            date = dates[day] = time.strftime('%Y-%m-%d', time.localtime(timestamp / 1000))
+        sessions.append({
+            'url': url,
+            'title': title,
+            'category': rng.choice(CATEGORIES),
+            'topics': ['python'],
+            'duration': rng.randint(1000, 3600000),
+            'engagementScore': rng.randint(0, 100),
+            'scrollDepth': rng.randint(0, 100),
+            'timestamp': timestamp,
+            'date': date
+        })
+    return sessions
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    engine = AIAnalysisEngine()
+    topics = [{'name': 'python', 'category': 'programming', 'totalTime': 36000000, 'sessionCount': 10}]
+
+    print(f'median seconds over {args.repeat} runs\n')
+    print(f'  {"sessions":>9} {"analyze":>9} {"aggregate":>10} {"sessions/s":>12}')
+    for n in [int(value) for value in args.sessions.split(',')]:
+        sessions = make_sessions(n)
+        total = timed(lambda: engine.analyze(sessions, topics), args.repeat)
+        aggregate = '-'
+        if aggregate_sessions is not None:
+            aggregate = f'{timed(lambda: aggregate_sessions(sessions, engine.style_matcher), args.repeat):.3f}'
+        print(f'  {n:>9} {total:>9.3f} {aggregate:>10} {n / total:>12,.0f}')
+        del sessions
+
+
+if __name__ == '__main__':
+    main()
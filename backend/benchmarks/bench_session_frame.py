@@ -0,0 +1,95 @@
+"""
+Session analyses that run over a SessionFrame: time per call at growing
+history sizes, what extracting every column costs, what decoding the
+timestamps into local hour, day and weekday costs on top of that, and the
+columns' memory next to the session dicts they replace. "separate" runs
+every analysis above plus the sync job's two engine calls, each building
+its own frame; "shared" runs them over one frame, as a request does.
+
+A single analysis spends most of its time reading the fields out of the
+session dicts ("columns"), which the dict loops it replaced did as well,
+so on its own it runs about as fast as they did; what a frame saves is
+reading them again for every further analysis of the same sessions.
+
+Usage: python benchmarks/bench_session_frame.py [--sessions 10000,100000,1000000] [--repeat 3] [--no-numpy]
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import session_frame
+from ai_engine import AIAnalysisEngine
+from bench_session_aggregation import make_sessions, timed
+from recommendation_engine import MLRecommendationEngine
+from session_frame import CALENDAR_COLUMNS, LABEL_COLUMNS, NUMERIC_COLUMNS, SessionFrame
+
+
+def build_all(sessions):
+    frame = SessionFrame.from_sessions(sessions)
+    for name in NUMERIC_COLUMNS:
+        frame.column(name)
+    for name in LABEL_COLUMNS:
+        frame.codes(name)
+    return frame
+
+
+def with_timestamps(sessions):
+    frame = SessionFrame.from_sessions(sessions)
+    frame.column('timestamp')
+    return frame
+
+
+def run_all(ai_engine, rec_engine, sessions, frame=None):
+    ai_engine.analyze(sessions, [], frame=frame)
+    rec_engine.generate(sessions, [], {}, [], frame=frame)
+    ai_engine.analyze_history_advanced(sessions, frame=frame)
+    ai_engine.predict_learning_interests(sessions, frame=frame)
+    ai_engine.generate_learning_summary(sessions, frame=frame)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-numpy', action='store_true', help='use the array.array fallback')
+    args = parser.parse_args()
+    if args.no_numpy:
+        session_frame.NUMPY_AVAILABLE = False
+
+    ai_engine = AIAnalysisEngine()
+    rec_engine = MLRecommendationEngine()
+    calls = [
+        ('history', ai_engine.analyze_history_advanced),
+        ('predict', ai_engine.predict_learning_interests),
+        ('summary', ai_engine.generate_learning_summary),
+        ('patterns', rec_engine.pattern_based_recommendations),
+    ]
+
+    print(f'median seconds over {args.repeat} runs ({"array" if args.no_numpy else "numpy"} columns)\n')
+    header = ''.join(f'{name:>10}' for name, _ in calls)
+    print(f'  {"sessions":>9}{header}{"columns":>10}{"calendar":>10}{"separate":>10}{"shared":>10}'
+          f'{"dict MB":>10}{"frame MB":>10}')
+    for n in [int(value) for value in args.sessions.split(',')]:
+        tracemalloc.start()
+        sessions = make_sessions(n)
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        row = ''.join(f'{timed(lambda: fn(sessions), args.repeat):>10.3f}' for _, fn in calls)
+        build = timed(lambda: build_all(sessions), args.repeat)
+        frames = iter([with_timestamps(sessions) for _ in range(args.repeat)])
+        decode = timed(lambda: next(frames).column(CALENDAR_COLUMNS[0]), args.repeat)
+        separate = timed(lambda: run_all(ai_engine, rec_engine, sessions), args.repeat)
+        shared = timed(lambda: run_all(ai_engine, rec_engine, sessions, SessionFrame.from_sessions(sessions)),
+                       args.repeat)
+        frame = build_all(sessions)
+        print(f'  {n:>9}{row}{build:>10.3f}{decode:>10.3f}{separate:>10.3f}{shared:>10.3f}'
+              f'{dict_bytes / 1e6:>10.1f}{frame.nbytes / 1e6:>10.1f}')
+        del sessions, frame
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Cold-start report for the engines and the ai_service.py CLI: wall time of a
+fresh interpreter per scenario, plus an import-time breakdown taken from
+``python -X importtime``.
+
+Usage: python benchmarks/bench_startup.py [--runs 3] [--top 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SESSIONS = json.dumps({'sessions': [
+    {'title': f'Python tutorial part {i}', 'domain': 'example.com', 'category': 'programming',
+     'duration': 600000, 'engagementScore': 70, 'timestamp': 1700000000000 + i * 60000}
+    for i in range(20)
+]})
+
+SCENARIOS = [
+    ('import engines', ['-c', 'import ai_engine, recommendation_engine']),
+    ('cli status', ['ai_service.py', 'status']),
+    ('cli summary', ['ai_service.py', 'summary', SESSIONS]),
+    ('cli recommend', ['ai_service.py', 'recommend', SESSIONS]),
+    # Needs scikit-learn, so this one pays for the import on first use
+    ('cli cluster', ['ai_service.py', 'cluster', SESSIONS]),
+]
+
+
+def parse_importtime(stderr):
+    """Return (total_ms, {top-level module: cumulative ms}) from -X importtime output"""
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nesting is shown by indentation; depth 0 is one space after the bar
+        if name.startswith('  '):
+            continue
+        top_level[name.strip()] = int(cumulative) / 1000
+    return sum(top_level.values()), top_level
+
+
+def run(args):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args,
+                            capture_output=True, text=True, cwd=BACKEND_DIR)
+    wall = (time.perf_counter() - start) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-500:])
+    total, modules = parse_importtime(result.stderr)
+    return wall, total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'median of {args.runs} fresh interpreters\n')
+    for name, command in SCENARIOS:
+        runs = [run(command) for _ in range(args.runs)]
+        wall = statistics.median(r[0] for r in runs)
+        imports = statistics.median(r[1] for r in runs)
+        modules = runs[-1][2]
+
+        print(f'{name:<16} wall {wall:>8.1f} ms   imports {imports:>8.1f} ms')
+        for module, ms in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+            print(f'    {module:<32} {ms:>8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
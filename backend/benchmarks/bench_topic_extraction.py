@@ -0,0 +1,83 @@
+"""
+Topic extraction per request: fitting a TfidfVectorizer on the request's
+texts, as /api/topic-modeling used to, against loading the stored
+document frequencies of their terms and only transforming. "refit corpus"
+is what corpus-wide idf would cost without the store: a fit over every
+stored title on each request. "ingest" is the extra cost per synced
+session of keeping the counts up to date.
+
+Usage: python benchmarks/bench_topic_extraction.py [--corpus 100000] [--texts 10,100,1000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from ai_engine import AIAnalysisEngine
+from bench_keyword_matcher import make_vocabulary
+from bench_session_aggregation import timed
+from schema import init_schema
+from term_stats import TermStats, record_documents
+
+
+def make_titles(rng, vocabulary, n):
+    return [' '.join(vocabulary[min(int(rng.paretovariate(1.1)) - 1, len(vocabulary) - 1)]
+                     for _ in range(rng.randint(3, 10))) for _ in range(n)]
+
+
+def fit_per_call(texts):
+    vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+    matrix = vectorizer.fit_transform(texts)
+    names = vectorizer.get_feature_names_out()
+    for i in range(len(texts)):
+        scores = matrix[i].toarray().flatten()
+        [names[idx] for idx in scores.argsort()[-5:][::-1] if scores[idx] > 0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--corpus', type=int, default=100000)
+    parser.add_argument('--texts', default='10,100,1000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vocabulary = make_vocabulary(rng)
+    corpus = make_titles(rng, vocabulary, args.corpus)
+    engine = AIAnalysisEngine()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        init_schema(conn)
+        batches = [corpus[start:start + 500] for start in range(0, len(corpus), 500)]
+        remaining = iter(batches)
+
+        def ingest_batch():
+            with conn:
+                record_documents(conn, 'bench', next(remaining))
+        ingest = timed(ingest_batch, len(batches)) / 500
+        refit = timed(lambda: TfidfVectorizer(stop_words='english').fit(corpus), args.repeat)
+
+        print(f'stored corpus: {args.corpus:,} titles, ingest +{ingest * 1e6:.1f} us/session,'
+              f' refit corpus {refit * 1000:.0f} ms\n')
+        print('median milliseconds per request\n')
+        print(f'  {"texts":>7} {"fit per call":>13} {"load":>9} {"transform":>10} {"load+transform":>15}')
+        for n in [int(value) for value in args.texts.split(',')]:
+            texts = make_titles(rng, vocabulary, n)
+            stats = TermStats.load(conn, 'bench', texts)
+            fit = timed(lambda: fit_per_call(texts), args.repeat)
+            load = timed(lambda: TermStats.load(conn, 'bench', texts), args.repeat)
+            transform = timed(lambda: engine.extract_topics(texts, stats), args.repeat)
+            print(f'  {n:>7,} {fit * 1000:>13.2f} {load * 1000:>9.2f} {transform * 1000:>10.2f}'
+                  f' {(load + transform) * 1000:>15.2f}')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
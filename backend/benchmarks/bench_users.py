@@ -0,0 +1,99 @@
+"""
+Per-user route query latency as the number of users sharing the database
+grows. With user_id leading every index, one user's queries should cost
+the same whether the file holds ten users or thousands.
+
+Usage: python benchmarks/bench_users.py [--users 10,100,1000,5000] [--sessions-per-user 100]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queries
+from db_pool import ConnectionPool
+from ingest import IngestBatch
+from schema import init_schema
+
+
+def make_sessions(n, now):
+    return [{
+        'url': f'https://example.com/{i}',
+        'domain': random.choice(['example.com', 'docs.python.org', 'stackoverflow.com']),
+        'title': f'Page {i}',
+        'category': random.choice(['programming', 'devops', 'data_science']),
+        'topics': ['python'],
+        'duration': random.randint(1000, 3600000),
+        'engagementScore': random.randint(0, 100),
+        'scrollDepth': random.randint(0, 100),
+        'timestamp': now - random.randint(0, 30 * 86400 * 1000)
+    } for i in range(n)]
+
+
+def route_queries(user_id, now):
+    start_str = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+    lower = now - 8 * 86400 * 1000
+    return {
+        'analytics page': (queries.ANALYTICS_SESSIONS_PAGE, (user_id, lower, start_str, 501)),
+        'analytics summary': (queries.ANALYTICS_SUMMARY, (user_id, start_str)),
+        'category breakdown': (queries.ANALYTICS_CATEGORY_BREAKDOWN, (user_id, start_str)),
+        'patterns sessions': (queries.RECENT_SESSIONS, (user_id, 100)),
+        'predict engagement': (queries.CATEGORY_ENGAGEMENT, (user_id, 'programming')),
+        'status counters': (queries.TABLE_STATS, (user_id,)),
+    }
+
+
+def measure(conn, user_ids, now, samples):
+    timings = {}
+    for user_id in random.sample(user_ids, min(samples, len(user_ids))):
+        for name, (sql, params) in route_queries(user_id, now).items():
+            start = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', default='10,100,1000,5000')
+    parser.add_argument('--sessions-per-user', type=int, default=100)
+    parser.add_argument('--samples', type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(7)
+    steps = [int(n) for n in args.users.split(',')]
+    now = int(time.time() * 1000)
+
+    pool = ConnectionPool(os.path.join(tempfile.mkdtemp(prefix='supriai-users-'), 'users.db'), size=1)
+    conn = pool.acquire()
+    init_schema(conn)
+
+    user_ids = []
+    print(f'{args.sessions_per_user} sessions per user, p50 / p95 ms over {args.samples} sampled users\n')
+    for total in steps:
+        # Grow the same database so each step adds users on top of the last
+        while len(user_ids) < total:
+            user_id = f'user-{len(user_ids)}'
+            IngestBatch(make_sessions(args.sessions_per_user, now), [], {}, [], user_id=user_id).write(conn)
+            user_ids.append(user_id)
+        conn.execute('ANALYZE')
+
+        rows = conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        print(f'{total} users ({rows} sessions)')
+        for name, values in measure(conn, user_ids, now, args.samples).items():
+            values.sort()
+            p95 = values[int(len(values) * 0.95) - 1]
+            print(f'  {name:<20} {statistics.median(values):>8.3f} {p95:>8.3f}')
+
+    conn.close()
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import threading
+
+from admission import check_deadline, current_deadline
+
+
+def request_key(name, payload):
+    """Canonical hash of a JSON payload: key order and whitespace don't matter"""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(f'{name}\n{body}'.encode()).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces identical concurrent computations.
+
+    The first caller for a key runs ``fn``; callers that arrive with the
+    same key while it is still running wait for it and get the same
+    result (or exception) instead of computing their own. Nothing is kept
+    once the call finishes, so this is not a cache: a request that comes
+    in afterwards computes afresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {}
+
+    def do(self, name, payload, fn):
+        key = request_key(name, payload)
+        with self._lock:
+            stats = self._stats.setdefault(name, {'calls': 0, 'executed': 0, 'coalesced': 0, 'errors': 0})
+            stats['calls'] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                stats['executed'] += 1
+            else:
+                stats['coalesced'] += 1
+
+        if not leader:
+            deadline = current_deadline()
+            if not call.done.wait(deadline.remaining() if deadline else None):
+                check_deadline()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def get_status(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'endpoints': {name: dict(stats) for name, stats in self._stats.items()}
+            }
@@ -0,0 +1,178 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+AI_SERVICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ai_service.py')
+
+
+class PoolBusy(Exception):
+    """Every worker is busy and the queue is full"""
+
+
+class TaskTimeout(Exception):
+    """A task did not finish within its timeout"""
+
+
+class ComputePool:
+    """Runs CPU-bound engine calls on an ``ai_service.py serve`` daemon.
+
+    The daemon owns a pool of worker processes with pre-warmed engines, so
+    TF-IDF fits and KMeans runs never hold the GIL of a Flask worker. At
+    most ``workers + max_queue`` tasks are in flight; beyond that ``run``
+    raises PoolBusy at once rather than queueing. A task that times out
+    keeps its slot until the daemon actually finishes it, so abandoned
+    work still counts against the bound.
+    """
+
+    def __init__(self, workers=2, max_queue=8, timeout=30, logger=None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.logger = logger
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        # Serializes starting the daemon, which takes seconds, so that
+        # ``_lock`` is never held while waiting for it
+        self._spawn_lock = threading.Lock()
+        self._process = None
+        self._pending = {}
+        self._next_id = 0
+        self._stats = {'completed': 0, 'failed': 0, 'rejected': 0, 'timed_out': 0}
+
+    def start(self):
+        """Start the daemon now instead of on the first task"""
+        self._ensure_process()
+
+    def _running_process(self):
+        with self._lock:
+            process = self._process
+        return process if process and process.poll() is None else None
+
+    def _ensure_process(self):
+        """The running daemon, started first if needed; call without holding ``_lock``"""
+        process = self._running_process()
+        if process:
+            return process
+
+        with self._spawn_lock:
+            # Another caller may have started it while we waited
+            process = self._running_process()
+            if process:
+                return process
+            process = self._spawn()
+            with self._lock:
+                self._process = process
+            # Started only once published, so its exit sweep always sees it
+            threading.Thread(
+                target=self._read_responses, args=(process,), name='supriai-compute-reader', daemon=True
+            ).start()
+            return process
+
+    def _spawn(self):
+        process = subprocess.Popen(
+            [sys.executable, AI_SERVICE, 'serve',
+             '--workers', str(self.workers),
+             '--max-pending', str(self.workers + self.max_queue)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            cwd=os.path.dirname(AI_SERVICE), text=True, encoding='utf-8'
+        )
+        # Blocks until the workers have imported the ML libraries
+        ready = process.stdout.readline()
+        if not ready:
+            raise RuntimeError(f'ai_service daemon exited with code {process.wait()}')
+        return process
+
+    def _read_responses(self, process):
+        for line in process.stdout:
+            try:
+                response = json.loads(line)
+            except ValueError:
+                continue
+            with self._lock:
+                entry = self._pending.pop(response.get('id'), None)
+            if entry:
+                entry[1].set_result(response)
+
+        # The daemon is gone; fail whatever it still owed us. Unpublishing
+        # it under the same lock means run() can't register a task with it
+        # after this sweep
+        with self._lock:
+            if self._process is process:
+                self._process = None
+            orphaned = [request_id for request_id, (owner, _) in self._pending.items() if owner is process]
+            futures = [self._pending.pop(request_id)[1] for request_id in orphaned]
+        for future in futures:
+            future.set_exception(RuntimeError('ai_service daemon exited'))
+        if self.logger:
+            self.logger.warning(f'Compute daemon exited with code {process.wait()}')
+
+    def _finished(self, future):
+        self._slots.release()
+        with self._lock:
+            if future.exception() is None and 'result' in future.result():
+                self._stats['completed'] += 1
+            else:
+                self._stats['failed'] += 1
+
+    def run(self, action, data, timeout=None):
+        """Run an ai_service action in a worker process and return its result"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise PoolBusy(f'compute pool is full ({self.workers + self.max_queue} tasks in flight)')
+
+        future = Future()
+        future.add_done_callback(self._finished)
+
+        request_id = None
+        try:
+            process = self._ensure_process()
+            with self._lock:
+                if self._process is not process:
+                    raise RuntimeError('ai_service daemon exited')
+                self._next_id += 1
+                request_id = self._next_id
+                self._pending[request_id] = (process, future)
+                process.stdin.write(json.dumps({'id': request_id, 'action': action, 'data': data}) + '\n')
+                process.stdin.flush()
+        except Exception as e:
+            if request_id is not None:
+                with self._lock:
+                    self._pending.pop(request_id, None)
+            if not future.done():
+                future.set_exception(e)
+            raise
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            response = future.result(timeout=timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._stats['timed_out'] += 1
+            raise TaskTimeout(f'{action} did not finish within {timeout:g}s')
+
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def get_status(self):
+        with self._lock:
+            running = self._process is not None and self._process.poll() is None
+            return {
+                'enabled': True,
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'timeout_seconds': self.timeout,
+                'daemon_pid': self._process.pid if running else None,
+                'in_flight': len(self._pending),
+                **self._stats
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._process and self._process.poll() is None:
+                # EOF on stdin lets the daemon finish in-flight work and exit
+                self._process.stdin.close()
@@ -13,12 +13,17 @@ SERVER_CONFIG = {
 DATABASE_CONFIG = {
     'path': BASE_DIR / 'supriai.db',
     'timeout': 30,
+    'pool_size': 8,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size_kb': 16000,
+    'mmap_size': 64 * 1024 * 1024,
 }
 
 CORS_CONFIG = {
     'origins': '*',
     'methods': ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-    'allow_headers': ['Content-Type', 'Authorization'],
+    'allow_headers': ['Content-Type', 'Authorization', 'X-User-Id'],
 }
 
 AI_CONFIG = {
@@ -28,6 +33,46 @@ AI_CONFIG = {
     'max_recommendations': 10,
 }
 
+AI_SERVICE_CONFIG = {
+    # ai_service.py serve: worker processes, each with its own engines
+    'workers': 2,
+    # requests in flight before the daemon stops reading stdin
+    'max_pending': 32,
+}
+
+COMPUTE_CONFIG = {
+    # Offload topic modeling and clustering to a pool of ai_service worker
+    # processes; disabled runs them inline in the Flask worker
+    'enabled': True,
+    'workers': 2,
+    # tasks waiting for a worker before new ones are rejected with 503
+    'max_queue': 8,
+    'task_timeout_seconds': 30,
+}
+
+ASGI_CONFIG = {
+    # asgi.py: threads for blocking SQLite reads behind the async endpoints
+    'db_threads': 8,
+    # threads for every other route, which still runs through Flask
+    'wsgi_threads': 8,
+    # idle keep-alive connections are cheap here; don't make pollers reconnect
+    'keep_alive_seconds': 75,
+}
+
+RESULT_CACHE_CONFIG = {
+    # Memoizes analyze, analyze_history_advanced, predict_learning_interests
+    # and generate by a hash of their inputs and the engine version
+    'enabled': True,
+    'max_entries': 512,
+    'max_bytes': 64 * 1024 * 1024,
+    'ttl_seconds': 600,
+    # optional SQLite tier that survives restarts and is shared by every
+    # process, including the ai_service workers
+    'disk_enabled': False,
+    'disk_path': BASE_DIR / 'data' / 'result_cache.db',
+    'max_disk_bytes': 256 * 1024 * 1024,
+}
+
 LOGGING_CONFIG = {
     'level': 'INFO',
     'format': '[%(asctime)s] %(levelname)s in %(module)s: %(message)s',
@@ -36,16 +81,70 @@ LOGGING_CONFIG = {
     'backup_count': 5,
 }
 
+PROFILING_CONFIG = {
+    # profile any request sent with an X-Profile header ('pstats' or
+    # 'collapsed'); otherwise only requests armed through
+    # POST /api/maintenance/profiling are profiled
+    'allow_header': False,
+    'default_mode': 'pstats',
+    'sample_interval_seconds': 0.005,
+    # next to the server log; only the newest max_files profiles are kept
+    'output_dir': BASE_DIR / 'logs',
+    'max_files': 50,
+}
+
 API_CONFIG = {
     'version': '1.0.0',
+    # requests per minute per client, for each endpoint class below
     'rate_limit': 100,
+    # seconds a request may run before its SQLite and engine work is abandoned
     'timeout': 30,
+    # per-class overrides of rate_limit (0 disables it); a bucket holds up to
+    # rate_burst requests
+    'rate_limits': {'read': 600, 'write': 100, 'compute': 60},
+    'rate_burst': 20,
+    # requests of a class running at once across all clients; more get a 503
+    'concurrency_limits': {'write': 4, 'compute': 8},
+    'max_tracked_clients': 10000,
+    # X-Admin-Token the /api/maintenance endpoints require; they answer 404
+    # while it is unset
+    'admin_token': os.environ.get('SUPRIAI_ADMIN_TOKEN'),
+}
+
+ANALYTICS_CONFIG = {
+    'page_size': 500,
+    'max_page_size': 5000,
+    'stream_batch_size': 1000,
+}
+
+INGEST_CONFIG = {
+    'chunk_size': 500,
+    'max_rejected_report': 100,
+}
+
+JOBS_CONFIG = {
+    'workers': 2,
+    'max_finished_jobs': 1000,
+    # queued plus running jobs; /api/sync answers 503 past this
+    'max_active_jobs': 32,
 }
 
 RETENTION_CONFIG = {
     'sessions_days': 90,
     'insights_days': 30,
     'recommendations_days': 7,
+    'enabled': True,
+    'interval_minutes': 60,
+    'initial_delay_seconds': 60,
+    'batch_size': 1000,
+    'batch_pause_ms': 50,
+    'vacuum_pages': 0,
+}
+
+STATS_CONFIG = {
+    # table_stats is trigger-maintained; reconcile recounts to fix any drift
+    'reconcile_interval_minutes': 360,
+    'reconcile_initial_delay_seconds': 120,
 }
 
 FEATURES = {
@@ -62,9 +161,18 @@ def get_config(section=None):
         'database': DATABASE_CONFIG,
         'cors': CORS_CONFIG,
         'ai': AI_CONFIG,
+        'ai_service': AI_SERVICE_CONFIG,
+        'compute': COMPUTE_CONFIG,
+        'asgi': ASGI_CONFIG,
+        'result_cache': RESULT_CACHE_CONFIG,
         'logging': LOGGING_CONFIG,
+        'profiling': PROFILING_CONFIG,
         'api': API_CONFIG,
+        'analytics': ANALYTICS_CONFIG,
+        'ingest': INGEST_CONFIG,
+        'jobs': JOBS_CONFIG,
         'retention': RETENTION_CONFIG,
+        'stats': STATS_CONFIG,
         'features': FEATURES,
     }
     
@@ -0,0 +1,200 @@
+import sqlite3
+import threading
+import time
+import queue
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor reporting each statement's duration to ``on_query(sql, seconds)``.
+
+    Only execute() is timed. SQLite runs a SELECT up to its first row
+    there, so rows fetched afterwards are not included.
+    """
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.on_query(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.on_query(sql, time.perf_counter() - start)
+
+
+class PooledConnection:
+    """Thin proxy around a pooled sqlite3 connection.
+
+    Routes keep calling ``conn.close()`` as before; here that hands the
+    connection back to the pool instead of tearing it down.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args):
+        on_query = self._pool.on_query
+        if on_query is None or args:
+            return self._raw.cursor(*args)
+        cursor = self._raw.cursor(TimedCursor)
+        cursor.on_query = on_query
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        if self._pool.on_query is None:
+            return self._raw.execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if self._pool.on_query is None:
+            return self._raw.executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self._raw.commit()
+        self.close()
+        return False
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(self._raw)
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections.
+
+    Connections are opened lazily up to ``size``, configured once with
+    the journal/cache/synchronous pragmas and then reused across requests.
+    A ``size`` of 0 disables pooling and opens a fresh connection per
+    checkout, which is what the backend did before the pool existed.
+    When ``on_query`` is set, statements run through the pooled
+    connections are timed and reported to it (see ``TimedCursor``).
+    """
+
+    def __init__(self, path, size=8, timeout=30, journal_mode='WAL',
+                 synchronous='NORMAL', cache_size_kb=16000, mmap_size=0, on_query=None):
+        self.path = str(path)
+        self.size = size
+        self.timeout = timeout
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.on_query = on_query
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+
+        if self.journal_mode:
+            conn.execute(f'PRAGMA journal_mode={self.journal_mode}')
+        if self.synchronous:
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        if self.cache_size_kb:
+            # Negative cache_size is interpreted by SQLite as KiB, not pages
+            conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        if self.mmap_size:
+            conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+
+        return conn
+
+    def acquire(self):
+        if self._closed:
+            raise RuntimeError('Connection pool is closed')
+
+        if self.size <= 0:
+            return PooledConnection(self, self._connect())
+
+        try:
+            raw = self._idle.get_nowait()
+        except queue.Empty:
+            raw = None
+            with self._lock:
+                if self._opened < self.size:
+                    self._opened += 1
+                    opening = True
+                else:
+                    opening = False
+
+            if opening:
+                try:
+                    raw = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opened -= 1
+                    raise
+            else:
+                try:
+                    raw = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(
+                        f'Timed out after {self.timeout}s waiting for a database connection'
+                    )
+
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        if self.size <= 0 or self._closed:
+            raw.close()
+            return
+
+        try:
+            # Never hand the next request a half-finished transaction, or
+            # the previous request's deadline
+            if raw.in_transaction:
+                raw.rollback()
+            raw.set_progress_handler(None, 0)
+        except sqlite3.Error:
+            raw.close()
+            with self._lock:
+                self._opened -= 1
+            return
+
+        self._idle.put(raw)
+
+    def close_all(self):
+        self._closed = True
+        while True:
+            try:
+                raw = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            raw.close()
+        with self._lock:
+            self._opened = 0
+
+    def get_status(self):
+        return {
+            'size': self.size,
+            'open': self._opened,
+            'idle': self._idle.qsize(),
+            'journal_mode': self.journal_mode,
+            'synchronous': self.synchronous,
+            'cache_size_kb': self.cache_size_kb
+        }
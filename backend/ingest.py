@@ -0,0 +1,403 @@
+import json
+import time
+from datetime import datetime
+
+from schema import DEFAULT_USER_ID
+from term_stats import record_documents
+
+
+# OR IGNORE is a backstop: duplicates are normally filtered out before the
+# insert (see IngestBatch.write) so the report and rollups stay exact
+SESSION_INSERT = '''
+    INSERT OR IGNORE INTO sessions (user_id, url, domain, title, category, topics, duration,
+        engagement_score, scroll_depth, date, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Candidate rows sharing a timestamp with the chunk; served by the
+# (user_id, timestamp, url) natural-key index
+EXISTING_KEYS = 'SELECT timestamp, url FROM sessions WHERE user_id = ? AND timestamp IN ({})'
+
+# True upserts rather than INSERT OR REPLACE: REPLACE deletes the old row
+# without firing DELETE triggers, which would drift the table_stats counters
+TOPIC_UPSERT = '''
+    INSERT INTO topics (user_id, name, category, total_time, session_count, avg_engagement, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, name) DO UPDATE SET
+        category = excluded.category,
+        total_time = excluded.total_time,
+        session_count = excluded.session_count,
+        avg_engagement = excluded.avg_engagement,
+        updated_at = excluded.updated_at
+'''
+
+SKILL_UPSERT = '''
+    INSERT INTO skills (user_id, name, category, experience, level, last_practiced, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, name) DO UPDATE SET
+        category = excluded.category,
+        experience = excluded.experience,
+        level = excluded.level,
+        last_practiced = excluded.last_practiced,
+        updated_at = excluded.updated_at
+'''
+
+PROFILE_UPSERT = '''
+    INSERT INTO user_profile
+    (user_id, interest_clusters, learning_style, skill_level, preferred_categories, weekly_goal, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        interest_clusters = excluded.interest_clusters,
+        learning_style = excluded.learning_style,
+        skill_level = excluded.skill_level,
+        preferred_categories = excluded.preferred_categories,
+        weekly_goal = excluded.weekly_goal,
+        updated_at = excluded.updated_at
+'''
+
+ROLLUP_DAILY_UPSERT = '''
+    INSERT INTO rollup_daily (user_id, date, category, domain, sessions, total_time, engagement_sum)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, date, category, domain) DO UPDATE SET
+        sessions = sessions + excluded.sessions,
+        total_time = total_time + excluded.total_time,
+        engagement_sum = engagement_sum + excluded.engagement_sum
+'''
+
+ROLLUP_HOURLY_UPSERT = '''
+    INSERT INTO rollup_hourly (user_id, date, hour, category, domain, sessions, total_time, engagement_sum)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, date, hour, category, domain) DO UPDATE SET
+        sessions = sessions + excluded.sessions,
+        total_time = total_time + excluded.total_time,
+        engagement_sum = engagement_sum + excluded.engagement_sum
+'''
+
+INSIGHT_INSERT = '''
+    INSERT INTO ai_insights (user_id, insight_type, content, confidence)
+    VALUES (?, ?, ?, ?)
+'''
+
+RECOMMENDATION_INSERT = '''
+    INSERT INTO recommendations (user_id, title, description, url, rec_type, priority, topic, category, score)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+RECOMMENDATIONS_CLEAR = 'DELETE FROM recommendations WHERE user_id = ?'
+
+
+# Midnight, January 1st 3000 (UTC), in milliseconds
+MAX_TIMESTAMP_MS = 32503680000000
+
+
+class RejectedRow(ValueError):
+    pass
+
+
+_NUMERIC_TYPES = (int, float)
+
+
+def _number(value, field, default=0):
+    if type(value) in _NUMERIC_TYPES and value == value:
+        return value
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        raise RejectedRow(f'{field} must be numeric')
+    if isinstance(value, (int, float)):
+        if value != value:
+            raise RejectedRow(f'{field} is NaN')
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value) if '.' in value else int(value)
+        except ValueError:
+            pass
+    raise RejectedRow(f'{field} must be numeric')
+
+
+def _text(value, field, default=''):
+    if type(value) is str:
+        return value
+    if value is None:
+        return default
+    if isinstance(value, (str, int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise RejectedRow(f'{field} must be a string')
+
+
+def rollup_rows(session_rows):
+    """Aggregate normalized session rows into daily and hourly rollup deltas"""
+    daily = {}
+    hourly = {}
+    hour_of = {}
+
+    for user_id, _, domain, _, category, _, duration, engagement, _, date, timestamp in session_rows:
+        # Every UTC offset is a multiple of 15 minutes, so the local hour is
+        # constant within a 15-minute bucket and only needs decoding once
+        bucket = timestamp // 900000
+        hour = hour_of.get(bucket)
+        if hour is None:
+            hour = hour_of[bucket] = datetime.fromtimestamp(bucket * 900).hour
+
+        key = (user_id, date, category, domain)
+        totals = daily.get(key)
+        if totals is None:
+            totals = daily[key] = [0, 0, 0.0]
+        totals[0] += 1
+        totals[1] += duration
+        totals[2] += engagement
+
+        key = (user_id, date, hour, category, domain)
+        totals = hourly.get(key)
+        if totals is None:
+            totals = hourly[key] = [0, 0, 0.0]
+        totals[0] += 1
+        totals[1] += duration
+        totals[2] += engagement
+
+    return (
+        [key + tuple(totals) for key, totals in daily.items()],
+        [key + tuple(totals) for key, totals in hourly.items()]
+    )
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+class IngestBatch:
+    """Validated, normalized /api/sync payload ready for bulk writing.
+
+    All validation happens up front so the write phase is nothing but
+    chunked ``executemany`` calls inside a single transaction. Rows that
+    fail validation are collected in ``rejected`` instead of raising.
+    """
+
+    def __init__(self, sessions, topics, profile, skills, user_id=DEFAULT_USER_ID, max_rejected_report=100):
+        self.user_id = user_id
+        self.max_rejected_report = max_rejected_report
+        self.rejected = []
+        self.rejected_count = {'sessions': 0, 'topics': 0, 'skills': 0, 'profile': 0}
+
+        now = datetime.now()
+        self.now_iso = now.isoformat()
+        self.now_ms = int(now.timestamp() * 1000)
+
+        self.sessions = []
+        self.session_rows = []
+        for index, session in enumerate(sessions if isinstance(sessions, list) else []):
+            row = self._validate('sessions', index, self._session_row, session)
+            if row is not None:
+                self.sessions.append(session)
+                self.session_rows.append(row)
+
+        self.topics = []
+        self.topic_rows = []
+        for index, topic in enumerate(topics if isinstance(topics, list) else []):
+            row = self._validate('topics', index, self._topic_row, topic)
+            if row is not None:
+                self.topics.append(topic)
+                self.topic_rows.append(row)
+
+        self.skills = []
+        self.skill_rows = []
+        for index, skill in enumerate(skills if isinstance(skills, list) else []):
+            row = self._validate('skills', index, self._skill_row, skill)
+            if row is not None:
+                self.skills.append(skill)
+                self.skill_rows.append(row)
+
+        self.profile = profile if isinstance(profile, dict) else {}
+        self.profile_row = None
+        if self.profile:
+            self.profile_row = self._validate('profile', 0, self._profile_row, self.profile)
+            if self.profile_row is None:
+                self.profile = {}
+
+    def _validate(self, table, index, build, item):
+        try:
+            if not isinstance(item, dict):
+                raise RejectedRow('expected an object')
+            return build(item)
+        except RejectedRow as e:
+            self.rejected_count[table] += 1
+            if len(self.rejected) < self.max_rejected_report:
+                self.rejected.append({'table': table, 'index': index, 'reason': str(e)})
+            return None
+
+    def _session_row(self, session):
+        timestamp = _number(session.get('timestamp'), 'timestamp', self.now_ms)
+        duration = _number(session.get('duration'), 'duration')
+        if duration < 0:
+            raise RejectedRow('duration must not be negative')
+
+        if not 0 <= timestamp < MAX_TIMESTAMP_MS:
+            raise RejectedRow('timestamp out of range')
+
+        date = session.get('date')
+        if date is None:
+            date = datetime.fromtimestamp(timestamp / 1000).strftime('%Y-%m-%d')
+
+        topics = session.get('topics', [])
+        if not isinstance(topics, list):
+            raise RejectedRow('topics must be a list')
+
+        url = _text(session.get('url'), 'url')
+        timestamp = int(timestamp)
+
+        return (
+            self.user_id,
+            url,
+            _text(session.get('domain'), 'domain'),
+            _text(session.get('title'), 'title', 'Unknown'),
+            _text(session.get('category'), 'category', 'General'),
+            json.dumps(topics),
+            duration,
+            _number(session.get('engagementScore'), 'engagementScore'),
+            _number(session.get('scrollDepth'), 'scrollDepth'),
+            _text(date, 'date'),
+            timestamp
+        )
+
+    def _topic_row(self, topic):
+        return (
+            self.user_id,
+            _text(topic.get('name'), 'name', 'Unknown'),
+            _text(topic.get('category'), 'category', 'General'),
+            _number(topic.get('totalTime'), 'totalTime'),
+            _number(topic.get('sessionCount'), 'sessionCount'),
+            _number(topic.get('averageEngagement'), 'averageEngagement'),
+            self.now_iso
+        )
+
+    def _skill_row(self, skill):
+        return (
+            self.user_id,
+            _text(skill.get('name'), 'name', 'Unknown'),
+            _text(skill.get('category'), 'category', 'General'),
+            _number(skill.get('experience'), 'experience'),
+            _number(skill.get('level'), 'level'),
+            _text(skill.get('lastPracticed'), 'lastPracticed', None),
+            self.now_iso
+        )
+
+    def _profile_row(self, profile):
+        return (
+            self.user_id,
+            json.dumps(profile.get('interestClusters', [])),
+            _text(profile.get('learningStyle'), 'learningStyle', 'balanced'),
+            _text(profile.get('skillLevel'), 'skillLevel', 'beginner'),
+            json.dumps(profile.get('preferredCategories', [])),
+            _number(profile.get('weeklyGoal'), 'weeklyGoal'),
+            self.now_iso
+        )
+
+    @property
+    def row_count(self):
+        return (len(self.session_rows) + len(self.topic_rows) +
+                len(self.skill_rows) + (1 if self.profile_row else 0))
+
+    def write(self, conn, chunk_size=500):
+        """Write every table in one transaction and return an ingest report"""
+        start = time.perf_counter()
+
+        new_sessions = []
+        seen = set()
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # The write lock is held from here on, so the existence check
+            # and the insert cannot race with a concurrent retry
+            for chunk in _chunks(self.session_rows, chunk_size):
+                timestamps = list({row[10] for row in chunk})
+                existing = conn.execute(
+                    EXISTING_KEYS.format(','.join('?' * len(timestamps))), [self.user_id] + timestamps
+                ).fetchall()
+                seen.update((row[0], row[1]) for row in existing)
+
+                fresh = []
+                for row in chunk:
+                    key = (row[10], row[1])
+                    if key not in seen:
+                        seen.add(key)
+                        fresh.append(row)
+
+                conn.executemany(SESSION_INSERT, fresh)
+                new_sessions.extend(fresh)
+
+            daily, hourly = rollup_rows(new_sessions)
+            conn.executemany(ROLLUP_DAILY_UPSERT, daily)
+            conn.executemany(ROLLUP_HOURLY_UPSERT, hourly)
+            # Only new sessions, so a retried sync doesn't count its titles twice
+            record_documents(conn, self.user_id, [row[3] for row in new_sessions])
+            for chunk in _chunks(self.topic_rows, chunk_size):
+                conn.executemany(TOPIC_UPSERT, chunk)
+            for chunk in _chunks(self.skill_rows, chunk_size):
+                conn.executemany(SKILL_UPSERT, chunk)
+            if self.profile_row:
+                conn.execute(PROFILE_UPSERT, self.profile_row)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        elapsed = time.perf_counter() - start
+        rows = self.row_count
+        duplicates = len(self.session_rows) - len(new_sessions)
+
+        return {
+            'sessions': {
+                'accepted': len(self.session_rows),
+                'stored': len(new_sessions),
+                'duplicates': duplicates,
+                'rejected': self.rejected_count['sessions']
+            },
+            'topics': {'stored': len(self.topic_rows), 'rejected': self.rejected_count['topics']},
+            'skills': {'stored': len(self.skill_rows), 'rejected': self.rejected_count['skills']},
+            'profile': {'stored': 1 if self.profile_row else 0, 'rejected': self.rejected_count['profile']},
+            'rows_processed': rows,
+            'rows_written': rows - duplicates,
+            'rows_rejected': sum(self.rejected_count.values()),
+            'elapsed_ms': round(elapsed * 1000, 2),
+            'rows_per_sec': round(rows / elapsed, 1) if elapsed > 0 else None,
+            'rejected_rows': self.rejected
+        }
+
+
+def store_analysis(conn, user_id, insights, recommendations):
+    """Persist engine output; recommendations replace the user's previous set"""
+    insight_rows = [
+        (
+            user_id,
+            insight.get('type', 'general'),
+            json.dumps(insight),
+            insight.get('confidence', 0.5)
+        )
+        for insight in insights
+    ]
+    recommendation_rows = [
+        (
+            user_id,
+            rec.get('title', ''),
+            rec.get('description', ''),
+            rec.get('url'),
+            rec.get('type', 'suggestion'),
+            rec.get('priority', 'medium'),
+            rec.get('topic'),
+            rec.get('category'),
+            rec.get('score', 0.5)
+        )
+        for rec in recommendations
+    ]
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany(INSIGHT_INSERT, insight_rows)
+        conn.execute(RECOMMENDATIONS_CLEAR, (user_id,))
+        conn.executemany(RECOMMENDATION_INSERT, recommendation_rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
@@ -0,0 +1,107 @@
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+class JobQueueFull(Exception):
+    """``max_active`` jobs are already queued or running"""
+
+
+class JobManager:
+    """Runs background jobs on a small thread pool and tracks their status.
+
+    Job records live in memory; finished jobs are kept up to
+    ``max_finished`` and then evicted oldest-first. At most ``max_active``
+    jobs are queued or running, each holding its arguments; past that
+    ``submit`` raises JobQueueFull instead of queueing. Anything a job
+    needs to outlive the process (insights, recommendations) is written
+    to the database by the job itself.
+    """
+
+    def __init__(self, workers=2, max_finished=1000, max_active=32, logger=None):
+        self.max_finished = max_finished
+        self.max_active = max_active
+        self.logger = logger
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='supriai-job')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._rejected = 0
+
+    def submit(self, job_type, fn, *args, user_id=None, **kwargs):
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'type': job_type,
+            'user_id': user_id,
+            'status': 'queued',
+            'created_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+
+        with self._lock:
+            if self._active >= self.max_active:
+                self._rejected += 1
+                raise JobQueueFull(f'{self.max_active} jobs are already queued or running')
+            self._active += 1
+            self._jobs[job_id] = job
+
+        try:
+            self._executor.submit(self._run, job, fn, args, kwargs)
+        except RuntimeError:
+            # Executor shut down
+            with self._lock:
+                self._active -= 1
+                del self._jobs[job_id]
+            raise
+        return job_id
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            job['status'] = 'running'
+            job['started_at'] = datetime.now().isoformat()
+
+        try:
+            result = fn(*args, **kwargs)
+            status, error = 'completed', None
+        except Exception as e:
+            result, status, error = None, 'failed', str(e)
+            if self.logger:
+                self.logger.error(f"Job {job['id']} ({job['type']}) failed: {e}\n{traceback.format_exc()}")
+
+        with self._lock:
+            job['status'] = status
+            job['result'] = result
+            job['error'] = error
+            job['finished_at'] = datetime.now().isoformat()
+            self._active -= 1
+            self._evict()
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job['status'] in ('completed', 'failed')]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def get_status(self):
+        counts = {'queued': 0, 'running': 0, 'completed': 0, 'failed': 0}
+        with self._lock:
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+            counts['max_active'] = self.max_active
+            counts['rejected'] = self._rejected
+        return counts
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,149 @@
+"""
+Multi-keyword matching for the rule-based classifiers.
+
+A KeywordMatcher compiles groups of keywords (topic categories, learning
+styles, educational indicators) into one Aho-Corasick automaton, so a text
+is scanned once for all of them instead of once per keyword. A keyword
+without whitespace can only occur inside one whitespace-separated token,
+so the automaton makes one pass over each distinct token of the text;
+splitting the text and dropping repeated tokens is done in C by
+``str.split`` and ``set``. Keywords containing whitespace ("machine
+learning") are checked against the whole text.
+
+The automaton is built once and only read afterwards, so one matcher can
+be shared by every thread.
+"""
+from collections import deque
+import re
+
+# Up to this many keyword-characters (text length times keywords), checking
+# each keyword with ``in`` is cheaper than splitting the text
+DIRECT_SCAN_LIMIT = 4096
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    """Scores texts against ``{group: [keyword or (keyword, weight), ...]}``.
+
+    A group scores the summed weight (default 1) of its keywords found in
+    the text, each keyword counted once however often it occurs. Keywords
+    are lowercased, and texts are expected to be lowercased by the caller.
+    By default keywords match anywhere, as ``keyword in text`` does; with
+    ``word_boundary`` they must not be preceded or followed by a letter,
+    digit or underscore.
+    """
+
+    def __init__(self, groups, word_boundary=False):
+        self.word_boundary = word_boundary
+        self.groups = list(groups)
+        self.totals = {}
+        self.keywords = []
+        # Keyword index -> [(group, weight)], one entry per listing, so a
+        # keyword listed twice counts twice as it did with separate scans
+        self._targets = []
+        index = {}
+        for group, entries in groups.items():
+            total = 0
+            for entry in entries:
+                keyword, weight = (entry, 1) if isinstance(entry, str) else entry
+                keyword = keyword.strip().lower()
+                if not keyword:
+                    continue
+                if keyword not in index:
+                    index[keyword] = len(self.keywords)
+                    self.keywords.append(keyword)
+                    self._targets.append([])
+                self._targets[index[keyword]].append((group, weight))
+                total += weight
+            self.totals[group] = total
+
+        self._listings = list(zip(self.keywords, self._targets))
+        self._phrases = []
+        words = []
+        for position, keyword in enumerate(self.keywords):
+            if len(keyword.split()) > 1:
+                pattern = re.compile(rf'(?<!\w){re.escape(keyword)}(?!\w)') if word_boundary else None
+                self._phrases.append((position, keyword, pattern))
+            else:
+                words.append(position)
+        self._build(words)
+
+    def _build(self, words):
+        """Trie over the single-word keywords, completed into a DFA along the failure links"""
+        delta = [{}]
+        outputs = [()]
+        for position in words:
+            state = 0
+            for char in self.keywords[position]:
+                following = delta[state].get(char)
+                if following is None:
+                    following = delta[state][char] = len(delta)
+                    delta.append({})
+                    outputs.append(())
+                state = following
+            outputs[state] += (position,)
+
+        # Breadth-first, so a state's failure target (always shallower) is
+        # already complete when the state inherits its edges and outputs
+        fail = [0] * len(delta)
+        queue = deque(delta[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in delta[state].items():
+                fail[following] = delta[fail[state]].get(char, 0)
+                queue.append(following)
+            outputs[state] += outputs[fail[state]]
+            for char, target in delta[fail[state]].items():
+                delta[state].setdefault(char, target)
+        self._delta = delta
+        self._outputs = outputs
+
+    def _scan(self, token):
+        """Indices of the single-word keywords found in ``token``"""
+        delta, outputs = self._delta, self._outputs
+        found = ()
+        state = 0
+        for end, char in enumerate(token, 1):
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                for position in outputs[state]:
+                    if self.word_boundary:
+                        start = end - len(self.keywords[position])
+                        if (start and _is_word_char(token[start - 1])) or \
+                                (end < len(token) and _is_word_char(token[end])):
+                            continue
+                    if position not in found:
+                        found += (position,)
+        return found
+
+    def hits(self, text):
+        """(group, weight) for each listing of a keyword found in ``text``, in keyword order"""
+        if not self.word_boundary and len(text) * len(self.keywords) <= DIRECT_SCAN_LIMIT:
+            # Short texts such as a title: each ``in`` is a single C call
+            return [target for keyword, targets in self._listings if keyword in text for target in targets]
+        targets = self._targets
+        return [target for position in sorted(self._find(text)) for target in targets[position]]
+
+    def _find(self, text):
+        """Indices into ``keywords`` of every keyword found in ``text``"""
+        found = set()
+        if len(self._delta) > 1:
+            scan = self._scan
+            for token in set(text.split()):
+                hits = scan(token)
+                if hits:
+                    found.update(hits)
+        for position, keyword, pattern in self._phrases:
+            if (pattern.search(text) if pattern else keyword in text):
+                found.add(position)
+        return found
+
+    def scores(self, text):
+        """{group: score} for the groups scoring above 0 in ``text``, in group order"""
+        scores = dict.fromkeys(self.groups, 0)
+        for group, weight in self.hits(text):
+            scores[group] += weight
+        return {group: score for group, score in scores.items() if score > 0}
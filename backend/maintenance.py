@@ -0,0 +1,101 @@
+import threading
+import time
+import traceback
+from datetime import datetime
+
+
+class MaintenanceScheduler:
+    """Runs periodic housekeeping tasks on a single daemon thread.
+
+    Tasks never overlap: they run one after another on the scheduler
+    thread, so a slow task delays the next one instead of piling up.
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def add_task(self, name, interval_seconds, fn, initial_delay=0):
+        with self._lock:
+            self._tasks[name] = {
+                'fn': fn,
+                'lock': threading.Lock(),
+                'interval': interval_seconds,
+                'next_run': time.monotonic() + initial_delay,
+                'runs': 0,
+                'last_run': None,
+                'last_duration_ms': None,
+                'last_result': None,
+                'last_error': None
+            }
+        self._wake.set()
+
+    def run_task(self, name):
+        """Run a task immediately on the calling thread and return its result"""
+        task = self._tasks[name]
+
+        # A manual run and a scheduled run of the same task never overlap
+        with task['lock']:
+            start = time.perf_counter()
+            task['last_run'] = datetime.now().isoformat()
+
+            try:
+                result = task['fn']()
+                task['last_result'] = result
+                task['last_error'] = None
+                return result
+            except Exception as e:
+                task['last_error'] = str(e)
+                if self.logger:
+                    self.logger.error(f"Maintenance task {name} failed: {e}\n{traceback.format_exc()}")
+                raise
+            finally:
+                task['runs'] += 1
+                task['last_duration_ms'] = round((time.perf_counter() - start) * 1000, 2)
+                task['next_run'] = time.monotonic() + task['interval']
+
+    def _loop(self):
+        while not self._stopped:
+            now = time.monotonic()
+            with self._lock:
+                due = [name for name, task in self._tasks.items() if task['next_run'] <= now]
+                upcoming = [task['next_run'] for task in self._tasks.values()]
+
+            for name in due:
+                try:
+                    self.run_task(name)
+                except Exception:
+                    pass
+
+            if not due:
+                timeout = min(upcoming) - now if upcoming else None
+                self._wake.wait(timeout)
+                self._wake.clear()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._loop, name='supriai-maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def get_status(self):
+        with self._lock:
+            return {
+                name: {
+                    'interval_seconds': task['interval'],
+                    'runs': task['runs'],
+                    'last_run': task['last_run'],
+                    'last_duration_ms': task['last_duration_ms'],
+                    'last_error': task['last_error']
+                }
+                for name, task in self._tasks.items()
+            }
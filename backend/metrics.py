@@ -0,0 +1,165 @@
+"""
+Process-wide metrics rendered in the Prometheus text format.
+
+Counters and histograms keep one child per label combination. Recording a
+value is a dict lookup, a bisect and a few additions under a lock, so
+instrumenting the hot paths costs about a microsecond per call.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+# Seconds; covers a cached SQLite lookup up to a deadline-length analysis
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    """Monotonic count per label combination"""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_labels(self.labels, key)} {_number(value)}' for key, value in values]
+
+
+class _Timer:
+    __slots__ = ('histogram', 'label_values', 'errors', 'start')
+
+    def __init__(self, histogram, label_values, errors):
+        self.histogram = histogram
+        self.label_values = label_values
+        self.errors = errors
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.label_values)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(*self.label_values)
+        return False
+
+
+class Histogram:
+    """Bucketed distribution of observed values per label combination"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        # Counts are kept per bucket and only made cumulative when rendered
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(label_values)
+            if child is None:
+                child = self._children[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            child[0][index] += 1
+            child[1] += value
+            child[2] += 1
+
+    def time(self, *label_values, errors=None):
+        """Context manager observing its duration; counts a raised exception in ``errors``"""
+        return _Timer(self, label_values, errors)
+
+    def samples(self):
+        with self._lock:
+            children = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._children.items())
+
+        lines = []
+        for key, (counts, total, count) in children:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f'{self.name}_bucket{_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labels, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labels, key)} {count}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+ENGINE_STAGE_SECONDS = REGISTRY.histogram(
+    'supriai_engine_stage_seconds',
+    'Time spent in each stage of the analysis and recommendation engines',
+    ('method', 'stage')
+)
+ENGINE_STAGE_ERRORS = REGISTRY.counter(
+    'supriai_engine_stage_errors_total',
+    'Engine stages that raised; the engine logs the error and carries on without them',
+    ('method', 'stage')
+)
+
+
+def engine_stage(method, stage):
+    """Time one stage of an engine ``method``, counting it as failed if it raises"""
+    return ENGINE_STAGE_SECONDS.time(method, stage, errors=ENGINE_STAGE_ERRORS)
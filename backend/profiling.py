@@ -0,0 +1,203 @@
+"""
+Opt-in profiling of individual requests.
+
+A request is profiled when it carries an ``X-Profile`` header (if the
+config allows it) or when profiling has been armed for the next few
+requests through /api/maintenance/profiling. Profiles are written next to
+the server log, tagged in the file name with the route and payload size:
+
+- ``pstats``: deterministic cProfile output, for ``python -m pstats`` or snakeviz
+- ``collapsed``: sampled stacks, one ``frame;frame;frame count`` line per
+  stack, for flamegraph.pl or speedscope
+"""
+import cProfile
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+MODES = {'pstats': 'pstats', 'collapsed': 'collapsed'}
+
+
+class StackSampler:
+    """Samples one thread's Python stack every ``interval`` seconds from a helper thread"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='supriai-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class ProfileSession:
+    """One profiled unit of work: a request, or the background job it started"""
+
+    def __init__(self, mode, route, payload_bytes, sample_interval):
+        self.mode = mode
+        self.route = route
+        self.payload_bytes = payload_bytes
+        self.sample_interval = sample_interval
+        self._profiler = None
+        self._started = None
+
+    def start(self):
+        # The sampler follows only the thread that starts it, as cProfile does before 3.12
+        if self.mode == 'pstats':
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one cProfile per process; sample instead
+                self.mode = 'collapsed'
+        if self.mode != 'pstats':
+            self._profiler = StackSampler(threading.get_ident(), self.sample_interval)
+            self._profiler.start()
+        self._started = time.perf_counter()
+        return self
+
+    def stop(self):
+        elapsed = time.perf_counter() - self._started
+        if self.mode == 'pstats':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        return elapsed
+
+    def dump(self, path):
+        if self.mode == 'pstats':
+            self._profiler.dump_stats(path)
+        else:
+            self._profiler.dump(path)
+
+
+class RequestProfiler:
+    """Decides which requests get profiled and writes their profiles to ``output_dir``.
+
+    Arming with ``arm(n)`` profiles the next ``n`` requests, optionally only
+    those for one route or user. Only the newest ``max_files`` profiles are
+    kept on disk.
+    """
+
+    def __init__(self, output_dir, default_mode='pstats', sample_interval=0.005,
+                 allow_header=False, max_files=50, logger=None):
+        self.output_dir = str(output_dir)
+        self.default_mode = default_mode
+        self.sample_interval = sample_interval
+        self.allow_header = allow_header
+        self.max_files = max_files
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._armed = None
+        self._sequence = 0
+
+    def arm(self, requests, mode=None, route=None, user_id=None):
+        mode = mode or self.default_mode
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', expected one of {sorted(MODES)}")
+        with self._lock:
+            self._armed = {'remaining': requests, 'mode': mode, 'route': route, 'user_id': user_id} if requests > 0 else None
+
+    def begin(self, route, user_id, payload_bytes, header=None):
+        """Start a ProfileSession if this request should be profiled, else return None"""
+        mode = None
+        if header and self.allow_header:
+            mode = header if header in MODES else self.default_mode
+        else:
+            with self._lock:
+                armed = self._armed
+                if armed and armed['route'] in (None, route) and armed['user_id'] in (None, user_id):
+                    mode = armed['mode']
+                    armed['remaining'] -= 1
+                    if armed['remaining'] <= 0:
+                        self._armed = None
+        if mode is None:
+            return None
+        return ProfileSession(mode, route, payload_bytes, self.sample_interval).start()
+
+    def finish(self, session, tag=None):
+        """Stop ``session`` and write its profile; returns the file name"""
+        elapsed = session.stop()
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+
+        route = re.sub(r'[^A-Za-z0-9]+', '-', session.route).strip('-') or 'root'
+        if tag:
+            route = f'{route}-{tag}'
+        name = (f"profile-{datetime.now():%Y%m%d-%H%M%S}-{route}-{session.payload_bytes}b"
+                f"-{os.getpid()}-{sequence}.{MODES[session.mode]}")
+        path = os.path.join(self.output_dir, name)
+        os.makedirs(self.output_dir, exist_ok=True)
+        session.dump(path)
+        self._prune()
+
+        if self.logger:
+            label = f'{session.route} {tag}' if tag else session.route
+            self.logger.info(f"Profiled {label} ({session.payload_bytes} bytes, {elapsed * 1000:.1f} ms) to {path}")
+        return name
+
+    def _profiles(self):
+        """Profile files in ``output_dir``, oldest first, including ones from earlier runs"""
+        try:
+            names = [name for name in os.listdir(self.output_dir) if name.startswith('profile-')]
+        except OSError:
+            return []
+        paths = [os.path.join(self.output_dir, name) for name in names]
+        return sorted(paths, key=lambda path: os.stat(path).st_mtime if os.path.exists(path) else 0)
+
+    def _prune(self):
+        profiles = self._profiles()
+        for old in profiles[:max(0, len(profiles) - self.max_files)]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def wrap(self, session, fn, tag):
+        """``fn`` profiled the same way as ``session``, for work a request hands to another thread"""
+        def run(*args, **kwargs):
+            child = ProfileSession(session.mode, session.route, session.payload_bytes, self.sample_interval).start()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.finish(child, tag=tag)
+        return run
+
+    def get_status(self):
+        with self._lock:
+            return {
+                'output_dir': self.output_dir,
+                'allow_header': self.allow_header,
+                'default_mode': self.default_mode,
+                'armed': dict(self._armed) if self._armed else None,
+                'profiles_written': self._sequence,
+                'recent': [os.path.basename(path) for path in self._profiles()[-10:]]
+            }
@@ -0,0 +1,100 @@
+# Read queries issued by the routes in app.py. Keeping them in one place
+# lets query_plan.py run EXPLAIN QUERY PLAN over exactly what the server runs.
+# Every query is scoped to one user and takes user_id as its first parameter.
+
+# Session listing for /api/analytics, keyset-paginated on (timestamp, id).
+# ``date`` is the client's local date, so the caller also passes a
+# timestamp lower bound a day before the range start; that bound is what
+# lets idx_sessions_user_timestamp serve the range and the sort in one SEARCH.
+_ANALYTICS_SESSIONS = 'SELECT * FROM sessions WHERE user_id = ? AND timestamp >= ? AND date >= ?'
+_AFTER_CURSOR = ' AND (timestamp, id) < (?, ?)'
+_NEWEST_FIRST = ' ORDER BY timestamp DESC, id DESC'
+
+ANALYTICS_SESSIONS_PAGE = _ANALYTICS_SESSIONS + _NEWEST_FIRST + ' LIMIT ?'
+ANALYTICS_SESSIONS_PAGE_AFTER = _ANALYTICS_SESSIONS + _AFTER_CURSOR + _NEWEST_FIRST + ' LIMIT ?'
+ANALYTICS_SESSIONS_STREAM = _ANALYTICS_SESSIONS + _NEWEST_FIRST
+ANALYTICS_SESSIONS_STREAM_AFTER = _ANALYTICS_SESSIONS + _AFTER_CURSOR + _NEWEST_FIRST
+
+ANALYTICS_SUMMARY = '''
+    SELECT COALESCE(SUM(sessions), 0) as total_sessions,
+           COALESCE(SUM(total_time), 0) as total_time,
+           COALESCE(SUM(engagement_sum), 0) as engagement_sum,
+           COUNT(DISTINCT date) as unique_days
+    FROM rollup_daily
+    WHERE user_id = ? AND date >= ?
+'''
+
+ANALYTICS_CATEGORY_BREAKDOWN = '''
+    SELECT category, SUM(sessions) as count, SUM(total_time) as time
+    FROM rollup_daily
+    WHERE user_id = ? AND date >= ?
+    GROUP BY category
+'''
+
+TOPICS_BY_TIME = 'SELECT * FROM topics WHERE user_id = ? ORDER BY total_time DESC'
+
+LATEST_INSIGHTS = 'SELECT * FROM ai_insights WHERE user_id = ? ORDER BY created_at DESC LIMIT ?'
+
+RECOMMENDATIONS_BY_CATEGORY = '''
+    SELECT * FROM recommendations WHERE user_id = ? AND category = ? ORDER BY score DESC LIMIT ?
+'''
+
+RECOMMENDATIONS_TOP = 'SELECT * FROM recommendations WHERE user_id = ? ORDER BY score DESC LIMIT ?'
+
+RECENT_SESSIONS = 'SELECT * FROM sessions WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?'
+
+PROFILE = 'SELECT * FROM user_profile WHERE user_id = ?'
+
+CATEGORY_ENGAGEMENT = '''
+    SELECT AVG(engagement_score) as avg_engagement, COUNT(*) as count
+    FROM sessions
+    WHERE user_id = ? AND category = ?
+'''
+
+# Row counts and last activity come from the trigger-maintained table_stats
+# rather than COUNT(*) over each table
+TABLE_STATS = '''
+    SELECT table_name, row_count, last_activity
+    FROM table_stats
+    WHERE user_id = ? AND table_name IN ('sessions', 'topics', 'recommendations', 'ai_insights', 'skills')
+'''
+
+TABLE_ROW_COUNT = 'SELECT row_count FROM table_stats WHERE user_id = ? AND table_name = ?'
+
+# /api/topic-modeling: corpus size, and the document frequencies of the
+# request's terms, passed as one JSON array so the statement text doesn't
+# vary with the number of terms
+TERM_CORPUS = 'SELECT documents FROM term_corpus WHERE user_id = ?'
+
+TERM_FREQUENCIES = '''
+    SELECT term, df FROM term_frequencies
+    WHERE user_id = ? AND term IN (SELECT value FROM json_each(?))
+'''
+
+
+# name -> (sql, sample params, reads_every_row)
+# Queries flagged ``reads_every_row`` return the whole table by design, so
+# an ordered index scan is acceptable for them; every other query must
+# resolve to an index SEARCH.
+ROUTE_QUERIES = {
+    'analytics.sessions_page': (ANALYTICS_SESSIONS_PAGE, ('u', 0, '2024-01-01', 500), False),
+    'analytics.sessions_page_after': (ANALYTICS_SESSIONS_PAGE_AFTER, ('u', 0, '2024-01-01', 1, 1, 500), False),
+    'analytics.sessions_stream': (ANALYTICS_SESSIONS_STREAM, ('u', 0, '2024-01-01'), False),
+    'analytics.sessions_stream_after': (ANALYTICS_SESSIONS_STREAM_AFTER, ('u', 0, '2024-01-01', 1, 1), False),
+    'analytics.summary': (ANALYTICS_SUMMARY, ('u', '2024-01-01'), False),
+    'analytics.category_breakdown': (ANALYTICS_CATEGORY_BREAKDOWN, ('u', '2024-01-01'), False),
+    'analytics.topics': (TOPICS_BY_TIME, ('u',), False),
+    'analytics.insights': (LATEST_INSIGHTS, ('u', 20), False),
+    'recommendations.by_category': (RECOMMENDATIONS_BY_CATEGORY, ('u', 'programming', 10), False),
+    'recommendations.top': (RECOMMENDATIONS_TOP, ('u', 10), False),
+    'recommendations.count': (TABLE_ROW_COUNT, ('u', 'recommendations'), False),
+    'patterns.sessions': (RECENT_SESSIONS, ('u', 100), False),
+    'profile.get': (PROFILE, ('u',), False),
+    'predict_engagement.category': (CATEGORY_ENGAGEMENT, ('u', 'programming'), False),
+    'status.table_stats': (TABLE_STATS, ('u',), False),
+    'topic_modeling.corpus': (TERM_CORPUS, ('u',), False),
+    'topic_modeling.term_frequencies': (TERM_FREQUENCIES, ('u', '["python", "tutorial"]'), False),
+}
+
+# sql -> name, used to label statement timings in /api/metrics
+STATEMENT_NAMES = {sql: name for name, (sql, _, _) in ROUTE_QUERIES.items()}
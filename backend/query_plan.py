@@ -0,0 +1,75 @@
+"""
+Run EXPLAIN QUERY PLAN over every query the routes issue and fail if any
+of them falls back to a full table scan.
+
+Usage: python query_plan.py [path/to/database.db]
+
+Without a path the check runs against a fresh in-memory database built
+from schema.init_schema, so it can run anywhere (CI, pre-commit).
+"""
+import re
+import sqlite3
+import sys
+
+from queries import ROUTE_QUERIES
+from schema import init_schema
+
+_TABLE_SCAN = re.compile(r'^SCAN (\w+)$')
+_INDEX_SCAN = re.compile(r'^SCAN (\w+) USING (COVERING )?INDEX')
+_HAS_LIMIT = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+
+def explain(conn, sql, params=()):
+    return [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+
+def check_query_plans(conn, route_queries=None):
+    """Return a list of problems; an empty list means every plan is acceptable.
+
+    A bare ``SCAN <table>`` always fails. An index scan (``SCAN t USING
+    INDEX``) still visits every row unless a LIMIT stops it early, so it
+    only passes for LIMIT queries or queries flagged as reading every row.
+    """
+    problems = []
+
+    for name, (sql, params, reads_every_row) in (route_queries or ROUTE_QUERIES).items():
+        plan = explain(conn, sql, params)
+
+        for detail in plan:
+            if _TABLE_SCAN.match(detail):
+                problems.append({'query': name, 'plan': plan, 'reason': f'full table scan: {detail}'})
+                break
+            if _INDEX_SCAN.match(detail) and not reads_every_row and not _HAS_LIMIT.search(sql):
+                problems.append({'query': name, 'plan': plan, 'reason': f'unbounded index scan: {detail}'})
+                break
+
+    return problems
+
+
+def main(argv):
+    if len(argv) > 1:
+        conn = sqlite3.connect(argv[1])
+    else:
+        conn = sqlite3.connect(':memory:')
+        init_schema(conn)
+
+    for name, (sql, params, _) in ROUTE_QUERIES.items():
+        print(f'{name}:')
+        for detail in explain(conn, sql, params):
+            print(f'    {detail}')
+
+    problems = check_query_plans(conn)
+    conn.close()
+
+    if problems:
+        print(f'\n{len(problems)} query plan problem(s):')
+        for problem in problems:
+            print(f"  {problem['query']}: {problem['reason']}")
+        return 1
+
+    print(f'\nAll {len(ROUTE_QUERIES)} route queries use indexes.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
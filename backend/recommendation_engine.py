@@ -3,22 +3,20 @@ from collections import defaultdict
 from datetime import datetime, timedelta
 import random
 import math
+from importlib.util import find_spec
 
-try:
-    import numpy as np
-    NUMPY_AVAILABLE = True
-except ImportError:
-    NUMPY_AVAILABLE = False
+from admission import check_deadline
+from metrics import engine_stage
+from session_frame import SessionFrame
 
-try:
-    from sklearn.metrics.pairwise import cosine_similarity
-    from sklearn.preprocessing import normalize
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
+# Detected without importing; NumPy is imported on first use (see ai_engine)
+NUMPY_AVAILABLE = find_spec('numpy') is not None
+SKLEARN_AVAILABLE = find_spec('sklearn') is not None
 
 
 class MLRecommendationEngine:
+    # Part of every result-cache key; bump it whenever recommendations change
+    VERSION = '2.0.0'
     
     def __init__(self):
         self.resources = {
@@ -102,10 +100,16 @@ class MLRecommendationEngine:
             'advanced': 0.6
         }
     
+    @property
+    def cache_version(self):
+        """VERSION plus the mode, since ML and rule-based paths give different results"""
+        return f"{self.VERSION}-{'ml' if SKLEARN_AVAILABLE and NUMPY_AVAILABLE else 'rules'}"
+    
     def get_status(self):
         resource_count = sum(len(resources) for resources in self.resources.values())
         return {
             'available': True,
+            'version': self.VERSION,
             'ml_enabled': SKLEARN_AVAILABLE and NUMPY_AVAILABLE,
             'capabilities': {
                 'content_based': True,
@@ -124,7 +128,8 @@ class MLRecommendationEngine:
             'mode': 'ML-Enhanced' if (SKLEARN_AVAILABLE and NUMPY_AVAILABLE) else 'Rule-Based'
         }
         
-    def generate(self, sessions, topics, profile, skills):
+    def generate(self, sessions, topics, profile, skills, frame=None):
+        """Recommendations for a user; ``frame`` may be shared with other analyses of the same sessions"""
         recommendations = []
         
         if not isinstance(sessions, list):
@@ -137,43 +142,62 @@ class MLRecommendationEngine:
             skills = []
         
         try:
-            content_recs = self.content_based_recommendations(sessions, topics)
+            with engine_stage('generate', 'content_based_recommendations'):
+                content_recs = self.content_based_recommendations(sessions, topics)
             recommendations.extend(content_recs)
         except Exception as e:
             print(f"Content-based recommendation error: {e}")
         
+        check_deadline()
+        
         try:
-            skill_recs = self.skill_progression_recommendations(skills, topics)
+            with engine_stage('generate', 'skill_progression_recommendations'):
+                skill_recs = self.skill_progression_recommendations(skills, topics)
             recommendations.extend(skill_recs)
         except Exception as e:
             print(f"Skill progression recommendation error: {e}")
         
+        check_deadline()
+        
         try:
-            pattern_recs = self.pattern_based_recommendations(sessions)
+            with engine_stage('generate', 'pattern_based_recommendations'):
+                pattern_recs = self.pattern_based_recommendations(sessions, frame)
             recommendations.extend(pattern_recs)
         except Exception as e:
             print(f"Pattern-based recommendation error: {e}")
         
+        check_deadline()
+        
         try:
-            exploration_recs = self.exploration_recommendations(topics)
+            with engine_stage('generate', 'exploration_recommendations'):
+                exploration_recs = self.exploration_recommendations(topics)
             recommendations.extend(exploration_recs)
         except Exception as e:
             print(f"Exploration recommendation error: {e}")
         
+        check_deadline()
+        
         try:
-            resource_recs = self.resource_recommendations(topics, profile)
+            with engine_stage('generate', 'resource_recommendations'):
+                resource_recs = self.resource_recommendations(topics, profile)
             recommendations.extend(resource_recs)
         except Exception as e:
             print(f"Resource recommendation error: {e}")
         
+        check_deadline()
+        
         try:
-            scored_recs = self.score_recommendations(recommendations, sessions, profile)
+            with engine_stage('generate', 'score_recommendations'):
+                scored_recs = self.score_recommendations(recommendations, sessions, profile)
         except Exception as e:
             print(f"Scoring error: {e}")
             scored_recs = recommendations
         
+        check_deadline()
+        
         try:
-            unique_recs = self.deduplicate_recommendations(scored_recs)
+            with engine_stage('generate', 'deduplicate_recommendations'):
+                unique_recs = self.deduplicate_recommendations(scored_recs)
         except Exception as e:
             print(f"Deduplication error: {e}")
             unique_recs = scored_recs
@@ -276,16 +300,17 @@ class MLRecommendationEngine:
         
         return recommendations
     
-    def pattern_based_recommendations(self, sessions):
+    def pattern_based_recommendations(self, sessions, frame=None):
         recommendations = []
         
         if not sessions or len(sessions) < 5:
             return recommendations
+        if frame is None:
+            frame = SessionFrame.from_sessions(sessions)
         
-        durations = [s.get('duration', 0) for s in sessions if s.get('duration')]
+        avg_duration = frame.mean('duration', skip_zero=True)
         
-        if durations:
-            avg_duration = sum(durations) / len(durations)
+        if avg_duration is not None:
             avg_minutes = avg_duration / 60000
             
             if avg_minutes < 10:
@@ -308,10 +333,8 @@ class MLRecommendationEngine:
                     'score': 0.65
                 })
         
-        engagement_scores = [s.get('engagementScore', 0) for s in sessions]
-        if engagement_scores:
-            avg_engagement = sum(engagement_scores) / len(engagement_scores)
-            
+        avg_engagement = frame.mean('engagement')
+        if avg_engagement is not None:
             if avg_engagement < 50:
                 recommendations.append({
                     'type': 'pattern',
@@ -322,8 +345,7 @@ class MLRecommendationEngine:
                     'score': 0.75
                 })
         
-        dates = set(s.get('date') for s in sessions if s.get('date'))
-        if len(dates) < 3:
+        if frame.distinct('date') < 3:
             recommendations.append({
                 'type': 'pattern',
                 'title': "Build a Daily Habit",
@@ -465,6 +487,8 @@ class MLRecommendationEngine:
     
     def calculate_similarity(self, vec1, vec2):
         if NUMPY_AVAILABLE:
+            import numpy as np
+            
             vec1 = np.array(vec1)
             vec2 = np.array(vec2)
             
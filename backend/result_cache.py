@@ -0,0 +1,238 @@
+import hashlib
+import json
+import marshal
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from coalesce import request_key
+
+
+def fingerprint(name, version, args):
+    """Stable key for a call: method, engine version and a digest of the arguments.
+
+    Arguments are hashed through ``marshal``, several times cheaper than
+    canonical JSON, which on large session lists costs more than most of
+    the analyses being cached. Dict key order is kept rather than sorted;
+    payloads decoded from the same client serialize their keys the same
+    way, and a different order only costs a miss. Anything marshal can't
+    encode falls back to canonical JSON.
+    """
+    try:
+        body = marshal.dumps(args)
+    except ValueError:
+        return request_key(f'{name}@{version}', args)
+    return hashlib.sha256(f'{name}@{version}\n'.encode() + body).hexdigest()
+
+
+class DiskTier:
+    """SQLite file behind the in-memory cache, shared by every process that opens it.
+
+    Entries survive restarts. Expired rows are pruned, and the least
+    recently used rows are trimmed to ``max_bytes``, every ``prune_every``
+    writes rather than on each one.
+    """
+
+    def __init__(self, path, max_bytes, prune_every=64):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.prune_every = prune_every
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                used_at REAL NOT NULL
+            )
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_results_used_at ON results(used_at)')
+
+    def get(self, key, now):
+        with self._lock:
+            row = self._conn.execute('SELECT value, expires_at FROM results WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None, None
+            if row[1] <= now:
+                self._conn.execute('DELETE FROM results WHERE key = ?', (key,))
+                return None, None
+            self._conn.execute('UPDATE results SET used_at = ? WHERE key = ?', (now, key))
+            return row[0], row[1]
+
+    def put(self, key, value, expires_at, now):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO results (key, value, size, expires_at, used_at) VALUES (?, ?, ?, ?, ?)',
+                (key, value, len(value), expires_at, now)
+            )
+            self._writes += 1
+            if self._writes % self.prune_every == 0:
+                self._prune(now)
+
+    def _prune(self, now):
+        self._conn.execute('DELETE FROM results WHERE expires_at <= ?', (now,))
+        # Keep the most recently used rows whose sizes add up to max_bytes
+        self._conn.execute('''
+            DELETE FROM results WHERE key IN (
+                SELECT key FROM (
+                    SELECT key, SUM(size) OVER (ORDER BY used_at DESC, key) AS running FROM results
+                ) WHERE running > ?
+            )
+        ''', (self.max_bytes,))
+
+    def get_status(self):
+        with self._lock:
+            entries, size = self._conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results').fetchone()
+        return {'path': self.path, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes}
+
+
+class ResultCache:
+    """Memoizes engine results by a hash of their normalized inputs.
+
+    Keys cover the method name, the engine version and a digest of the
+    arguments (see ``fingerprint``), so a version bump invalidates
+    everything. Values are stored as JSON bytes: the byte accounting is
+    exact and every hit returns a fresh copy callers can mutate. The memory tier is an LRU bounded by both ``max_entries``
+    and ``max_bytes``; entries expire after ``ttl`` seconds in either tier.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024, ttl=600, disk=None, logger=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk = disk
+        self.logger = logger
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0, 'disk_hits': 0, 'misses': 0, 'expired': 0,
+            'evictions': 0, 'disk_errors': 0, 'uncacheable': 0
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _store(self, key, value, expires_at):
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= len(key) + len(old[0])
+            self._entries[key] = (value, expires_at)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                evicted_key, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted_key) + len(evicted)
+                self._stats['evictions'] += 1
+
+    def _lookup(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[0]
+                del self._entries[key]
+                self._bytes -= len(key) + len(entry[0])
+                self._stats['expired'] += 1
+
+        if self.disk is None:
+            return None
+        try:
+            value, expires_at = self.disk.get(key, now)
+        except sqlite3.Error as e:
+            self._disk_error(e)
+            return None
+        if value is None:
+            return None
+        self._count('disk_hits')
+        self._store(key, bytes(value), expires_at)
+        return value
+
+    def _disk_error(self, e):
+        self._count('disk_errors')
+        if self.logger:
+            self.logger.warning(f'Result cache disk tier error: {e}')
+
+    def memoize(self, name, version, fn, *args):
+        """Return ``fn(*args)``, computing it only on a miss"""
+        key = fingerprint(name, version, args)
+        now = time.time()
+
+        value = self._lookup(key, now)
+        if value is not None:
+            return json.loads(value)
+
+        self._count('misses')
+        result = fn(*args)
+        try:
+            value = json.dumps(result, separators=(',', ':')).encode()
+        except (TypeError, ValueError):
+            self._count('uncacheable')
+            return result
+
+        expires_at = now + self.ttl
+        self._store(key, value, expires_at)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, value, expires_at, now)
+            except sqlite3.Error as e:
+                self._disk_error(e)
+        # What a hit would return, so callers see the same types either way
+        # (JSON turns int dict keys into strings, tuples into lists)
+        return json.loads(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_status(self):
+        with self._lock:
+            stats = dict(self._stats)
+            entries, size = len(self._entries), self._bytes
+        lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+        status = {
+            'entries': entries,
+            'bytes': size,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            **stats,
+            'hit_ratio': round((stats['hits'] + stats['disk_hits']) / lookups, 4) if lookups else None,
+            'miss_ratio': round(stats['misses'] / lookups, 4) if lookups else None
+        }
+        if self.disk is not None:
+            try:
+                status['disk'] = self.disk.get_status()
+            except sqlite3.Error as e:
+                status['disk'] = {'error': str(e)}
+        return status
+
+
+def build_result_cache(cache_config, logger=None):
+    """ResultCache for a RESULT_CACHE_CONFIG dict, or None when it is disabled"""
+    if not cache_config['enabled']:
+        return None
+    disk = None
+    if cache_config['disk_enabled']:
+        disk = DiskTier(cache_config['disk_path'], cache_config['max_disk_bytes'])
+    return ResultCache(
+        max_entries=cache_config['max_entries'],
+        max_bytes=cache_config['max_bytes'],
+        ttl=cache_config['ttl_seconds'],
+        disk=disk,
+        logger=logger
+    )
@@ -0,0 +1,109 @@
+import time
+from datetime import datetime, timedelta
+
+
+# Safety net for sessions written without going through IngestBatch (e.g.
+# by server.js, which shares the database): any (date, category, domain)
+# missing from the daily rollups is folded in before the rows disappear.
+FOLD_EXPIRED_SESSIONS = '''
+    INSERT OR IGNORE INTO rollup_daily (user_id, date, category, domain, sessions, total_time, engagement_sum)
+    SELECT user_id, COALESCE(date, ''), COALESCE(category, ''), COALESCE(domain, ''),
+           COUNT(*), COALESCE(SUM(duration), 0), COALESCE(SUM(engagement_score), 0)
+    FROM sessions
+    WHERE date < ?
+    GROUP BY 1, 2, 3, 4
+'''
+
+DELETE_BATCHES = [
+    ('sessions', 'DELETE FROM sessions WHERE id IN (SELECT id FROM sessions WHERE date < ? LIMIT ?)'),
+    ('rollup_hourly', '''
+        DELETE FROM rollup_hourly WHERE (user_id, date, hour, category, domain) IN (
+            SELECT user_id, date, hour, category, domain FROM rollup_hourly WHERE date < ? LIMIT ?
+        )
+    '''),
+    ('ai_insights', 'DELETE FROM ai_insights WHERE id IN (SELECT id FROM ai_insights WHERE created_at < ? LIMIT ?)'),
+    ('recommendations', 'DELETE FROM recommendations WHERE id IN (SELECT id FROM recommendations WHERE created_at < ? LIMIT ?)'),
+]
+
+
+def _database_bytes(conn):
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return page_size * page_count, page_size * freelist
+
+
+def _delete_in_batches(conn, sql, cutoff, batch_size, pause):
+    """Delete matching rows batch by batch, committing in between.
+
+    Each batch is its own short write transaction, so sync requests can
+    interleave instead of waiting behind one long delete.
+    """
+    deleted = 0
+    while True:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            count = conn.execute(sql, (cutoff, batch_size)).rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        deleted += count
+        if count < batch_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+
+def enforce_retention(conn, retention_config, now=None):
+    """Apply RETENTION_CONFIG to the database and return a report"""
+    now = now or datetime.now()
+    batch_size = retention_config.get('batch_size', 1000)
+    pause = retention_config.get('batch_pause_ms', 0) / 1000
+    start = time.perf_counter()
+
+    session_cutoff = (now - timedelta(days=retention_config['sessions_days'])).strftime('%Y-%m-%d')
+    # created_at columns are SQLite CURRENT_TIMESTAMP values, i.e. UTC
+    utc_now = datetime.utcnow()
+    cutoffs = {
+        'sessions': session_cutoff,
+        'rollup_hourly': session_cutoff,
+        'ai_insights': (utc_now - timedelta(days=retention_config['insights_days'])).strftime('%Y-%m-%d %H:%M:%S'),
+        'recommendations': (utc_now - timedelta(days=retention_config['recommendations_days'])).strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        folded = conn.execute(FOLD_EXPIRED_SESSIONS, (session_cutoff,)).rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    deleted = {}
+    for table, sql in DELETE_BATCHES:
+        deleted[table] = _delete_in_batches(conn, sql, cutoffs[table], batch_size, pause)
+
+    size_before, _ = _database_bytes(conn)
+    vacuum_mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+    if vacuum_mode == 2:
+        pages = int(retention_config.get('vacuum_pages', 0))
+        # executescript steps the pragma to completion; a plain execute()
+        # only frees a single page per call
+        conn.executescript(f'PRAGMA incremental_vacuum({pages});' if pages else 'PRAGMA incremental_vacuum;')
+    size_after, free_after = _database_bytes(conn)
+
+    return {
+        'cutoffs': cutoffs,
+        'rollups_folded': folded,
+        'deleted': deleted,
+        'vacuum': {
+            'mode': {0: 'none', 1: 'full', 2: 'incremental'}.get(vacuum_mode, vacuum_mode),
+            'bytes_before': size_before,
+            'bytes_after': size_after,
+            'reclaimed_bytes': size_before - size_after,
+            'free_bytes_remaining': free_after
+        },
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 2)
+    }
@@ -0,0 +1,487 @@
+from itertools import groupby, islice
+
+from term_stats import record_documents
+
+# Owner of rows written before multi-user support, and of requests that
+# don't identify a user
+DEFAULT_USER_ID = 'default'
+
+
+BASE_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        url TEXT,
+        domain TEXT,
+        title TEXT,
+        category TEXT,
+        topics TEXT,
+        duration INTEGER,
+        engagement_score REAL,
+        scroll_depth REAL,
+        date TEXT,
+        timestamp INTEGER,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS topics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE,
+        category TEXT,
+        total_time INTEGER DEFAULT 0,
+        session_count INTEGER DEFAULT 0,
+        avg_engagement REAL DEFAULT 0,
+        embeddings TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS user_profile (
+        id INTEGER PRIMARY KEY,
+        interest_clusters TEXT,
+        learning_style TEXT,
+        skill_level TEXT,
+        preferred_categories TEXT,
+        weekly_goal INTEGER,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS ai_insights (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        insight_type TEXT,
+        content TEXT,
+        confidence REAL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS recommendations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title TEXT,
+        description TEXT,
+        url TEXT,
+        rec_type TEXT,
+        priority TEXT,
+        topic TEXT,
+        category TEXT,
+        score REAL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS skills (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE,
+        category TEXT,
+        experience INTEGER DEFAULT 0,
+        level INTEGER DEFAULT 0,
+        last_practiced DATETIME,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    '''
+]
+
+
+def _add_secondary_indexes(conn):
+    # /api/analytics: WHERE date >= ? (timestamp rides along for the sort)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_date_timestamp ON sessions(date, timestamp)')
+    # /api/patterns: ORDER BY timestamp DESC LIMIT ?
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_timestamp ON sessions(timestamp)')
+    # /api/predict-engagement: AVG(engagement_score) WHERE category = ? (covering)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_category_engagement ON sessions(category, engagement_score)')
+    # /api/status: MAX(created_at)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions(created_at)')
+    # /api/analytics: latest insights
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_ai_insights_created_at ON ai_insights(created_at)')
+    # /api/recommendations: ORDER BY score DESC, optionally WHERE category = ?
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_recommendations_category_score ON recommendations(category, score)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_recommendations_score ON recommendations(score)')
+    # /api/analytics, /api/patterns: topics ORDER BY total_time DESC
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_topics_total_time ON topics(total_time)')
+
+
+def _add_rollup_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_daily (
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            total_time INTEGER NOT NULL DEFAULT 0,
+            engagement_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, category, domain)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_hourly (
+            date TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            total_time INTEGER NOT NULL DEFAULT 0,
+            engagement_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, hour, category, domain)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _add_session_natural_key(conn):
+    # Collapse duplicates that piled up from client retries, keeping the
+    # first copy, then let the unique index keep it that way. Timestamp
+    # leads so inserts of recent sessions stay append-mostly.
+    conn.execute('''
+        DELETE FROM sessions WHERE id NOT IN (
+            SELECT MIN(id) FROM sessions GROUP BY timestamp, url
+        )
+    ''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_sessions_natural_key ON sessions(timestamp, url)')
+
+
+# Tables whose row counts /api/status reports from table_stats, with the
+# column used to seed last_activity when the counters are first created
+STATS_TABLES = {
+    'sessions': 'created_at',
+    'topics': 'updated_at',
+    'recommendations': 'created_at',
+    'ai_insights': 'created_at',
+    'skills': 'updated_at',
+}
+
+
+def _add_table_stats(conn):
+    # Superseded by the per-user counters of migration 5
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS table_stats (
+            table_name TEXT PRIMARY KEY,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            last_activity DATETIME
+        ) WITHOUT ROWID
+    ''')
+    for table in STATS_TABLES:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE table_stats
+                SET row_count = row_count + 1, last_activity = CURRENT_TIMESTAMP
+                WHERE table_name = '{table}';
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE table_stats SET row_count = row_count - 1 WHERE table_name = '{table}';
+            END
+        ''')
+    # Only served /api/status's MAX(created_at), which table_stats replaces
+    conn.execute('DROP INDEX IF EXISTS idx_sessions_created_at')
+
+
+def create_stats_triggers(conn):
+    for table in STATS_TABLES:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO table_stats (user_id, table_name, row_count, last_activity)
+                VALUES (NEW.user_id, '{table}', 1, CURRENT_TIMESTAMP)
+                ON CONFLICT (user_id, table_name) DO UPDATE SET
+                    row_count = row_count + 1,
+                    last_activity = excluded.last_activity;
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_stats_delete AFTER DELETE ON {table}
+            BEGIN
+                UPDATE table_stats SET row_count = row_count - 1
+                WHERE user_id = OLD.user_id AND table_name = '{table}';
+            END
+        ''')
+
+
+def _recount_table_stats(conn):
+    drift = {}
+
+    for table, activity_column in STATS_TABLES.items():
+        actual = {
+            user_id: (count, last)
+            for user_id, count, last in conn.execute(
+                f'SELECT user_id, COUNT(*), MAX({activity_column}) FROM {table} GROUP BY user_id'
+            )
+        }
+        recorded = dict(conn.execute(
+            'SELECT user_id, row_count FROM table_stats WHERE table_name = ?', (table,)
+        ).fetchall())
+
+        for user_id, (count, last) in actual.items():
+            if user_id not in recorded:
+                conn.execute(
+                    'INSERT INTO table_stats (user_id, table_name, row_count, last_activity) VALUES (?, ?, ?, ?)',
+                    (user_id, table, count, last)
+                )
+                drift.setdefault(table, {})[user_id] = count
+            elif recorded[user_id] != count:
+                conn.execute(
+                    'UPDATE table_stats SET row_count = ? WHERE user_id = ? AND table_name = ?',
+                    (count, user_id, table)
+                )
+                drift.setdefault(table, {})[user_id] = count - recorded[user_id]
+
+        for user_id, count in recorded.items():
+            if user_id not in actual and count != 0:
+                conn.execute(
+                    'UPDATE table_stats SET row_count = 0 WHERE user_id = ? AND table_name = ?',
+                    (user_id, table)
+                )
+                drift.setdefault(table, {})[user_id] = -count
+
+    return drift
+
+
+def reconcile_table_stats(conn):
+    """Recount every tracked table and fix any drift in table_stats.
+
+    Counters can drift when something bypasses the triggers' assumptions,
+    e.g. server.js still writes topics with INSERT OR REPLACE. Returns the
+    corrections made, keyed by table name and then user.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        drift = _recount_table_stats(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return drift
+
+
+def _rebuild_with_user_key(conn, table, columns, definition):
+    # Column-level UNIQUE(name) constraints can't be dropped in place, so
+    # the table is copied into a new one keyed on (user_id, name)
+    conn.execute(f'CREATE TABLE {table}_partitioned ({definition})')
+    conn.execute(f'''
+        INSERT INTO {table}_partitioned (id, user_id, {columns})
+        SELECT id, '{DEFAULT_USER_ID}', {columns} FROM {table}
+    ''')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {table}_partitioned RENAME TO {table}')
+
+
+def _partition_by_user(conn):
+    # Existing rows predate multi-user support and belong to the default user
+    for table in ('sessions', 'ai_insights', 'recommendations', 'user_profile'):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER_ID}'")
+
+    _rebuild_with_user_key(conn, 'topics', 'name, category, total_time, session_count, avg_engagement, embeddings, updated_at', f'''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER_ID}',
+        name TEXT,
+        category TEXT,
+        total_time INTEGER DEFAULT 0,
+        session_count INTEGER DEFAULT 0,
+        avg_engagement REAL DEFAULT 0,
+        embeddings TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (user_id, name)
+    ''')
+    _rebuild_with_user_key(conn, 'skills', 'name, category, experience, level, last_practiced, updated_at', f'''
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL DEFAULT '{DEFAULT_USER_ID}',
+        name TEXT,
+        category TEXT,
+        experience INTEGER DEFAULT 0,
+        level INTEGER DEFAULT 0,
+        last_practiced DATETIME,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE (user_id, name)
+    ''')
+
+    # user_id leads every index a route reads through, so one user's
+    # queries touch only that user's slice of each B-tree
+    for index in ('idx_sessions_date_timestamp', 'idx_sessions_timestamp', 'idx_sessions_category_engagement',
+                  'idx_sessions_natural_key', 'idx_recommendations_category_score', 'idx_recommendations_score'):
+        conn.execute(f'DROP INDEX IF EXISTS {index}')
+    conn.execute('CREATE INDEX idx_sessions_user_timestamp ON sessions(user_id, timestamp)')
+    conn.execute('CREATE INDEX idx_sessions_user_category_engagement ON sessions(user_id, category, engagement_score)')
+    conn.execute('CREATE UNIQUE INDEX idx_sessions_user_natural_key ON sessions(user_id, timestamp, url)')
+    conn.execute('CREATE INDEX idx_ai_insights_user_created_at ON ai_insights(user_id, created_at)')
+    conn.execute('CREATE INDEX idx_recommendations_user_category_score ON recommendations(user_id, category, score)')
+    conn.execute('CREATE INDEX idx_recommendations_user_score ON recommendations(user_id, score)')
+    conn.execute('CREATE INDEX idx_topics_user_total_time ON topics(user_id, total_time)')
+    conn.execute('CREATE UNIQUE INDEX idx_user_profile_user ON user_profile(user_id)')
+    # The retention sweep is cross-user by design; idx_ai_insights_created_at
+    # stays for the same reason
+    conn.execute('CREATE INDEX idx_sessions_date ON sessions(date)')
+
+    for table in ('rollup_daily', 'rollup_hourly'):
+        conn.execute(f'DROP TABLE {table}')
+    conn.execute('''
+        CREATE TABLE rollup_daily (
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            category TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            total_time INTEGER NOT NULL DEFAULT 0,
+            engagement_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, date, category, domain)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE rollup_hourly (
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            category TEXT NOT NULL,
+            domain TEXT NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            total_time INTEGER NOT NULL DEFAULT 0,
+            engagement_sum REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, date, hour, category, domain)
+        ) WITHOUT ROWID
+    ''')
+
+    for table in STATS_TABLES:
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_stats_insert')
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_stats_delete')
+    conn.execute('DROP TABLE table_stats')
+    conn.execute('''
+        CREATE TABLE table_stats (
+            user_id TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            last_activity DATETIME,
+            PRIMARY KEY (user_id, table_name)
+        ) WITHOUT ROWID
+    ''')
+    create_stats_triggers(conn)
+
+
+def _add_term_frequencies(conn):
+    # Document frequencies of session title terms, per user (see term_stats.py)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS term_frequencies (
+            user_id TEXT NOT NULL,
+            term TEXT NOT NULL,
+            df INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, term)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS term_corpus (
+            user_id TEXT PRIMARY KEY,
+            documents INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+
+
+MIGRATIONS = [
+    (1, 'Secondary indexes for route queries', _add_secondary_indexes),
+    (2, 'Daily and hourly rollup tables', _add_rollup_tables),
+    (3, 'Unique (timestamp, url) natural key for idempotent ingest', _add_session_natural_key),
+    (4, 'Trigger-maintained table_stats counters', _add_table_stats),
+    (5, 'Per-user partitioning keyed on user_id', _partition_by_user),
+    (6, 'Per-user term document frequencies for topic extraction', _add_term_frequencies),
+]
+
+# Derived tables are rebuilt once against the final schema, after every
+# pending migration has run, rather than by each migration that changes
+# their inputs
+REBUILDS_ROLLUPS = {2, 3, 5}
+RESETS_TABLE_STATS = {4, 5}
+REBUILDS_TERM_FREQUENCIES = {6}
+
+
+def rebuild_rollups(conn):
+    """Recompute both rollup tables from the raw sessions table"""
+    conn.execute('DELETE FROM rollup_daily')
+    conn.execute('DELETE FROM rollup_hourly')
+    conn.execute('''
+        INSERT INTO rollup_daily (user_id, date, category, domain, sessions, total_time, engagement_sum)
+        SELECT user_id, COALESCE(date, ''), COALESCE(category, ''), COALESCE(domain, ''),
+               COUNT(*), COALESCE(SUM(duration), 0), COALESCE(SUM(engagement_score), 0)
+        FROM sessions
+        GROUP BY 1, 2, 3, 4
+    ''')
+    conn.execute('''
+        INSERT INTO rollup_hourly (user_id, date, hour, category, domain, sessions, total_time, engagement_sum)
+        SELECT user_id, COALESCE(date, ''),
+               CAST(strftime('%H', timestamp / 1000, 'unixepoch', 'localtime') AS INTEGER),
+               COALESCE(category, ''), COALESCE(domain, ''),
+               COUNT(*), COALESCE(SUM(duration), 0), COALESCE(SUM(engagement_score), 0)
+        FROM sessions
+        WHERE timestamp IS NOT NULL
+        GROUP BY 1, 2, 3, 4, 5
+    ''')
+
+
+def rebuild_term_frequencies(conn):
+    """Recompute the term document frequencies from every stored session title"""
+    conn.execute('DELETE FROM term_frequencies')
+    conn.execute('DELETE FROM term_corpus')
+    rows = conn.execute("SELECT user_id, COALESCE(title, '') FROM sessions ORDER BY user_id")
+    for user_id, group in groupby(rows, key=lambda row: row[0]):
+        titles = (title for _, title in group)
+        while True:
+            chunk = list(islice(titles, 10000))
+            if not chunk:
+                break
+            record_documents(conn, user_id, chunk)
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def apply_migrations(conn):
+    """Apply pending migrations in one transaction; returns the versions applied"""
+    current = get_schema_version(conn)
+    pending = [(version, migrate) for version, _, migrate in MIGRATIONS if version > current]
+    if not pending:
+        return []
+
+    applied = [version for version, _ in pending]
+
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for version, migrate in pending:
+            migrate(conn)
+        if REBUILDS_ROLLUPS.intersection(applied):
+            rebuild_rollups(conn)
+        if RESETS_TABLE_STATS.intersection(applied):
+            _recount_table_stats(conn)
+        if REBUILDS_TERM_FREQUENCIES.intersection(applied):
+            rebuild_term_frequencies(conn)
+        conn.execute(f'PRAGMA user_version = {int(applied[-1])}')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    conn.execute('ANALYZE')
+    conn.commit()
+    return applied
+
+
+def enable_incremental_vacuum(conn):
+    """Switch the file to auto_vacuum=INCREMENTAL so retention can shrink it"""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    # On an existing file the new mode only takes effect after a full VACUUM
+    if conn.execute('PRAGMA page_count').fetchone()[0] > 0:
+        conn.execute('VACUUM')
+    return True
+
+
+def init_schema(conn):
+    """Create the base tables, then apply migrations tracked via PRAGMA user_version"""
+    enable_incremental_vacuum(conn)
+    for statement in BASE_TABLES:
+        conn.execute(statement)
+    conn.commit()
+    return apply_migrations(conn)
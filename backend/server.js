@@ -4,6 +4,7 @@ const sqlite3 = require('sqlite3').verbose();
 const path = require('path');
 const { spawn } = require('child_process');
 const fs = require('fs');
+const readline = require('readline');
 
 const app = express();
 const PORT = 5000;
@@ -101,31 +102,78 @@ function initDatabase() {
     });
 }
 
-function callPythonAI(action, data) {
-    return new Promise((resolve, reject) => {
-        const python = spawn('python', [path.join(__dirname, 'ai_service.py'), action, JSON.stringify(data)]);
-        let result = '';
-        let error = '';
+// AI calls go to one long-lived `ai_service.py serve` process speaking
+// JSON lines over stdin/stdout, instead of a fresh Python process (and a
+// fresh NumPy/scikit-learn import) per call. It is started on first use
+// and restarted on the next call if it dies.
+const AI_WORKERS = parseInt(process.env.SUPRIAI_AI_WORKERS || '2', 10);
+const AI_CALL_TIMEOUT_MS = 60000;
+
+let aiDaemon = null;
+let aiRequestId = 0;
+const aiPending = new Map();
+
+function failPendingAICalls(message) {
+    for (const pending of aiPending.values()) {
+        clearTimeout(pending.timer);
+        pending.reject(new Error(message));
+    }
+    aiPending.clear();
+}
 
-        python.stdout.on('data', (data) => {
-            result += data.toString();
-        });
+function startAIDaemon() {
+    const child = spawn('python', [path.join(__dirname, 'ai_service.py'), 'serve', '--workers', String(AI_WORKERS)]);
 
-        python.stderr.on('data', (data) => {
-            error += data.toString();
-        });
+    readline.createInterface({ input: child.stdout }).on('line', (line) => {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (e) {
+            return;
+        }
 
-        python.on('close', (code) => {
-            if (code !== 0) {
-                reject(new Error(error || 'Python process failed'));
-            } else {
-                try {
-                    resolve(JSON.parse(result));
-                } catch (e) {
-                    resolve({ success: true, data: result });
-                }
-            }
-        });
+        const pending = aiPending.get(message.id);
+        if (!pending) return;
+        aiPending.delete(message.id);
+        clearTimeout(pending.timer);
+
+        if (message.error) {
+            pending.reject(new Error(message.error));
+        } else {
+            pending.resolve(message.result);
+        }
+    });
+
+    child.stderr.on('data', (data) => {
+        console.error(`[ai_service] ${data.toString().trimEnd()}`);
+    });
+
+    child.stdin.on('error', () => {});
+
+    const onGone = (reason) => {
+        if (aiDaemon === child) aiDaemon = null;
+        failPendingAICalls(reason);
+    };
+    child.on('error', (err) => onGone(`AI service failed to start: ${err.message}`));
+    child.on('exit', (code) => onGone(`AI service exited with code ${code}`));
+
+    return child;
+}
+
+function callPythonAI(action, data) {
+    if (!aiDaemon) {
+        aiDaemon = startAIDaemon();
+    }
+
+    return new Promise((resolve, reject) => {
+        const id = ++aiRequestId;
+        const timer = setTimeout(() => {
+            aiPending.delete(id);
+            reject(new Error(`AI call '${action}' timed out`));
+        }, AI_CALL_TIMEOUT_MS);
+
+        aiPending.set(id, { resolve, reject, timer });
+        aiDaemon.stdin.write(JSON.stringify({ id, action, data }) + '\n');
     });
 }
 
@@ -698,6 +746,10 @@ function gracefulShutdown(signal) {
     isShuttingDown = true;
     
     console.log(`\n${signal} received. Shutting down gracefully...`);
+    if (aiDaemon) {
+        // Closing stdin lets the daemon finish in-flight calls and exit
+        aiDaemon.stdin.end();
+    }
     server.close(() => {
         db.close();
         console.log('Server closed.');
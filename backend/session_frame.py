@@ -0,0 +1,303 @@
+"""
+Columnar session container shared by the engines.
+
+Session lists arrive as dicts, and every analysis used to pull the same
+few fields out of each one with ``s.get(...)``. A SessionFrame reads each
+field once into a typed column (timestamp, duration, engagement, scroll
+depth) or a dictionary-encoded one (category, domain, date), so the
+aggregations run over arrays instead of dicts. Columns are NumPy arrays
+when NumPy is installed (imported on first use, like the engines' ML
+paths) and ``array.array`` otherwise, at a few bytes per session and
+column against several hundred bytes per session for the dicts.
+
+The local hour, day and weekday of every timestamp are decoded together
+in one step and kept as columns too, instead of a ``datetime`` per
+session in each analysis that needs one of them.
+"""
+import calendar
+import math
+import time
+from array import array
+from datetime import date, datetime
+from importlib.util import find_spec
+
+NUMPY_AVAILABLE = find_spec('numpy') is not None
+
+NUMERIC_COLUMNS = ('timestamp', 'duration', 'engagement', 'scroll')
+LABEL_COLUMNS = ('category', 'domain', 'date')
+# Derived from timestamp in local time; -1 where a session has none.
+# 'day' counts days since 1970-01-01 and 'weekday' runs from 0 (Monday)
+CALENDAR_COLUMNS = ('hour', 'day', 'weekday')
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+# Timestamps (in milliseconds) outside the years 1 to 9999, a day's margin
+# included for the UTC offset, have no calendar date and count as missing
+MIN_TIMESTAMP = -62135596800000 + 86400000
+MAX_TIMESTAMP = 253402300800000 - 86400000
+NUMBER_TYPES = (int, float)
+
+# Session dict keys, and the sessions table columns read by from_rows
+SESSION_KEYS = {
+    'timestamp': 'timestamp', 'duration': 'duration', 'engagement': 'engagementScore',
+    'scroll': 'scrollDepth', 'category': 'category', 'domain': 'domain', 'date': 'date'
+}
+ROW_KEYS = {
+    'timestamp': 'timestamp', 'duration': 'duration', 'engagement': 'engagement_score',
+    'scroll': 'scroll_depth', 'category': 'category', 'domain': 'domain', 'date': 'date'
+}
+
+
+def utc_offset(seconds, tz=None):
+    """Seconds east of UTC at ``seconds`` since the epoch, in ``tz`` or else the server's local time"""
+    if tz is None:
+        return time.localtime(seconds).tm_gmtoff
+    return int(datetime.fromtimestamp(seconds, tz).utcoffset().total_seconds())
+
+
+def _day_offset(utc_day, tz):
+    """The UTC offset over a whole UTC day, or None when it changes during the day"""
+    start = utc_day * 86400
+    offset = utc_offset(start, tz)
+    return offset if utc_offset(start + 86399, tz) == offset else None
+
+
+def _is_number(value):
+    return type(value) in NUMBER_TYPES and math.isfinite(value) and abs(value) < 2 ** 63
+
+
+def _is_hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _calendar_label(name, value):
+    if name == 'day':
+        return date.fromordinal(EPOCH_ORDINAL + value).isoformat()
+    if name == 'weekday':
+        return calendar.day_name[value]
+    return value
+
+
+class SessionFrame:
+    """Typed columns for a list of sessions, in the list's order.
+
+    Columns are extracted the first time they are used and then kept, so
+    an analysis only pays for the fields it reads. Numeric columns hold 0
+    where a session has no value or one that isn't a number, so a single
+    malformed session can't fail the whole frame. Label columns are codes into
+    ``labels(name)``, numbered in order of first appearance so grouped
+    results keep the order a dict built over the sessions would; sessions
+    without a value share the label None, while an empty string is a
+    label of its own. The calendar columns can be read either
+    way: as numbers, or as labels (hour, 'YYYY-MM-DD' date, weekday name)
+    with None for sessions without a timestamp. They are in ``tz``, or in
+    the server's local time like ``datetime.fromtimestamp``.
+    """
+
+    def __init__(self, records, keys=SESSION_KEYS, use_numpy=None, tz=None):
+        self.records = records
+        self.keys = keys
+        self.use_numpy = NUMPY_AVAILABLE if use_numpy is None else use_numpy
+        self.tz = tz
+        self._columns = {}
+        self._codes = {}
+        self._labels = {}
+
+    @classmethod
+    def from_sessions(cls, sessions, use_numpy=None, tz=None):
+        """Frame over session dicts as the extension sends them"""
+        return cls(sessions, SESSION_KEYS, use_numpy, tz)
+
+    @classmethod
+    def from_rows(cls, rows, use_numpy=None, tz=None):
+        """Frame straight from sessions table rows (``sqlite3.Row``), without building session dicts"""
+        return cls(rows if isinstance(rows, list) else list(rows), ROW_KEYS, use_numpy, tz)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _values(self, name, missing=None):
+        """Column ``name`` as a list, with ``missing`` where a session has no value.
+
+        A numeric ``missing`` (0) stands in for empty values as well; label
+        columns keep an empty string as it is.
+        """
+        key = self.keys[name]
+        rows = self.keys is ROW_KEYS
+        if missing is None:
+            return [row[key] for row in self.records] if rows else [s.get(key) for s in self.records]
+        if rows:
+            return [row[key] or missing for row in self.records]
+        return [s.get(key) or missing for s in self.records]
+
+    def column(self, name):
+        """A numeric column: int64 timestamps and calendar fields and float64 values, or arrays without NumPy"""
+        values = self._columns.get(name)
+        if values is None and name in CALENDAR_COLUMNS:
+            self._decode_timestamps()
+            values = self._columns[name]
+        elif values is None:
+            raw = self._values(name, 0)
+            try:
+                values = self._pack_numbers(name, raw)
+            except (TypeError, ValueError, OverflowError):
+                values = None
+            if values is None:
+                values = self._pack_numbers(name, [value if _is_number(value) else 0 for value in raw])
+            self._columns[name] = values
+        return values
+
+    def _pack_numbers(self, name, raw):
+        """``raw`` as a numeric column, or None when a value made it anything but a flat one"""
+        if self.use_numpy:
+            import numpy as np
+            values = np.array(raw, dtype=np.int64 if name == 'timestamp' else np.float64)
+            return values if values.ndim == 1 else None
+        # Doubles hold millisecond timestamps exactly and, unlike 'q', accept float input
+        return array('d', raw)
+
+    def _decode_timestamps(self):
+        """Fill the calendar columns from the timestamp column.
+
+        The UTC offset is looked up once per distinct UTC day, and per
+        session only on days where it changes (daylight saving switches).
+        """
+        timestamps = self.column('timestamp')
+        offsets = {}
+        if self.use_numpy:
+            import numpy as np
+            missing = (timestamps == 0) | (timestamps <= MIN_TIMESTAMP) | (timestamps >= MAX_TIMESTAMP)
+            seconds = np.where(missing, 0, timestamps) // 1000
+            utc_days, inverse = np.unique(seconds // 86400, return_inverse=True)
+            day_offsets = []
+            for utc_day in utc_days.tolist():
+                offset = _day_offset(utc_day, self.tz)
+                day_offsets.append(0 if offset is None else offset)
+                offsets[utc_day] = offset
+            local = seconds + np.array(day_offsets, dtype=np.int64)[inverse.reshape(-1)]
+            for utc_day, offset in offsets.items():
+                if offset is None:
+                    rows = np.flatnonzero(seconds // 86400 == utc_day)
+                    local[rows] = [value + utc_offset(value, self.tz) for value in seconds[rows].tolist()]
+
+            local = local.astype('datetime64[s]')
+            days = local.astype('datetime64[D]')
+            hour = ((local - days) // np.timedelta64(1, 'h')).astype(np.int64)
+            day = days.astype(np.int64)
+            # 1970-01-01 was a Thursday
+            weekday = (day + 3) % 7
+            for values in (hour, day, weekday):
+                values[missing] = -1
+        else:
+            hour, day, weekday = array('l'), array('l'), array('l')
+            for timestamp in timestamps:
+                if not timestamp or not MIN_TIMESTAMP < timestamp < MAX_TIMESTAMP:
+                    hour.append(-1)
+                    day.append(-1)
+                    weekday.append(-1)
+                    continue
+                seconds = int(timestamp // 1000)
+                utc_day = seconds // 86400
+                offset = offsets.get(utc_day, False)
+                if offset is False:
+                    offset = offsets[utc_day] = _day_offset(utc_day, self.tz)
+                local = seconds + (utc_offset(seconds, self.tz) if offset is None else offset)
+                hour.append(local % 86400 // 3600)
+                day.append(local // 86400)
+                weekday.append((local // 86400 + 3) % 7)
+        self._columns.update(hour=hour, day=day, weekday=weekday)
+
+    def codes(self, name):
+        """Codes of a label column, indexing into ``labels(name)``"""
+        codes = self._codes.get(name)
+        if codes is None and name in CALENDAR_COLUMNS:
+            # Number the distinct values by first appearance, then label them
+            values = self.column(name)
+            raw = values.tolist() if self.use_numpy else values
+            labels = list(dict.fromkeys(raw))
+            index = {value: code for code, value in enumerate(labels)}
+            codes = list(map(index.__getitem__, raw))
+            self._labels[name] = [None if value == -1 else _calendar_label(name, value) for value in labels]
+            self._codes[name] = codes = self._pack(codes)
+        elif codes is None:
+            raw = self._values(name)
+            # dict.fromkeys keeps first-appearance order and runs in C, as does the map
+            try:
+                labels = list(dict.fromkeys(raw))
+            except TypeError:
+                # Values that can't be labels (lists, dicts) count as missing
+                raw = [value if _is_hashable(value) else None for value in raw]
+                labels = list(dict.fromkeys(raw))
+            index = {label: code for code, label in enumerate(labels)}
+            codes = list(map(index.__getitem__, raw))
+            self._codes[name] = codes = self._pack(codes)
+            self._labels[name] = labels
+        return codes
+
+    def _pack(self, codes):
+        if self.use_numpy:
+            import numpy as np
+            return np.array(codes, dtype=np.int32)
+        return array('l', codes)
+
+    def labels(self, name):
+        self.codes(name)
+        return self._labels[name]
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns and codes extracted so far, not counting the label strings"""
+        arrays = list(self._columns.values()) + list(self._codes.values())
+        if self.use_numpy:
+            return sum(values.nbytes for values in arrays)
+        return sum(len(values) * values.itemsize for values in arrays)
+
+    def tolist(self, name):
+        """A numeric column as a list of Python numbers, for the few loops that still need one"""
+        return self.column(name).tolist()
+
+    def total(self, name):
+        values = self.column(name)
+        return float(values.sum()) if self.use_numpy else sum(values)
+
+    def mean(self, name, skip_zero=False):
+        """Mean of a column, optionally over its nonzero values only; None when there are none"""
+        values = self.column(name)
+        if self.use_numpy:
+            if skip_zero:
+                values = values[values != 0]
+            return float(values.mean()) if len(values) else None
+        if skip_zero:
+            values = [value for value in values if value]
+        return sum(values) / len(values) if len(values) else None
+
+    def sum_by(self, key, name):
+        """{label: total of column ``name``} over sessions grouped by a label column"""
+        codes, labels, values = self.codes(key), self.labels(key), self.column(name)
+        if self.use_numpy:
+            import numpy as np
+            totals = np.bincount(codes, weights=values, minlength=len(labels)).tolist()
+        else:
+            totals = [0] * len(labels)
+            for code, value in zip(codes, values):
+                totals[code] += value
+        return dict(zip(labels, totals))
+
+    def count_by(self, key, start=0, stop=None):
+        """{label: sessions} for a label column over a slice of the frame; labels with no sessions are left out"""
+        codes, labels = self.codes(key)[start:stop], self.labels(key)
+        if self.use_numpy:
+            import numpy as np
+            counts = np.bincount(codes, minlength=len(labels)).tolist()
+        else:
+            counts = [0] * len(labels)
+            for code in codes:
+                counts[code] += 1
+        return {label: count for label, count in zip(labels, counts) if count}
+
+    def distinct(self, key):
+        """Number of distinct non-empty values in a label column"""
+        return sum(1 for label in self.labels(key) if label is not None and label != '')
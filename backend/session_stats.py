@@ -0,0 +1,106 @@
+from session_frame import NUMBER_TYPES, SessionFrame
+
+
+class SessionStats:
+    """Everything AIAnalysisEngine's session insights need, from one pass over the sessions.
+
+    ``hour_time`` and ``transitions`` keep the order in which their keys
+    first appear, so ties resolve the same way the per-insight loops did.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.hour_time = {}
+        self.duration_sum = 0
+        self.duration_count = 0
+        self.transitions = {}
+        self.daily_time = {}
+        self.engagement_sum = 0
+        self.recent_engagement_sum = 0
+        self.scroll_sum = 0
+        self.style_hits = {}
+
+
+def aggregate_sessions(sessions, style_matcher, frame=None):
+    """Fold ``sessions`` into a SessionStats in a single loop.
+
+    ``style_matcher`` is a KeywordMatcher over the learning styles; each of
+    a style's keywords found in a session's url or title counts the session
+    towards it once more. The first half of the list (the most recent
+    sessions) is summed separately for the engagement trend. Missing
+    numbers count as 0, and so do values of the wrong type, like texts
+    where a number belongs: one malformed session must not cost every
+    insight built from these stats. ``frame``, if given, is a SessionFrame over the
+    same sessions, whose decoded hours are then reused.
+    """
+    stats = SessionStats()
+    stats.count = len(sessions)
+    half = stats.count // 2
+
+    hour_time = stats.hour_time
+    transitions = stats.transitions
+    daily_time = stats.daily_time
+    style_hits = stats.style_hits
+    page_styles = {}
+    # Local hours decoded for all sessions at once, -1 without a timestamp
+    if frame is None:
+        frame = SessionFrame.from_sessions(sessions)
+    hours = frame.column('hour').tolist()
+
+    duration_sum = duration_count = 0
+    engagement_sum = recent_engagement_sum = scroll_sum = 0
+    previous_category = None
+
+    for index, session in enumerate(sessions):
+        get = session.get
+        duration = get('duration') or 0
+        if type(duration) not in NUMBER_TYPES:
+            duration = 0
+
+        hour = hours[index]
+        if hour >= 0:
+            hour_time[hour] = hour_time.get(hour, 0) + duration
+
+        if duration:
+            duration_sum += duration
+            duration_count += 1
+
+        category = get('category')
+        if category and type(category) is str:
+            if previous_category is not None:
+                pair = (previous_category, category)
+                transitions[pair] = transitions.get(pair, 0) + 1
+            previous_category = category
+
+        date = get('date')
+        if date and type(date) is str:
+            daily_time[date] = daily_time.get(date, 0) + duration
+
+        engagement = get('engagementScore') or 0
+        if type(engagement) not in NUMBER_TYPES:
+            engagement = 0
+        engagement_sum += engagement
+        if index < half:
+            recent_engagement_sum += engagement
+        scroll = get('scrollDepth') or 0
+        if type(scroll) in NUMBER_TYPES:
+            scroll_sum += scroll
+
+        # Revisited pages reuse their learning-style matches instead of
+        # scanning them again
+        page = (get('url') or '', get('title') or '')
+        if type(page[0]) is not str or type(page[1]) is not str:
+            page = tuple(value if type(value) is str else '' for value in page)
+        styles = page_styles.get(page)
+        if styles is None:
+            styles = style_matcher.hits(f'{page[0].lower()} {page[1].lower()}')
+            page_styles[page] = styles
+        for style, weight in styles:
+            style_hits[style] = style_hits.get(style, 0) + weight
+
+    stats.duration_sum = duration_sum
+    stats.duration_count = duration_count
+    stats.engagement_sum = engagement_sum
+    stats.recent_engagement_sum = recent_engagement_sum
+    stats.scroll_sum = scroll_sum
+    return stats
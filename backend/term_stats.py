@@ -0,0 +1,100 @@
+"""
+Persistent document frequencies for TF-IDF topic extraction.
+
+Every session title stored by /api/sync counts as one document of its
+user's corpus: ``term_frequencies`` holds how many titles contain each
+term and ``term_corpus`` how many titles there are. Ingest folds new
+titles in, in the same transaction as the sessions themselves, so the
+counts stay exact without ever refitting. A topic extraction request
+reads the counts for just the terms in its own texts (a TermStats
+snapshot) and only transforms, so its results don't depend on which
+other texts arrived in the same batch and its cost doesn't grow with the
+corpus.
+
+Like the daily rollups, the counts outlive the sessions the retention
+policy deletes.
+"""
+import json
+import math
+import re
+from collections import Counter
+
+import queries
+
+# TfidfVectorizer's default token pattern, applied to lowercased text
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+
+TERM_FREQUENCY_UPSERT = '''
+    INSERT INTO term_frequencies (user_id, term, df) VALUES (?, ?, ?)
+    ON CONFLICT (user_id, term) DO UPDATE SET df = df + excluded.df
+'''
+
+TERM_CORPUS_UPSERT = '''
+    INSERT INTO term_corpus (user_id, documents) VALUES (?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET documents = documents + excluded.documents
+'''
+
+
+def terms(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def document_frequencies(texts):
+    """Counter of how many of ``texts`` contain each term"""
+    df = Counter()
+    for text in texts:
+        df.update(set(terms(text)))
+    return df
+
+
+def record_documents(conn, user_id, texts):
+    """Add ``texts`` to the user's corpus; runs inside the caller's write transaction"""
+    if not texts:
+        return
+    df = document_frequencies(texts)
+    conn.executemany(TERM_FREQUENCY_UPSERT, [(user_id, term, count) for term, count in df.items()])
+    conn.execute(TERM_CORPUS_UPSERT, (user_id, len(texts)))
+
+
+class TermStats:
+    """Corpus size and the document frequency of the terms one request needs.
+
+    Weights follow TfidfVectorizer's defaults: raw term counts times the
+    smoothed idf ``ln((1 + documents) / (1 + df)) + 1``, L2-normalized per
+    text. Terms the corpus has never seen get the highest idf.
+    """
+
+    def __init__(self, documents=0, df=None):
+        self.documents = documents
+        self.df = df or {}
+
+    @classmethod
+    def from_texts(cls, texts):
+        """Stats of ``texts`` as their own corpus, for callers without a store"""
+        return cls(len(texts), dict(document_frequencies(texts)))
+
+    @classmethod
+    def load(cls, conn, user_id, texts):
+        """Snapshot of the user's stored counts for the terms in ``texts``"""
+        needed = sorted({term for text in texts for term in terms(text)})
+        row = conn.execute(queries.TERM_CORPUS, (user_id,)).fetchone()
+        df = dict(conn.execute(queries.TERM_FREQUENCIES, (user_id, json.dumps(needed))).fetchall()) if needed else {}
+        return cls(row[0] if row else 0, df)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('documents', 0), data.get('df'))
+
+    def to_dict(self):
+        """JSON-safe form, for handing the snapshot to a compute worker"""
+        return {'documents': self.documents, 'df': self.df}
+
+    def idf(self, term):
+        return math.log((1 + self.documents) / (1 + self.df.get(term, 0))) + 1
+
+    def weights(self, text, stop_words=()):
+        """{term: L2-normalized tf-idf weight} for one text"""
+        counts = Counter(term for term in terms(text) if term not in stop_words)
+        weights = {term: count * self.idf(term) for term, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {term: weight / norm for term, weight in weights.items()} if norm else {}
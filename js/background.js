@@ -483,7 +483,12 @@ class BackgroundController {
             });
 
             if (response.ok) {
-                const result = await response.json();
+                let result = await response.json();
+                
+                // Analysis runs as a background job; follow it for the results
+                if (result.job && result.job.status_url) {
+                    result = await this.waitForBackendJob(result.job.status_url) || result;
+                }
                 
                 if (result.insights) {
                     await this.storage.saveAIInsights(result.insights);
@@ -501,6 +506,23 @@ class BackgroundController {
         }
         return false;
     }
+
+    async waitForBackendJob(statusUrl, attempts = 10, delayMs = 1500) {
+        for (let i = 0; i < attempts; i++) {
+            await new Promise(resolve => setTimeout(resolve, delayMs));
+            try {
+                const response = await fetch(`http://localhost:5000${statusUrl}`);
+                if (!response.ok) return null;
+                
+                const { job } = await response.json();
+                if (job.status === 'completed') return job.result;
+                if (job.status === 'failed') return null;
+            } catch (error) {
+                return null;
+            }
+        }
+        return null;
+    }
 }
 
 console.log('SupriAI: Initializing background service worker...');